@@ -0,0 +1,27 @@
+"""users.token_version
+
+Revision ID: 0001_users_token_version
+Revises: 
+Create Date: 2026-10-19 10:55:11
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001_users_token_version'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # На пустой базе таблицы создает create_all при старте приложения
+    if not sa.inspect(op.get_bind()).has_table("users"):
+        return
+    op.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS token_version INTEGER NOT NULL DEFAULT 0")
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE IF EXISTS users DROP COLUMN IF EXISTS token_version")
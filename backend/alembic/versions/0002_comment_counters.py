@@ -0,0 +1,74 @@
+"""comment counters and thread indexes
+
+Revision ID: 0002_comment_counters
+Revises: 0001_users_token_version
+Create Date: 2026-10-19 11:00:36
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002_comment_counters'
+down_revision = '0001_users_token_version'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # На пустой базе таблицы создает create_all при старте приложения
+    if not sa.inspect(op.get_bind()).has_table("comments"):
+        return
+
+    op.execute("ALTER TABLE anime ADD COLUMN IF NOT EXISTS comments_count INTEGER NOT NULL DEFAULT 0")
+    op.execute("ALTER TABLE episodes ADD COLUMN IF NOT EXISTS comments_count INTEGER NOT NULL DEFAULT 0")
+    op.execute("ALTER TABLE comments ADD COLUMN IF NOT EXISTS reply_count INTEGER NOT NULL DEFAULT 0")
+
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_comments_anime_parent_created "
+        "ON comments (anime_id, parent_id, created_at)"
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_comments_episode_parent_created "
+        "ON comments (episode_id, parent_id, created_at)"
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_comments_parent_created "
+        "ON comments (parent_id, created_at)"
+    )
+
+    # Начальные значения счетчиков (как в CommentService.reconcile_counters)
+    op.execute("""
+        UPDATE anime SET comments_count = actual.count
+        FROM (
+            SELECT anime_id, count(*) AS count FROM comments
+            WHERE parent_id IS NULL GROUP BY anime_id
+        ) AS actual
+        WHERE anime.id = actual.anime_id AND anime.comments_count != actual.count
+    """)
+    op.execute("""
+        UPDATE episodes SET comments_count = actual.count
+        FROM (
+            SELECT episode_id, count(*) AS count FROM comments
+            WHERE parent_id IS NULL AND episode_id IS NOT NULL GROUP BY episode_id
+        ) AS actual
+        WHERE episodes.id = actual.episode_id AND episodes.comments_count != actual.count
+    """)
+    op.execute("""
+        UPDATE comments SET reply_count = actual.count
+        FROM (
+            SELECT parent_id, count(*) AS count FROM comments
+            WHERE parent_id IS NOT NULL GROUP BY parent_id
+        ) AS actual
+        WHERE comments.id = actual.parent_id AND comments.reply_count != actual.count
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_comments_parent_created")
+    op.execute("DROP INDEX IF EXISTS ix_comments_episode_parent_created")
+    op.execute("DROP INDEX IF EXISTS ix_comments_anime_parent_created")
+    op.execute("ALTER TABLE IF EXISTS comments DROP COLUMN IF EXISTS reply_count")
+    op.execute("ALTER TABLE IF EXISTS episodes DROP COLUMN IF EXISTS comments_count")
+    op.execute("ALTER TABLE IF EXISTS anime DROP COLUMN IF EXISTS comments_count")
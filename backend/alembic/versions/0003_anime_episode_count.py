@@ -0,0 +1,35 @@
+"""anime.episode_count
+
+Revision ID: 0003_anime_episode_count
+Revises: 0002_comment_counters
+Create Date: 2026-10-19 11:16:50
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003_anime_episode_count'
+down_revision = '0002_comment_counters'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # На пустой базе таблицы создает create_all при старте приложения
+    if not sa.inspect(op.get_bind()).has_table("anime"):
+        return
+
+    op.execute("ALTER TABLE anime ADD COLUMN IF NOT EXISTS episode_count INTEGER NOT NULL DEFAULT 0")
+
+    # Начальные значения (как в EpisodeService.reconcile_episode_counts)
+    op.execute("""
+        UPDATE anime SET episode_count = actual.count
+        FROM (SELECT anime_id, count(*) AS count FROM episodes GROUP BY anime_id) AS actual
+        WHERE anime.id = actual.anime_id AND anime.episode_count != actual.count
+    """)
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE IF EXISTS anime DROP COLUMN IF EXISTS episode_count")
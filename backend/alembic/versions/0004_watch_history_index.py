@@ -0,0 +1,31 @@
+"""watch_history (user_id, watched_at DESC) index
+
+Revision ID: 0004_watch_history_index
+Revises: 0003_anime_episode_count
+Create Date: 2026-10-19 10:40:12
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004_watch_history_index'
+down_revision = '0003_anime_episode_count'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # На пустой базе таблицы создает create_all при старте приложения
+    if not sa.inspect(op.get_bind()).has_table("watch_history"):
+        return
+
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_watch_history_user_watched_at "
+        "ON watch_history (user_id, watched_at DESC)"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_watch_history_user_watched_at")
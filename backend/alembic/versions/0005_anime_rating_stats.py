@@ -0,0 +1,62 @@
+"""anime_rating_stats backfill
+
+Revision ID: 0005_anime_rating_stats
+Revises: 0004_watch_history_index
+Create Date: 2026-10-19 10:35:04
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005_anime_rating_stats'
+down_revision = '0004_watch_history_index'
+branch_labels = None
+depends_on = None
+
+SCORE_COLUMNS = [f"score_{score}" for score in range(1, 11)]
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    # На пустой базе таблицы создает create_all при старте приложения
+    if not inspector.has_table("ratings"):
+        return
+
+    # Миграции выполняются до старта приложения, поэтому новой таблицы
+    # агрегатов на существующей базе еще нет
+    if not inspector.has_table("anime_rating_stats"):
+        op.create_table(
+            "anime_rating_stats",
+            sa.Column(
+                "anime_id", sa.Integer(),
+                sa.ForeignKey("anime.id", ondelete="CASCADE"), primary_key=True
+            ),
+            sa.Column("ratings_count", sa.Integer(), nullable=False),
+            sa.Column("ratings_sum", sa.Integer(), nullable=False),
+            *[sa.Column(column, sa.Integer(), nullable=False) for column in SCORE_COLUMNS],
+            sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        )
+
+    # Начальные значения (как в RatingService.reconcile_stats)
+    histogram = ", ".join(
+        f"count(*) FILTER (WHERE score = {score})" for score in range(1, 11)
+    )
+    op.execute(f"""
+        INSERT INTO anime_rating_stats (anime_id, ratings_count, ratings_sum, {", ".join(SCORE_COLUMNS)})
+        SELECT anime_id, count(*), sum(score), {histogram}
+        FROM ratings
+        GROUP BY anime_id
+        ON CONFLICT (anime_id) DO UPDATE SET
+            ratings_count = excluded.ratings_count,
+            ratings_sum = excluded.ratings_sum,
+            {", ".join(f"{column} = excluded.{column}" for column in SCORE_COLUMNS)},
+            updated_at = now()
+    """)
+
+
+def downgrade() -> None:
+    # Таблица объявлена в моделях (create_all создал бы ее снова),
+    # а агрегат выводится из ratings - откатывать нечего
+    pass
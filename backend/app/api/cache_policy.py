@@ -0,0 +1,106 @@
+from dataclasses import dataclass
+from typing import Callable, Optional, Tuple, Union
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    """Политика кеширования ответа для браузера и общих кешей (CDN, nginx)"""
+    max_age: int = 0
+    s_maxage: Optional[int] = None
+    stale_while_revalidate: Optional[int] = None
+    stale_if_error: Optional[int] = None
+    private: bool = False
+    no_store: bool = False
+    # Origin: CORS-заголовки ответа зависят от источника запроса
+    vary: Tuple[str, ...] = ("Accept-Encoding", "Origin")
+
+    @property
+    def cache_control(self) -> str:
+        if self.no_store:
+            return "private, no-store" if self.private else "no-store"
+
+        directives = ["private" if self.private else "public", f"max-age={self.max_age}"]
+        if self.s_maxage is not None and not self.private:
+            directives.append(f"s-maxage={self.s_maxage}")
+        if self.stale_while_revalidate is not None:
+            directives.append(f"stale-while-revalidate={self.stale_while_revalidate}")
+        if self.stale_if_error is not None:
+            directives.append(f"stale-if-error={self.stale_if_error}")
+        return ", ".join(directives)
+
+
+# Ответы, зависящие от пользователя или меняющие состояние
+NO_STORE = CachePolicy(private=True, no_store=True, vary=())
+
+CATALOG = CachePolicy(max_age=60, s_maxage=300, stale_while_revalidate=600, stale_if_error=86400)
+SEARCH = CachePolicy(max_age=30, s_maxage=120, stale_while_revalidate=300)
+DETAIL = CachePolicy(max_age=60, s_maxage=600, stale_while_revalidate=3600, stale_if_error=86400)
+DICTIONARY = CachePolicy(max_age=3600, s_maxage=86400, stale_while_revalidate=86400, stale_if_error=604800)
+COMMENTS = CachePolicy(max_age=0, s_maxage=10, stale_while_revalidate=30)
+
+# Кешируемые статусы; ошибки и редиректы не должны оседать в общем кеше
+CACHEABLE_STATUSES = {200, 203, 204, 304}
+
+# Политика роута: постоянная или зависящая от запроса (например, от ?view=)
+RoutePolicy = Union[CachePolicy, Callable[[Scope], CachePolicy]]
+
+
+def cache_policy(policy: RoutePolicy):
+    """Объявить GET-роут публично кешируемым (ставится под @router.get)"""
+
+    def decorator(endpoint: Callable) -> Callable:
+        endpoint.__cache_policy__ = policy
+        return endpoint
+
+    return decorator
+
+
+def resolve_policy(scope: Scope, default: CachePolicy = NO_STORE) -> CachePolicy:
+    """Политика совпавшего роута; всё, что не объявлено публичным, - no-store.
+
+    Роут берется из scope после маршрутизации (его выставляет APIRoute),
+    поэтому вызывать можно только после начала ответа.
+    """
+    if scope["method"] not in ("GET", "HEAD"):
+        return default
+
+    route = scope.get("route")
+    policy = getattr(getattr(route, "endpoint", None), "__cache_policy__", None)
+    if policy is None:
+        return default
+    return policy(scope) if callable(policy) else policy
+
+
+class CachePolicyMiddleware:
+    """Проставляет Cache-Control и Vary по политике совпавшего роута.
+
+    Заголовок, уже выставленный роутом (например, у SSE), не трогается.
+    ASGI-middleware без BaseHTTPMiddleware, чтобы не буферизовать потоки.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_policy(message: Message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                if "cache-control" not in headers:
+                    # К началу ответа маршрутизация уже выполнена
+                    cacheable = message["status"] in CACHEABLE_STATUSES
+                    applied = resolve_policy(scope) if cacheable else NO_STORE
+                    headers["Cache-Control"] = applied.cache_control
+                    vary = headers.get("vary", "").lower()
+                    for field in applied.vary:
+                        if field.lower() not in vary:
+                            headers.add_vary_header(field)
+            await send(message)
+
+        await self.app(scope, receive, send_with_policy)
@@ -0,0 +1,124 @@
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+from app.utils.compression import brotli, compress, is_compressible, negotiate
+
+
+class _StreamCompressor:
+    """Инкрементальное сжатие потокового ответа"""
+
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=settings.COMPRESSION_BROTLI_QUALITY)
+            self._zlib = None
+        else:
+            self._brotli = None
+            self._zlib = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def chunk(self, data: bytes) -> bytes:
+        # flush после каждого куска, чтобы клиент получал данные сразу
+        if self._brotli is not None:
+            return self._brotli.process(data) + self._brotli.flush()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self._brotli is not None:
+            return self._brotli.finish()
+        return self._zlib.flush()
+
+
+class CompressionMiddleware:
+    """Сжатие ответов brotli/gzip по Accept-Encoding.
+
+    Ответы меньше COMPRESSION_MIN_SIZE, несжимаемые типы и ответы с уже
+    выставленным Content-Encoding (готовые варианты из кеша) отдаются как
+    есть. SSE не сжимается, чтобы прокси не копили события.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: Optional[int] = None):
+        self.app = app
+        self.minimum_size = settings.COMPRESSION_MIN_SIZE if minimum_size is None else minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Message] = None
+        passthrough = False
+        compressor: Optional[_StreamCompressor] = None
+
+        async def send_compressed(message: Message):
+            nonlocal start, passthrough, compressor
+
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                content_type = headers.get("content-type", "")
+                content_length = headers.get("content-length")
+                passthrough = (
+                    "content-encoding" in headers
+                    or message["status"] in (204, 304)
+                    or content_type.startswith("text/event-stream")
+                    or not is_compressible(content_type)
+                    or (content_length is not None and int(content_length) < self.minimum_size)
+                )
+                if passthrough:
+                    await send(message)
+                else:
+                    start = message
+                return
+
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if compressor is None and not more_body:
+                # Ответ целиком в одном сообщении
+                if len(body) < self.minimum_size:
+                    await send(start)
+                    await send(message)
+                    return
+
+                body = compress(body, encoding)
+                headers = self._encoded_headers(start, encoding)
+                headers["Content-Length"] = str(len(body))
+                await send(start)
+                await send({"type": "http.response.body", "body": body})
+                return
+
+            if compressor is None:
+                compressor = _StreamCompressor(encoding)
+                headers = self._encoded_headers(start, encoding)
+                del headers["Content-Length"]
+                await send(start)
+
+            data = compressor.chunk(body) if body else b""
+            if not more_body:
+                data += compressor.finish()
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+    @staticmethod
+    def _encoded_headers(start: Message, encoding: str) -> MutableHeaders:
+        headers = MutableHeaders(scope=start)
+        headers["Content-Encoding"] = encoding
+        if "accept-encoding" not in headers.get("vary", "").lower():
+            headers.add_vary_header("Accept-Encoding")
+        # Сжатое представление не побайтно равно исходному
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = "W/" + etag
+        return headers
@@ -1,52 +1,85 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
 from jose import JWTError, jwt
 from typing import Optional
 
 from app.database import get_db
 from app.models.user import User
 from app.config import settings
-from app.schemas.user import TokenData
+from app.schemas.user import Principal
+from app.services.projection import FieldSelection, parse_fields
+from app.services.token_service import revocation_registry
 
 # Схема безопасности
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
 
 
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: AsyncSession = Depends(get_db)
-) -> User:
-    """Получить текущего пользователя из JWT токена"""
-    
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    
+
+
+def _decode_principal(token: str) -> Optional[Principal]:
+    """Восстановить пользователя из claims JWT токена"""
     try:
         payload = jwt.decode(
-            credentials.credentials, 
-            settings.JWT_SECRET_KEY, 
+            token,
+            settings.JWT_SECRET_KEY,
             algorithms=[settings.JWT_ALGORITHM]
         )
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-        token_data = TokenData(username=username)
     except JWTError:
-        raise credentials_exception
+        return None
+    
+    user_id = payload.get("uid")
+    username = payload.get("sub")
+    if user_id is None or username is None:
+        return None
     
-    # Получаем пользователя из базы данных
-    result = await db.execute(
-        select(User).where(User.username == token_data.username)
+    return Principal(
+        id=user_id,
+        username=username,
+        is_active=payload.get("act", True),
+        token_version=payload.get("ver", 0)
     )
-    user = result.scalar_one_or_none()
+
+
+async def get_current_principal(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+) -> Principal:
+    """Получить текущего пользователя из JWT токена без запроса к БД"""
+    
+    principal = _decode_principal(credentials.credentials)
+    if principal is None:
+        raise _credentials_exception()
+    
+    # Отозванные токены (смена версии, деактивация) проверяются по локальному кешу
+    if revocation_registry.is_revoked(principal.id, principal.token_version):
+        raise _credentials_exception()
+    
+    if not principal.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Inactive user"
+        )
+    
+    return principal
+
+
+async def get_current_user(
+    principal: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db)
+) -> User:
+    """Получить текущего пользователя из БД (для обработчиков, которым нужна полная запись)"""
+    
+    user = await db.get(User, principal.id)
     
-    if user is None:
-        raise credentials_exception
+    if user is None or user.token_version != principal.token_version:
+        raise _credentials_exception()
     
     if not user.is_active:
         raise HTTPException(
@@ -70,34 +103,54 @@ async def get_current_active_user(
 
 
 # Опциональная авторизация (для эндпоинтов, которые работают и без авторизации)
+async def get_current_principal_optional(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)
+) -> Optional[Principal]:
+    """Получить текущего пользователя из токена (опционально)"""
+    
+    if not credentials:
+        return None
+    
+    principal = _decode_principal(credentials.credentials)
+    if principal is None or not principal.is_active:
+        return None
+    
+    if revocation_registry.is_revoked(principal.id, principal.token_version):
+        return None
+    
+    return principal
+
+
 async def get_current_user_optional(
-    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
+    principal: Optional[Principal] = Depends(get_current_principal_optional),
     db: AsyncSession = Depends(get_db)
 ) -> Optional[User]:
     """Получить текущего пользователя (опционально)"""
     
-    if not credentials:
+    if principal is None:
         return None
     
-    try:
-        payload = jwt.decode(
-            credentials.credentials,
-            settings.JWT_SECRET_KEY,
-            algorithms=[settings.JWT_ALGORITHM]
-        )
-        username: str = payload.get("sub")
-        if username is None:
-            return None
-        
-        result = await db.execute(
-            select(User).where(User.username == username)
-        )
-        user = result.scalar_one_or_none()
-        
-        if user and user.is_active:
-            return user
-        
-    except JWTError:
-        pass
+    user = await db.get(User, principal.id)
+    
+    if user and user.is_active and user.token_version == principal.token_version:
+        return user
     
     return None
+
+
+def field_selection(allowed: FieldSelection):
+    """Зависимость, разбирающая ?fields= по разрешенным полям ответа"""
+
+    def dependency(
+        fields: Optional[str] = Query(
+            None, description="Поля ответа через запятую, например id,title_romaji,genres.name"
+        )
+    ) -> Optional[FieldSelection]:
+        if fields is None:
+            return None
+        try:
+            return parse_fields(fields, allowed)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    return dependency
@@ -0,0 +1,55 @@
+import time
+
+from fastapi import APIRouter, Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.utils.metrics import observe_request, render, request_db
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Метрики Prometheus (в многопроцессном режиме - по всем воркерам)"""
+    body, content_type = render()
+    # Заголовок передается как есть: media_type заставил бы Starlette дописать второй charset
+    return Response(content=body, headers={"Content-Type": content_type})
+
+
+class MetricsMiddleware:
+    """Латентность запросов по шаблону роута и запросы к БД на запрос.
+
+    Шаблон роута (/api/v1/anime/{anime_id}) берется из scope после
+    маршрутизации, поэтому число серий не зависит от ID в пути. Запросы
+    без совпавшего роута попадают в одну серию "unmatched".
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        started = time.perf_counter()
+        token = request_db.set([0, 0.0])
+
+        async def send_with_status(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            observe_request(
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                status,
+                time.perf_counter() - started
+            )
+            request_db.reset(token)
@@ -0,0 +1,100 @@
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Optional, Tuple, Type
+from datetime import datetime
+
+from fastapi import Request
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+from app.services.payload_cache import payload_cache, make_payload
+from app.utils.compression import negotiate
+from app.utils.metrics import count_cache
+
+
+class PreSerializedJSONResponse(Response):
+    """JSON-ответ из уже сериализованных байтов.
+
+    Тело отдается как есть: без валидации response_model и повторной
+    сериализации. Используется для ответов из кеша.
+    """
+
+    media_type = "application/json"
+
+
+def encoded_response(body: bytes, encoding: Optional[str], headers: Optional[dict] = None) -> Response:
+    """Ответ из готовых байтов, возможно уже сжатых encoding"""
+    headers = dict(headers or {})
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+        headers["Vary"] = "Accept-Encoding"
+        # Сжатое представление не побайтно равно исходному
+        if "ETag" in headers and not headers["ETag"].startswith("W/"):
+            headers["ETag"] = "W/" + headers["ETag"]
+    return PreSerializedJSONResponse(body, headers=headers)
+
+def serialize(schema: Type[BaseModel], value: Any) -> bytes:
+    """Провалидировать значение схемой ответа и сериализовать в JSON"""
+    return schema.model_validate(value).model_dump_json().encode()
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Слабое сравнение ETag из If-None-Match"""
+    if if_none_match.strip() == "*":
+        return True
+    own = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == own for tag in if_none_match.split(","))
+
+
+def _not_modified(request: Request, etag: str, last_modified: Optional[str]) -> bool:
+    """Проверить условные заголовки запроса (If-None-Match приоритетнее)"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified:
+        try:
+            return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+
+    return False
+
+
+def _validator_headers(etag: str, last_modified: Optional[str]) -> dict:
+    headers = {"ETag": etag}
+    if last_modified:
+        headers["Last-Modified"] = last_modified
+    return headers
+
+
+async def conditional_response(
+    request: Request,
+    key: str,
+    build: Callable[[], Awaitable[Tuple[bytes, Optional[datetime]]]],
+    ttl: int
+) -> Response:
+    """Закешированный JSON-ответ с ETag/Last-Modified.
+
+    Условный запрос сверяется с валидаторами из кеша до обращения к БД.
+    build возвращает (тело, время изменения) и вызывается только при
+    промахе кеша; HTTPException из него пробрасывается.
+    """
+    if "if-none-match" in request.headers or "if-modified-since" in request.headers:
+        validators = await payload_cache.get_validators(key)
+        if validators and _not_modified(request, *validators):
+            count_cache(key, hit=True)
+            return Response(status_code=304, headers=_validator_headers(*validators))
+
+    payload = await payload_cache.get(key, negotiate(request.headers.get("accept-encoding")))
+    count_cache(key, hit=payload is not None)
+    if payload is None:
+        body, last_modified = await build()
+        payload = make_payload(body, last_modified)
+        await payload_cache.store(key, payload, ttl)
+
+    headers = _validator_headers(payload.etag, payload.last_modified)
+    if _not_modified(request, payload.etag, payload.last_modified):
+        return Response(status_code=304, headers=headers)
+
+    return encoded_response(payload.body, payload.encoding, headers)
@@ -1,21 +1,31 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, or_
 from sqlalchemy.orm import selectinload
-from typing import Optional, List
+from typing import Optional, List, Union
+import orjson
 
 from app.database import get_db
 from app.models.anime import Anime, Genre, Studio
 from app.schemas.anime import (
     AnimeList, Anime as AnimeSchema, AnimeCreate, AnimeUpdate, 
-    AnimeFilters, AnimeSearch
+    AnimeFilters, AnimeSearch, AnimeView, AnimeCard, AnimeCardList, AnimeBatch, AnimeDetail
 )
-from app.services.anime_service import AnimeService
+from app.services.anime_service import AnimeService, ANIME_FIELDS
+from app.services.projection import FieldSelection
+from app.api.dependencies import field_selection
+from app.api.cache_policy import cache_policy, CATALOG, SEARCH, DETAIL, DICTIONARY
+from app.services.payload_cache import ANIME_DETAIL_KEY, GENRES_KEY, STUDIOS_KEY
+from app.api.responses import PreSerializedJSONResponse, conditional_response
+from app.config import settings
+from app.utils.helpers import parse_id_list
 
 router = APIRouter()
 
 
-@router.get("/", response_model=AnimeList)
+@router.get("/", response_model=Union[AnimeList, AnimeCardList])
+@cache_policy(CATALOG)
 async def get_anime_list(
     page: int = Query(1, ge=1),
     limit: int = Query(20, ge=1, le=100),
@@ -23,6 +33,8 @@ async def get_anime_list(
     year: Optional[int] = Query(None),
     status: Optional[str] = Query(None),
     sort: str = Query("popularity", regex="^(popularity|score|year|title)$"),
+    view: AnimeView = Query(AnimeView.full),
+    fields: Optional[FieldSelection] = Depends(field_selection(ANIME_FIELDS)),
     db: AsyncSession = Depends(get_db)
 ):
     """Получить список аниме с фильтрами и пагинацией"""
@@ -37,14 +49,22 @@ async def get_anime_list(
         limit=limit
     )
     
-    result = await anime_service.get_anime_list(filters)
+    result = await anime_service.get_anime_list(filters, view, fields)
+    
+    # Выбранные поля не проходят response_model: она дополнила бы
+    # ответ значениями по умолчанию
+    if fields is not None:
+        return ORJSONResponse(result)
     return result
 
 
-@router.get("/search", response_model=List[AnimeSchema])
+@router.get("/search", response_model=Union[List[AnimeSchema], List[AnimeCard]])
+@cache_policy(SEARCH)
 async def search_anime(
     q: str = Query(..., min_length=1),
     limit: int = Query(10, ge=1, le=50),
+    view: AnimeView = Query(AnimeView.full),
+    fields: Optional[FieldSelection] = Depends(field_selection(ANIME_FIELDS)),
     db: AsyncSession = Depends(get_db)
 ):
     """Поиск аниме по названию"""
@@ -52,24 +72,63 @@ async def search_anime(
     anime_service = AnimeService(db)
     search_params = AnimeSearch(query=q, limit=limit)
     
-    result = await anime_service.search_anime(search_params)
+    result = await anime_service.search_anime(search_params, view, fields)
+    
+    if fields is not None:
+        return ORJSONResponse(result)
     return result
 
 
-@router.get("/{anime_id}", response_model=AnimeSchema)
-async def get_anime_detail(
-    anime_id: int,
+@router.get("/batch", response_model=AnimeBatch)
+@cache_policy(DETAIL)
+async def get_anime_batch(
+    ids: str = Query(..., description="ID аниме через запятую"),
     db: AsyncSession = Depends(get_db)
 ):
-    """Получить детальную информацию об аниме"""
+    """Получить детали нескольких аниме в порядке переданных ID"""
+    
+    try:
+        anime_ids = parse_id_list(ids)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid anime id list")
+    
+    if not anime_ids:
+        raise HTTPException(status_code=400, detail="No anime ids given")
+    if len(anime_ids) > settings.ANIME_BATCH_MAX_IDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many ids, max {settings.ANIME_BATCH_MAX_IDS}"
+        )
     
     anime_service = AnimeService(db)
-    anime = await anime_service.get_anime_by_id(anime_id)
+    bodies, missing = await anime_service.get_anime_batch_json(anime_ids)
     
-    if not anime:
-        raise HTTPException(status_code=404, detail="Anime not found")
+    # Тела из кеша деталей склеиваются без повторной сериализации
+    payload = b'{"data":[' + b",".join(bodies) + b'],"missing":' + orjson.dumps(missing) + b"}"
+    return PreSerializedJSONResponse(payload)
+
+
+@router.get("/{anime_id}", response_model=AnimeDetail)
+@cache_policy(DETAIL)
+async def get_anime_detail(
+    anime_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_db)
+):
+    """Получить детальную информацию об аниме"""
     
-    return anime
+    async def build():
+        anime_service = AnimeService(db)
+        detail = await anime_service.get_anime_detail_json(anime_id)
+        
+        if detail is None:
+            raise HTTPException(status_code=404, detail="Anime not found")
+        
+        return detail
+    
+    return await conditional_response(
+        request, ANIME_DETAIL_KEY.format(anime_id=anime_id), build, settings.CACHE_TTL_ANIME
+    )
 
 
 @router.post("/", response_model=AnimeSchema)
@@ -119,20 +178,26 @@ async def delete_anime(
 
 
 @router.get("/genres/", response_model=List[dict])
-async def get_genres(db: AsyncSession = Depends(get_db)):
+@cache_policy(DICTIONARY)
+async def get_genres(request: Request, db: AsyncSession = Depends(get_db)):
     """Получить список всех жанров"""
     
-    result = await db.execute(select(Genre))
-    genres = result.scalars().all()
+    async def build():
+        result = await db.execute(select(Genre.id, Genre.name))
+        genres = [{"id": genre.id, "name": genre.name} for genre in result.all()]
+        return orjson.dumps(genres), None
     
-    return [{"id": genre.id, "name": genre.name} for genre in genres]
+    return await conditional_response(request, GENRES_KEY, build, settings.CACHE_TTL_ANIME)
 
 
 @router.get("/studios/", response_model=List[dict])
-async def get_studios(db: AsyncSession = Depends(get_db)):
+@cache_policy(DICTIONARY)
+async def get_studios(request: Request, db: AsyncSession = Depends(get_db)):
     """Получить список всех студий"""
     
-    result = await db.execute(select(Studio))
-    studios = result.scalars().all()
+    async def build():
+        result = await db.execute(select(Studio.id, Studio.name))
+        studios = [{"id": studio.id, "name": studio.name} for studio in result.all()]
+        return orjson.dumps(studios), None
     
-    return [{"id": studio.id, "name": studio.name} for studio in studios]
+    return await conditional_response(request, STUDIOS_KEY, build, settings.CACHE_TTL_ANIME)
@@ -4,14 +4,29 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
 
 from app.database import get_db
-from app.schemas.user import UserCreate, UserRegisterResponse, Token, User as UserSchema
+from app.schemas.user import UserCreate, UserRegisterResponse, Token, RefreshTokenRequest
 from app.services.user_service import UserService
-from app.utils.security import create_access_token
+from app.services.token_service import refresh_tokens
+from app.utils.security import create_access_token, build_token_claims
+from app.api.dependencies import get_current_principal
+from app.schemas.user import Principal
 from app.config import settings
 
 router = APIRouter()
 
 
+async def _issue_tokens(claims: dict) -> dict:
+    """Выдать access токен и refresh токен нового семейства"""
+    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    access_token = create_access_token(data=claims, expires_delta=access_token_expires)
+    
+    return {
+        "access_token": access_token,
+        "refresh_token": await refresh_tokens.issue(claims),
+        "token_type": "bearer"
+    }
+
+
 @router.post("/register", response_model=UserRegisterResponse)
 async def register(
     user_data: UserCreate,
@@ -39,17 +54,10 @@ async def register(
     # Создаем пользователя
     user = await user_service.create_user(user_data)
     
-    # Создаем токен
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
-    )
+    # Создаем токены
+    tokens = await _issue_tokens(build_token_claims(user))
     
-    return {
-        "user": user,
-        "access_token": access_token,
-        "token_type": "bearer"
-    }
+    return {"user": user, **tokens}
 
 
 @router.post("/login", response_model=Token)
@@ -70,24 +78,50 @@ async def login(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # Создаем токен
+    # Создаем токены
+    return await _issue_tokens(build_token_claims(user))
+
+
+@router.post("/refresh", response_model=Token)
+async def refresh_token(request: RefreshTokenRequest):
+    """Обновление токена по refresh токену (ротация, без проверки пароля)"""
+    
+    rotated = await refresh_tokens.rotate(request.refresh_token)
+    if rotated is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    new_refresh_token, claims = rotated
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
-    )
+    access_token = create_access_token(data=claims, expires_delta=access_token_expires)
     
-    return {"access_token": access_token, "token_type": "bearer"}
+    return {
+        "access_token": access_token,
+        "refresh_token": new_refresh_token,
+        "token_type": "bearer"
+    }
 
 
-@router.post("/refresh", response_model=Token)
-async def refresh_token(
-    current_user: UserSchema = Depends(get_current_user),
+@router.post("/logout")
+async def logout(request: RefreshTokenRequest):
+    """Выход: отзыв refresh токенов текущего устройства"""
+    
+    await refresh_tokens.revoke(request.refresh_token)
+    
+    return {"message": "Logged out"}
+
+
+@router.post("/logout-all")
+async def logout_all(
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db)
 ):
-    """Обновление токена"""
+    """Отозвать все выданные пользователю токены"""
     
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": current_user.username}, expires_delta=access_token_expires
-    )
+    user_service = UserService(db)
+    await user_service.revoke_tokens(current_user.id)
     
-    return {"access_token": access_token, "token_type": "bearer"}
+    return {"message": "All sessions revoked"}
@@ -1,50 +1,116 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Optional
 
 from app.database import get_db
-from app.schemas.comment import Comment, CommentCreate, CommentUpdate, CommentList
+from app.api.responses import encoded_response
+from app.api.cache_policy import cache_policy, COMMENTS
+from app.utils.compression import negotiate
+from app.schemas.comment import Comment, CommentCreate, CommentUpdate, CommentList, CommentReplies
 from app.services.comment_service import CommentService
-from app.api.dependencies import get_current_user
-from app.models.user import User
+from app.services.comment_stream import comment_stream
+from app.api.dependencies import get_current_principal
+from app.schemas.user import Principal
 
 router = APIRouter()
 
+# Заголовки потока: без кеширования и буферизации на прокси
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
 
 @router.get("/anime/{anime_id}", response_model=CommentList)
+@cache_policy(COMMENTS)
 async def get_anime_comments(
     anime_id: int,
-    page: int = Query(1, ge=1),
+    request: Request,
+    cursor: Optional[str] = Query(None),
     limit: int = Query(20, ge=1, le=100),
     db: AsyncSession = Depends(get_db)
 ):
     """Получить комментарии к аниме"""
     
     comment_service = CommentService(db)
-    result = await comment_service.get_anime_comments(anime_id, page, limit)
+    try:
+        payload, encoding = await comment_service.get_anime_comments_json(
+            anime_id, cursor, limit, negotiate(request.headers.get("accept-encoding"))
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
     
-    return result
+    return encoded_response(payload, encoding)
 
 
 @router.get("/episode/{episode_id}", response_model=CommentList)
+@cache_policy(COMMENTS)
 async def get_episode_comments(
     episode_id: int,
-    page: int = Query(1, ge=1),
+    request: Request,
+    cursor: Optional[str] = Query(None),
     limit: int = Query(20, ge=1, le=100),
     db: AsyncSession = Depends(get_db)
 ):
     """Получить комментарии к эпизоду"""
     
     comment_service = CommentService(db)
-    result = await comment_service.get_episode_comments(episode_id, page, limit)
+    try:
+        payload, encoding = await comment_service.get_episode_comments_json(
+            episode_id, cursor, limit, negotiate(request.headers.get("accept-encoding"))
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    return encoded_response(payload, encoding)
+
+
+@router.get("/stream/anime/{anime_id}")
+async def stream_anime_comments(anime_id: int, request: Request):
+    """Поток событий комментариев к аниме (Server-Sent Events)"""
+    
+    return StreamingResponse(
+        comment_stream.frames("anime", anime_id, request),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
+
+@router.get("/stream/episode/{episode_id}")
+async def stream_episode_comments(episode_id: int, request: Request):
+    """Поток событий комментариев к эпизоду (Server-Sent Events)"""
+    
+    return StreamingResponse(
+        comment_stream.frames("episode", episode_id, request),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
+
+@router.get("/{comment_id}/replies", response_model=CommentReplies)
+@cache_policy(COMMENTS)
+async def get_comment_replies(
+    comment_id: int,
+    request: Request,
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_db)
+):
+    """Получить ответы на комментарий (курсорная пагинация)"""
+    
+    comment_service = CommentService(db)
+    try:
+        payload, encoding = await comment_service.get_replies_json(
+            comment_id, cursor, limit, negotiate(request.headers.get("accept-encoding"))
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
     
-    return result
+    return encoded_response(payload, encoding)
 
 
 @router.post("/", response_model=Comment)
 async def create_comment(
     comment_data: CommentCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db)
 ):
     """Создать комментарий"""
@@ -59,7 +125,7 @@ async def create_comment(
 async def update_comment(
     comment_id: int,
     comment_data: CommentUpdate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db)
 ):
     """Обновить комментарий (только автор)"""
@@ -76,7 +142,7 @@ async def update_comment(
 @router.delete("/{comment_id}")
 async def delete_comment(
     comment_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db)
 ):
     """Удалить комментарий (только автор)"""
@@ -1,33 +1,141 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import ORJSONResponse
+from starlette.datastructures import QueryParams
+from starlette.types import Scope
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Optional, Union
 
+from app.config import settings
 from app.database import get_db
+from app.api.responses import PreSerializedJSONResponse, conditional_response, serialize
+from app.api.cache_policy import cache_policy, CachePolicy, DETAIL, NO_STORE
 from app.schemas.episode import (
-    Episode, EpisodeCreate, EpisodeUpdate, EpisodeList,
-    EpisodeSourcesResponse, WatchProgressUpdate
+    Episode, EpisodeCreate, EpisodeUpdate, EpisodeList, EpisodeCardList, EpisodeView,
+    EpisodeChunkIndex, EpisodeSourcesResponse, WatchProgressUpdate
 )
-from app.services.episode_service import EpisodeService
-from app.api.dependencies import get_current_user
-from app.models.user import User
+from app.services.episode_service import (
+    EpisodeService, EPISODE_FIELDS, episodes_payload, episode_chunk, chunk_bounds
+)
+from app.services.library_state import library_state
+from app.services.payload_cache import ANIME_EPISODES_KEY, ANIME_EPISODE_CHUNK_KEY, ANIME_EPISODE_CHUNKS_KEY
+from app.services.progress_buffer import progress_buffer
+from app.services.projection import FieldSelection
+from app.api.dependencies import get_current_principal, field_selection
+from app.schemas.user import Principal
 
 router = APIRouter()
 
 
-@router.get("/anime/{anime_id}", response_model=EpisodeList)
+def episode_list_policy(scope: Scope) -> CachePolicy:
+    """Списки без источников видео кешируются публично, с источниками - только no-store"""
+    params = QueryParams(scope["query_string"])
+    fields = params.get("fields")
+    if fields is not None:
+        return NO_STORE if "video_sources" in fields else DETAIL
+    return DETAIL if params.get("view") == EpisodeView.compact.value else NO_STORE
+
+
+@router.get("/anime/{anime_id}", response_model=Union[EpisodeList, EpisodeCardList])
+@cache_policy(episode_list_policy)
 async def get_anime_episodes(
     anime_id: int,
+    request: Request,
+    from_episode: Optional[int] = Query(None, alias="from", ge=1),
+    to_episode: Optional[int] = Query(None, alias="to", ge=1),
+    cursor: Optional[str] = Query(None),
+    limit: Optional[int] = Query(None, ge=1, le=100),
+    view: EpisodeView = Query(EpisodeView.full),
+    fields: Optional[FieldSelection] = Depends(field_selection(EPISODE_FIELDS)),
     db: AsyncSession = Depends(get_db)
 ):
-    """Получить список эпизодов для аниме"""
+    """Получить эпизоды аниме.
+
+    from/to - диапазон номеров, cursor/limit - постраничная выдача,
+    без параметров - весь список. compact - без источников видео,
+    fields - только выбранные поля (ответ не кешируется).
+    """
     
     episode_service = EpisodeService(db)
-    episodes = await episode_service.get_episodes_by_anime(anime_id)
     
-    return {
-        "data": episodes,
-        "total": len(episodes)
-    }
+    if cursor is not None or limit is not None:
+        try:
+            page = await episode_service.get_episode_page(
+                anime_id, view, cursor, limit or settings.EPISODES_PAGE_SIZE, fields
+            )
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        return ORJSONResponse(page) if fields is not None else page
+    
+    if from_episode is not None or to_episode is not None:
+        start = from_episode or 1
+        end = to_episode or start + settings.EPISODES_RANGE_MAX - 1
+        if end < start:
+            raise HTTPException(status_code=400, detail="Invalid episode range")
+        if end - start + 1 > settings.EPISODES_RANGE_MAX:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Episode range is too long, max {settings.EPISODES_RANGE_MAX}"
+            )
+        
+        # total - все эпизоды аниме, data - только запрошенный диапазон
+        if fields is not None:
+            episodes = await episode_service.list_episodes(anime_id, start=start, end=end, fields=fields)
+            return ORJSONResponse({
+                "data": episodes,
+                "total": await episode_service.get_episode_count(anime_id)
+            })
+        
+        async def build_range():
+            episodes = await episode_service.list_episodes(anime_id, view, start=start, end=end)
+            return episodes_payload(episodes, view, await episode_service.get_episode_count(anime_id))
+        
+        # Диапазоны, совпадающие с чанком оглавления, кешируются
+        chunk = episode_chunk(start)
+        if chunk_bounds(chunk) == (start, end):
+            key = ANIME_EPISODE_CHUNK_KEY.format(anime_id=anime_id, view=view.value, chunk=chunk)
+            return await conditional_response(request, key, build_range, settings.CACHE_TTL_EPISODES)
+        
+        body, _ = await build_range()
+        return PreSerializedJSONResponse(body)
+    
+    if fields is not None:
+        episodes = await episode_service.list_episodes(anime_id, fields=fields)
+        return ORJSONResponse({"data": episodes, "total": len(episodes)})
+    
+    async def build():
+        episodes = await episode_service.list_episodes(anime_id, view)
+        return episodes_payload(episodes, view, len(episodes))
+    
+    return await conditional_response(
+        request,
+        ANIME_EPISODES_KEY.format(anime_id=anime_id, view=view.value),
+        build,
+        settings.CACHE_TTL_EPISODES
+    )
+
+
+@router.get("/anime/{anime_id}/chunks", response_model=EpisodeChunkIndex)
+@cache_policy(DETAIL)
+async def get_anime_episode_chunks(
+    anime_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_db)
+):
+    """Оглавление эпизодов по чанкам (1-100, 101-200, ...) для ленивой загрузки"""
+    
+    async def build():
+        episode_service = EpisodeService(db)
+        chunks = await episode_service.get_episode_chunks(anime_id)
+        body = serialize(EpisodeChunkIndex, {
+            "data": chunks,
+            "total": sum(chunk["count"] for chunk in chunks),
+            "chunk_size": settings.EPISODE_CHUNK_SIZE
+        })
+        return body, None
+    
+    return await conditional_response(
+        request, ANIME_EPISODE_CHUNKS_KEY.format(anime_id=anime_id), build, settings.CACHE_TTL_EPISODES
+    )
 
 
 @router.get("/{episode_id}", response_model=Episode)
@@ -49,7 +157,7 @@ async def get_episode_detail(
 @router.get("/{episode_id}/sources", response_model=EpisodeSourcesResponse)
 async def get_episode_sources(
     episode_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db)
 ):
     """Получить ссылки на видео для эпизода (требует авторизации)"""
@@ -73,25 +181,30 @@ async def get_episode_sources(
 async def save_watch_progress(
     episode_id: int,
     progress_data: WatchProgressUpdate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db)
 ):
     """Сохранить прогресс просмотра эпизода"""
     
     episode_service = EpisodeService(db)
     
-    # Проверяем существование эпизода
-    episode = await episode_service.get_episode_by_id(episode_id)
+    # Проверяем существование эпизода (без загрузки источников видео)
+    episode = await episode_service.get_episode_brief(episode_id)
     if not episode:
         raise HTTPException(status_code=404, detail="Episode not found")
     
-    # Сохраняем прогресс
-    await episode_service.save_watch_progress(
+    # Прогресс пишется в буфер и сбрасывается в БД пакетно
+    entry = await progress_buffer.record(
         user_id=current_user.id,
         episode_id=episode_id,
         progress=progress_data.progress,
         completed=progress_data.completed
     )
+    await library_state.patch(current_user.id, episode.anime_id, {
+        "e": episode.episode_number,
+        "p": progress_data.progress,
+        "t": entry["watched_at"]
+    })
     
     return {"message": "Progress saved successfully"}
 
@@ -0,0 +1,112 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+
+from app.database import get_db
+from app.schemas.library import (
+    LibraryStatus, LibraryUpdate, UserLibrary,
+    LibraryProgressUpdate, LibraryProgress, LibraryCheck
+)
+from app.services.library_service import LibraryService
+from app.api.dependencies import get_current_principal
+from app.schemas.user import Principal
+
+router = APIRouter()
+
+
+@router.get("/", response_model=UserLibrary)
+async def get_library(
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db)
+):
+    """Получить библиотеку пользователя по спискам"""
+    
+    library_service = LibraryService(db)
+    library = await library_service.get_library(current_user.id)
+    
+    return library
+
+
+@router.post("/add")
+async def add_to_library(
+    library_data: LibraryUpdate,
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db)
+):
+    """Добавить аниме в список"""
+    
+    library_service = LibraryService(db)
+    await library_service.add(current_user.id, library_data.anime_id, library_data.status)
+    
+    return {"message": "Added to library"}
+
+
+@router.post("/remove")
+async def remove_from_library(
+    library_data: LibraryUpdate,
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db)
+):
+    """Удалить аниме из списка"""
+    
+    library_service = LibraryService(db)
+    success = await library_service.remove(
+        current_user.id, library_data.anime_id, library_data.status
+    )
+    
+    if not success:
+        raise HTTPException(status_code=404, detail="Library entry not found")
+    
+    return {"message": "Removed from library"}
+
+
+@router.post("/progress")
+async def update_watch_progress(
+    progress_data: LibraryProgressUpdate,
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db)
+):
+    """Сохранить прогресс просмотра по номеру эпизода"""
+    
+    library_service = LibraryService(db)
+    success = await library_service.update_progress(
+        user_id=current_user.id,
+        anime_id=progress_data.anime_id,
+        episode_number=progress_data.episode_number,
+        progress=progress_data.progress,
+        completed=progress_data.completed
+    )
+    
+    if not success:
+        raise HTTPException(status_code=404, detail="Episode not found")
+    
+    return {"message": "Progress saved successfully"}
+
+
+@router.get("/progress/{anime_id}", response_model=Optional[LibraryProgress])
+async def get_watch_progress(
+    anime_id: int,
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db)
+):
+    """Получить прогресс просмотра аниме"""
+    
+    library_service = LibraryService(db)
+    progress = await library_service.get_progress(current_user.id, anime_id)
+    
+    return progress
+
+
+@router.get("/check/{anime_id}/{status}", response_model=LibraryCheck)
+async def check_in_library(
+    anime_id: int,
+    status: LibraryStatus,
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db)
+):
+    """Проверить, находится ли аниме в списке"""
+    
+    library_service = LibraryService(db)
+    exists = await library_service.contains(current_user.id, anime_id, status)
+    
+    return {"exists": exists}
@@ -1,15 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Optional, Union
 
 from app.database import get_db
 from app.schemas.user import (
-    User as UserSchema, UserUpdate, UserFavoriteCreate, 
-    WatchHistory, Rating, RatingCreate
+    User as UserSchema, UserUpdate, UserFavoriteCreate, Principal,
+    WatchHistoryItem, WatchHistoryPage, Rating, RatingCreate
 )
-from app.schemas.anime import Anime as AnimeSchema
+from app.schemas.anime import Anime as AnimeSchema, AnimeCard, AnimeView
+from app.services.anime_service import ANIME_FIELDS
+from app.services.projection import FieldSelection
 from app.services.user_service import UserService
-from app.api.dependencies import get_current_user
+from app.api.dependencies import get_current_user, get_current_principal, field_selection
 from app.models.user import User
 
 router = APIRouter()
@@ -26,7 +29,7 @@ async def get_current_user_info(
 @router.put("/me", response_model=UserSchema)
 async def update_current_user(
     user_data: UserUpdate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db)
 ):
     """Обновить информацию о текущем пользователе"""
@@ -40,7 +43,7 @@ async def update_current_user(
 @router.post("/favorites")
 async def add_to_favorites(
     favorite_data: UserFavoriteCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db)
 ):
     """Добавить аниме в избранное"""
@@ -54,7 +57,7 @@ async def add_to_favorites(
 @router.delete("/favorites/{anime_id}")
 async def remove_from_favorites(
     anime_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db)
 ):
     """Удалить аниме из избранного"""
@@ -68,36 +71,59 @@ async def remove_from_favorites(
     return {"message": "Removed from favorites"}
 
 
-@router.get("/favorites", response_model=List[AnimeSchema])
+@router.get("/favorites", response_model=Union[List[AnimeSchema], List[AnimeCard]])
 async def get_favorites(
-    current_user: User = Depends(get_current_user),
+    view: AnimeView = Query(AnimeView.full),
+    fields: Optional[FieldSelection] = Depends(field_selection(ANIME_FIELDS)),
+    current_user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db)
 ):
     """Получить список избранного аниме"""
     
     user_service = UserService(db)
-    favorites = await user_service.get_user_favorites(current_user.id)
+    favorites = await user_service.get_user_favorites(current_user.id, view, fields)
     
+    if fields is not None:
+        return ORJSONResponse(favorites)
     return favorites
 
 
-@router.get("/history", response_model=List[WatchHistory])
+@router.get("/history", response_model=WatchHistoryPage)
 async def get_watch_history(
-    current_user: User = Depends(get_current_user),
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(20, ge=1, le=100),
+    current_user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db)
 ):
-    """Получить историю просмотров"""
+    """Получить историю просмотров (курсорная пагинация)"""
     
     user_service = UserService(db)
-    history = await user_service.get_watch_history(current_user.id)
+    try:
+        history = await user_service.get_watch_history(current_user.id, cursor, limit)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
     
     return history
 
 
+@router.get("/history/continue", response_model=List[WatchHistoryItem])
+async def get_continue_watching(
+    limit: int = Query(20, ge=1, le=50),
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db)
+):
+    """Продолжить просмотр: последний эпизод по каждому аниме"""
+    
+    user_service = UserService(db)
+    items = await user_service.get_continue_watching(current_user.id, limit)
+    
+    return items
+
+
 @router.post("/ratings")
 async def rate_anime(
     rating_data: RatingCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db)
 ):
     """Оценить аниме"""
@@ -114,7 +140,7 @@ async def rate_anime(
 
 @router.get("/ratings", response_model=List[Rating])
 async def get_user_ratings(
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db)
 ):
     """Получить рейтинги пользователя"""
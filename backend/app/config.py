@@ -13,11 +13,29 @@ class Settings(BaseSettings):
     
     # Redis
     REDIS_URL: str = "redis://localhost:6379/0"
+    REDIS_MAX_CONNECTIONS: int = 50  # на каждый из двух пулов (текстовый и бинарный)
+    REDIS_POOL_TIMEOUT: float = 1.0  # ожидание свободного соединения, сек
+    REDIS_SOCKET_TIMEOUT: float = 5.0
+    REDIS_HEALTH_CHECK_INTERVAL: int = 30  # PING простаивающего соединения, сек
+    REDIS_SLOW_CALL_SECONDS: float = 0.25  # медленная команда для автомата
+    REDIS_CIRCUIT_OPEN_SECONDS: float = 5.0  # обход Redis после размыкания
+    REDIS_CLIENT_CACHE_ENABLED: bool = True  # локальная копия горячих ключей (Redis 6.2+)
+    REDIS_CLIENT_CACHE_PREFIXES: list = [
+        "anime_detail_json:", "anime_episode_chunks_json:", "genres_json", "studios_json"
+    ]
+    REDIS_CLIENT_CACHE_MAX_KEYS: int = 2000
+    REDIS_CLIENT_CACHE_TTL: int = 60  # верхняя граница жизни локальной копии, сек
     
     # JWT
     JWT_SECRET_KEY: str = "your-secret-key-change-in-production"
     JWT_ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 30
+    
+    # Хеширование паролей (bcrypt в пуле потоков)
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_PENDING: int = 64  # запросов в очереди сверх воркеров
+    PASSWORD_HASH_QUEUE_TIMEOUT: float = 2.0  # ожидание места в очереди, сек
     
     # CORS
     ALLOWED_ORIGINS: list = ["http://localhost:3000", "http://localhost:5173"]
@@ -29,11 +47,50 @@ class Settings(BaseSettings):
     # Настройки парсинга
     PARSER_USER_AGENT: str = "AniStand/1.0"
     PARSER_DELAY: float = 1.0  # Задержка между запросами в секундах
+    PARSER_SLOW_CALL_SECONDS: float = 10.0  # медленный ответ источника
+    PARSER_CIRCUIT_OPEN_SECONDS: float = 60.0  # пауза источника после размыкания
+    
+    # Автоматы отключения зависимостей (скользящее окно ошибок и задержек)
+    CIRCUIT_BREAKER_WINDOW: float = 30.0  # сек
+    CIRCUIT_BREAKER_MIN_CALLS: int = 20  # вызовов в окне до оценки долей
+    CIRCUIT_BREAKER_FAILURE_RATE: float = 0.5
+    CIRCUIT_BREAKER_SLOW_CALL_RATE: float = 0.8
+    CIRCUIT_BREAKER_CONSECUTIVE_FAILURES: int = 5  # ошибок подряд для размыкания
     
     # Кеширование
     CACHE_TTL_ANIME: int = 3600  # 1 час
     CACHE_TTL_EPISODES: int = 1800  # 30 минут
     CACHE_TTL_VIDEO_SOURCES: int = 900  # 15 минут
+    CACHE_TTL_LIBRARY: int = 3600  # состояние библиотеки пользователя
+    CACHE_TTL_COMMENTS: int = 300  # первые страницы веток комментариев
+    ANIME_BATCH_MAX_IDS: int = 100  # ID в одном запросе /anime/batch
+    EPISODES_RANGE_MAX: int = 100  # эпизодов в одном диапазоне from/to
+    EPISODES_PAGE_SIZE: int = 50  # эпизодов на странице по умолчанию (cursor)
+    EPISODE_CHUNK_SIZE: int = 100  # эпизодов в чанке оглавления
+    HTTP_CACHE_ENABLED: bool = True  # Cache-Control для браузеров и CDN
+    
+    # Сжатие ответов
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MIN_SIZE: int = 1024  # байт; меньшие ответы не сжимаются
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4  # сжатие на лету
+    COMPRESSION_CACHED_BROTLI_QUALITY: int = 9  # варианты в кеше сжимаются один раз
+    
+    # Метрики Prometheus (/metrics, нужен пакет prometheus_client)
+    METRICS_ENABLED: bool = True
+    # Каталог для многопроцессного режима (несколько воркеров uvicorn/gunicorn,
+    # prefork Celery); очищается перед запуском сервера
+    METRICS_MULTIPROC_DIR: Optional[str] = None
+    METRICS_CELERY_PORT: int = 9808  # HTTP-порт метрик воркера Celery, 0 - не поднимать
+    
+    # Комментарии
+    COMMENT_REPLIES_PREVIEW: int = 3  # ответов в ветке при выдаче списка
+    COMMENT_STREAM_QUEUE_SIZE: int = 100  # непрочитанных событий на SSE-клиента
+    COMMENT_STREAM_KEEPALIVE: float = 15.0  # секунды между keepalive в SSE
+    
+    # Буфер прогресса просмотра (write-behind)
+    PROGRESS_FLUSH_INTERVAL: float = 5.0  # секунды между сбросами в БД
+    PROGRESS_FLUSH_BATCH_SIZE: int = 500  # пользователей за один сброс
     
     class Config:
         env_file = ".env"
@@ -2,6 +2,7 @@ from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sess
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.pool import NullPool
 from app.config import settings
+from app.utils.metrics import instrument_engine
 
 # Создание асинхронного движка базы данных
 engine = create_async_engine(
@@ -11,6 +12,9 @@ engine = create_async_engine(
     future=True
 )
 
+# Учет количества и времени запросов к БД в метриках
+instrument_engine(engine.sync_engine)
+
 # Создание фабрики сессий
 AsyncSessionLocal = async_sessionmaker(
     engine,
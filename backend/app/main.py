@@ -1,12 +1,23 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from contextlib import asynccontextmanager
 import uvicorn
 
 from app.config import settings
 from app.database import create_tables
-from app.api.routes import anime, episodes, users, auth, comments
+from app.services.cache_service import cache_service
+from app.services.comment_stream import comment_stream
+from app.services.progress_buffer import progress_buffer
+from app.services.pubsub import pubsub_hub
+from app.services.token_service import revocation_registry
+from app.utils.circuit_breaker import circuit_breakers
+from app.utils.metrics import METRICS_ENABLED
+from app.utils.security import PasswordHasherBusy, shutdown_password_hasher
+from app.api.cache_policy import CachePolicyMiddleware
+from app.api.compression import CompressionMiddleware
+from app.api.metrics import MetricsMiddleware, router as metrics_router
+from app.api.routes import anime, episodes, users, auth, comments, library
 
 
 @asynccontextmanager
@@ -15,9 +26,18 @@ async def lifespan(app: FastAPI):
     print("🚀 Starting AniStand API...")
     await create_tables()
     print("✅ Database tables created")
+    await cache_service.connect()
+    await revocation_registry.load()
+    await comment_stream.start()
+    await pubsub_hub.start()
+    progress_buffer.start()
     yield
     # Shutdown
     print("🛑 Shutting down AniStand API...")
+    await progress_buffer.stop()
+    await pubsub_hub.stop()
+    await cache_service.disconnect()
+    shutdown_password_hasher()
 
 
 # Создание FastAPI приложения
@@ -25,6 +45,7 @@ app = FastAPI(
     title=settings.APP_NAME,
     version=settings.VERSION,
     description="API для платформы просмотра аниме AniStand",
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 
@@ -37,16 +58,37 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Cache-Control для браузеров и общих кешей (CDN, nginx)
+if settings.HTTP_CACHE_ENABLED:
+    app.add_middleware(CachePolicyMiddleware)
+
+# Сжатие brotli/gzip; готовые варианты из кеша проходят без пересжатия
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+
+# Метрики Prometheus; внешний слой, чтобы учитывать и сжатие
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 
 # Обработчик исключений
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc):
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=exc.status_code,
         content={"detail": exc.detail, "status_code": exc.status_code}
     )
 
 
+@app.exception_handler(PasswordHasherBusy)
+async def password_hasher_busy_handler(request, exc):
+    return ORJSONResponse(
+        status_code=503,
+        content={"detail": "Authentication service is busy, retry later", "status_code": 503},
+        headers={"Retry-After": "1"}
+    )
+
+
 # Главный роут
 @app.get("/")
 async def root():
@@ -60,7 +102,12 @@ async def root():
 # Health check
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "service": "anistand-api"}
+    return {
+        "status": "healthy",
+        "service": "anistand-api",
+        # Состояние автоматов отключения зависимостей (Redis, источники парсинга)
+        "circuits": {name: breaker.snapshot() for name, breaker in circuit_breakers.items()}
+    }
 
 
 # Подключение роутеров
@@ -69,6 +116,10 @@ app.include_router(anime.router, prefix="/api/v1/anime", tags=["Anime"])
 app.include_router(episodes.router, prefix="/api/v1/episodes", tags=["Episodes"])
 app.include_router(users.router, prefix="/api/v1/users", tags=["Users"])
 app.include_router(comments.router, prefix="/api/v1/comments", tags=["Comments"])
+app.include_router(library.router, prefix="/api/v1/library", tags=["Library"])
+
+if METRICS_ENABLED:
+    app.include_router(metrics_router)
 
 
 if __name__ == "__main__":
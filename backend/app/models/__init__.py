@@ -1,11 +1,11 @@
-from .anime import Anime, Genre, Studio, AnimeGenre, AnimeStudio
+from .anime import Anime, Genre, Studio, AnimeGenre, AnimeStudio, AnimeRatingStats
 from .episode import Episode, VideoSource
-from .user import User, UserFavorite, WatchHistory, Rating
+from .user import User, UserFavorite, LibraryEntry, WatchHistory, Rating
 from .comment import Comment
 
 __all__ = [
-    "Anime", "Genre", "Studio", "AnimeGenre", "AnimeStudio",
+    "Anime", "Genre", "Studio", "AnimeGenre", "AnimeStudio", "AnimeRatingStats",
     "Episode", "VideoSource",
-    "User", "UserFavorite", "WatchHistory", "Rating",
+    "User", "UserFavorite", "LibraryEntry", "WatchHistory", "Rating",
     "Comment"
 ]
@@ -41,6 +41,8 @@ class Anime(Base):
     average_score = Column(Integer)
     popularity = Column(Integer)
     is_adult = Column(Boolean, default=False)
+    comments_count = Column(Integer, nullable=False, default=0, server_default="0")  # без ответов
+    episode_count = Column(Integer, nullable=False, default=0, server_default="0")  # эпизодов в базе
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
@@ -51,6 +53,10 @@ class Anime(Base):
     favorites = relationship("UserFavorite", back_populates="anime", cascade="all, delete-orphan")
     ratings = relationship("Rating", back_populates="anime", cascade="all, delete-orphan")
     comments = relationship("Comment", back_populates="anime", cascade="all, delete-orphan")
+    rating_stats = relationship(
+        "AnimeRatingStats", back_populates="anime", uselist=False,
+        cascade="all, delete-orphan", lazy="selectin"
+    )
 
     def __repr__(self):
         return f"<Anime(id={self.id}, title='{self.title_romaji}')>"
@@ -82,6 +88,43 @@ class Studio(Base):
         return f"<Studio(id={self.id}, name='{self.name}')>"
 
 
+class AnimeRatingStats(Base):
+    """Агрегат пользовательских оценок аниме, обновляется инкрементально"""
+    __tablename__ = "anime_rating_stats"
+
+    anime_id = Column(Integer, ForeignKey('anime.id', ondelete='CASCADE'), primary_key=True)
+    ratings_count = Column(Integer, nullable=False, default=0)
+    ratings_sum = Column(Integer, nullable=False, default=0)
+    # Гистограмма оценок 1-10
+    score_1 = Column(Integer, nullable=False, default=0)
+    score_2 = Column(Integer, nullable=False, default=0)
+    score_3 = Column(Integer, nullable=False, default=0)
+    score_4 = Column(Integer, nullable=False, default=0)
+    score_5 = Column(Integer, nullable=False, default=0)
+    score_6 = Column(Integer, nullable=False, default=0)
+    score_7 = Column(Integer, nullable=False, default=0)
+    score_8 = Column(Integer, nullable=False, default=0)
+    score_9 = Column(Integer, nullable=False, default=0)
+    score_10 = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    # Relationships
+    anime = relationship("Anime", back_populates="rating_stats")
+
+    @property
+    def average(self):
+        if not self.ratings_count:
+            return None
+        return round(self.ratings_sum / self.ratings_count, 2)
+
+    @property
+    def histogram(self):
+        return [getattr(self, f"score_{score}") for score in range(1, 11)]
+
+    def __repr__(self):
+        return f"<AnimeRatingStats(anime_id={self.anime_id}, count={self.ratings_count})>"
+
+
 # Для обратной совместимости (если нужно)
 class AnimeGenre:
     pass
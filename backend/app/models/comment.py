@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -13,9 +13,17 @@ class Comment(Base):
     episode_id = Column(Integer, ForeignKey("episodes.id", ondelete="SET NULL"), nullable=True)
     content = Column(Text, nullable=False)
     parent_id = Column(Integer, ForeignKey("comments.id", ondelete="CASCADE"), nullable=True)
+    reply_count = Column(Integer, nullable=False, default=0, server_default="0")  # прямых ответов
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
+    # Индексы под выборки веток: комментарии аниме/эпизода и ответы по времени
+    __table_args__ = (
+        Index('ix_comments_anime_parent_created', 'anime_id', 'parent_id', 'created_at'),
+        Index('ix_comments_episode_parent_created', 'episode_id', 'parent_id', 'created_at'),
+        Index('ix_comments_parent_created', 'parent_id', 'created_at'),
+    )
+
     # Relationships
     user = relationship("User", back_populates="comments")
     anime = relationship("Anime", back_populates="comments")
@@ -15,6 +15,7 @@ class Episode(Base):
     air_date = Column(Date)
     duration = Column(Integer)  # в секундах
     thumbnail = Column(String(500))
+    comments_count = Column(Integer, nullable=False, default=0, server_default="0")  # без ответов
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
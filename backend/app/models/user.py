@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, UniqueConstraint, CheckConstraint
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, UniqueConstraint, CheckConstraint, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -14,11 +14,14 @@ class User(Base):
     avatar_url = Column(String(500))
     is_active = Column(Boolean, default=True)
     is_verified = Column(Boolean, default=False)
+    # Версия токенов: увеличение отзывает все ранее выданные токены
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
     # Relationships
     favorites = relationship("UserFavorite", back_populates="user", cascade="all, delete-orphan")
+    library_entries = relationship("LibraryEntry", back_populates="user", cascade="all, delete-orphan")
     watch_history = relationship("WatchHistory", back_populates="user", cascade="all, delete-orphan")
     ratings = relationship("Rating", back_populates="user", cascade="all, delete-orphan")
     comments = relationship("Comment", back_populates="user", cascade="all, delete-orphan")
@@ -42,6 +45,31 @@ class UserFavorite(Base):
         return f"<UserFavorite(user_id={self.user_id}, anime_id={self.anime_id})>"
 
 
+class LibraryEntry(Base):
+    __tablename__ = "library_entries"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    anime_id = Column(Integer, ForeignKey("anime.id", ondelete="CASCADE"), primary_key=True)
+    status = Column(String(20), nullable=False)  # watchlist, watching, completed, onHold, dropped
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        CheckConstraint(
+            "status IN ('watchlist', 'watching', 'completed', 'onHold', 'dropped')",
+            name='valid_library_status'
+        ),
+        Index('ix_library_entries_user_status', 'user_id', 'status'),
+    )
+
+    # Relationships
+    user = relationship("User", back_populates="library_entries")
+    anime = relationship("Anime")
+
+    def __repr__(self):
+        return f"<LibraryEntry(user_id={self.user_id}, anime_id={self.anime_id}, status='{self.status}')>"
+
+
 class WatchHistory(Base):
     __tablename__ = "watch_history"
 
@@ -52,8 +80,11 @@ class WatchHistory(Base):
     completed = Column(Boolean, default=False)
     watched_at = Column(DateTime(timezone=True), server_default=func.now())
 
-    # Уникальность по пользователю и эпизоду
-    __table_args__ = (UniqueConstraint('user_id', 'episode_id', name='unique_user_episode'),)
+    # Уникальность по пользователю и эпизоду; индекс для ленты истории
+    __table_args__ = (
+        UniqueConstraint('user_id', 'episode_id', name='unique_user_episode'),
+        Index('ix_watch_history_user_watched_at', user_id, watched_at.desc()),
+    )
 
     # Relationships
     user = relationship("User", back_populates="watch_history")
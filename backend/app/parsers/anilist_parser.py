@@ -61,7 +61,8 @@ class AniListParser(BaseParser):
         variables = {"id": int(anime_id)}
         
         try:
-            async with self.session.post(
+            async with self._request(
+                "POST",
                 self.BASE_URL,
                 json={"query": query, "variables": variables}
             ) as response:
@@ -122,7 +123,8 @@ class AniListParser(BaseParser):
         variables = {"search": query, "perPage": limit}
         
         try:
-            async with self.session.post(
+            async with self._request(
+                "POST",
                 self.BASE_URL,
                 json={"query": search_query, "variables": variables}
             ) as response:
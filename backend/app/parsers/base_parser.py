@@ -1,10 +1,18 @@
 from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
 from typing import List, Dict, Optional
 import asyncio
+import time
 import aiohttp
 from loguru import logger
 
 from app.config import settings
+from app.utils.circuit_breaker import CircuitBreaker, CircuitOpenError, circuit_breaker
+from app.utils.metrics import observe_parser
+
+# Ошибки сети и ответы, означающие проблемы на стороне источника
+UPSTREAM_FAILURES = (aiohttp.ClientError, asyncio.TimeoutError)
+UPSTREAM_FAILURE_STATUSES = {429, 500, 502, 503, 504}
 
 
 class BaseParser(ABC):
@@ -16,6 +24,59 @@ class BaseParser(ABC):
             'User-Agent': settings.PARSER_USER_AGENT
         }
     
+    @property
+    def breaker(self) -> CircuitBreaker:
+        """Автомат источника, общий для всех экземпляров парсера в процессе"""
+        return circuit_breaker(
+            f"parser:{self.__class__.__name__}",
+            slow_call_seconds=settings.PARSER_SLOW_CALL_SECONDS,
+            open_seconds=settings.PARSER_CIRCUIT_OPEN_SECONDS
+        )
+    
+    @asynccontextmanager
+    async def _request(self, method: str, url: str, **kwargs):
+        """HTTP запрос к источнику через автомат.
+
+        Пока источник отдает ошибки или таймауты, запросы отклоняются с
+        CircuitOpenError без обращения к сети
+        """
+        if not self.session:
+            raise RuntimeError("Parser session not initialized. Use async context manager.")
+        
+        breaker = self.breaker
+        breaker.acquire()
+        started = time.monotonic()
+        failed = False
+        try:
+            async with self.session.request(method, url, **kwargs) as response:
+                failed = response.status in UPSTREAM_FAILURE_STATUSES
+                try:
+                    yield response
+                except UPSTREAM_FAILURES:
+                    # Обрыв при чтении тела
+                    failed = True
+                    raise
+        except asyncio.CancelledError:
+            breaker.release()
+            raise
+        except UPSTREAM_FAILURES:
+            self._record_request(breaker, True, started)
+            raise
+        except BaseException:
+            # Ошибка разбора ответа учитывается по статусу, а не как сбой источника
+            self._record_request(breaker, failed, started)
+            raise
+        
+        self._record_request(breaker, failed, started)
+    
+    def _record_request(self, breaker: CircuitBreaker, failed: bool, started: float):
+        duration = time.monotonic() - started
+        if failed:
+            breaker.on_failure(duration)
+        else:
+            breaker.on_success(duration)
+        observe_parser(self.__class__.__name__, failed, duration)
+    
     async def __aenter__(self):
         """Async context manager entry"""
         self.session = aiohttp.ClientSession(
@@ -32,19 +93,20 @@ class BaseParser(ABC):
     async def _make_request(self, url: str, **kwargs) -> Optional[Dict]:
         """Выполнить HTTP запрос с обработкой ошибок"""
         try:
-            if not self.session:
-                raise RuntimeError("Parser session not initialized. Use async context manager.")
+            # Задержка не нужна, если запрос все равно будет отклонен
+            if self.breaker.available:
+                await asyncio.sleep(settings.PARSER_DELAY)
             
-            # Добавляем задержку между запросами
-            await asyncio.sleep(settings.PARSER_DELAY)
-            
-            async with self.session.get(url, **kwargs) as response:
+            async with self._request("GET", url, **kwargs) as response:
                 if response.status == 200:
                     return await response.json()
                 else:
                     logger.warning(f"Request failed with status {response.status}: {url}")
                     return None
                     
+        except CircuitOpenError as e:
+            logger.debug(f"Request skipped: {str(e)}")
+            return None
         except asyncio.TimeoutError:
             logger.error(f"Request timeout: {url}")
             return None
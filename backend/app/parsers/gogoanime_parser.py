@@ -19,7 +19,7 @@ class GogoAnimeParser(BaseParser):
         url = f"{self.BASE_URL}/category/{anime_id}"
         
         try:
-            async with self.session.get(url) as response:
+            async with self._request("GET", url) as response:
                 if response.status != 200:
                     return None
                 
@@ -39,7 +39,7 @@ class GogoAnimeParser(BaseParser):
         params = {"keyword": query}
         
         try:
-            async with self.session.get(url, params=params) as response:
+            async with self._request("GET", url, params=params) as response:
                 if response.status != 200:
                     return []
                 
@@ -79,7 +79,7 @@ class GogoAnimeParser(BaseParser):
         }
         
         try:
-            async with self.session.get(url, params=params) as response:
+            async with self._request("GET", url, params=params) as response:
                 if response.status != 200:
                     return []
                 
@@ -105,7 +105,7 @@ class GogoAnimeParser(BaseParser):
         url = f"{self.BASE_URL}/{episode_id}"
         
         try:
-            async with self.session.get(url) as response:
+            async with self._request("GET", url) as response:
                 if response.status != 200:
                     return []
                 
@@ -134,7 +134,7 @@ class GogoAnimeParser(BaseParser):
         sources = []
         
         try:
-            async with self.session.get(iframe_url) as response:
+            async with self._request("GET", iframe_url) as response:
                 if response.status != 200:
                     return sources
                 
@@ -1,10 +1,12 @@
 from celery import Celery
 from celery.schedules import crontab
+from celery.signals import task_postrun, task_prerun, worker_init
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, and_
 from datetime import datetime, timedelta
 from typing import List, Dict
 import asyncio
+import time
 from loguru import logger
 
 from app.config import settings
@@ -16,6 +18,9 @@ from app.parsers.animepahe_parser import AnimePaheParser
 from app.parsers.gogoanime_parser import GogoAnimeParser
 from app.services.anime_service import AnimeService
 from app.services.episode_service import EpisodeService
+from app.services.rating_service import RatingService
+from app.services.comment_service import CommentService
+from app.utils.metrics import observe_task, start_server
 
 # Создание Celery приложения
 celery_app = Celery(
@@ -36,8 +41,45 @@ celery_app.conf.update(
     task_soft_time_limit=25 * 60,  # 25 минут
     worker_prefetch_multiplier=1,
     worker_max_tasks_per_child=1000,
+    # Соединения с Redis (брокер и результаты) с теми же ограничениями, что у API
+    broker_pool_limit=10,
+    broker_transport_options={
+        'max_connections': settings.REDIS_MAX_CONNECTIONS,
+        'health_check_interval': settings.REDIS_HEALTH_CHECK_INTERVAL,
+        'socket_timeout': settings.REDIS_SOCKET_TIMEOUT,
+        'socket_connect_timeout': settings.REDIS_SOCKET_TIMEOUT,
+        'retry_on_timeout': True,
+    },
+    redis_max_connections=settings.REDIS_MAX_CONNECTIONS,
+    redis_backend_health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
+    redis_socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+    redis_socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+    redis_retry_on_timeout=True,
 )
 
+# Время старта выполняемых задач процесса для метрик длительности
+_task_started: Dict[str, float] = {}
+
+
+@task_prerun.connect
+def _on_task_prerun(task_id=None, **kwargs):
+    _task_started[task_id] = time.perf_counter()
+
+
+@task_postrun.connect
+def _on_task_postrun(task_id=None, task=None, state=None, **kwargs):
+    started = _task_started.pop(task_id, None)
+    if started is not None:
+        observe_task(task.name, state or "UNKNOWN", time.perf_counter() - started)
+
+
+@worker_init.connect
+def _on_worker_init(**kwargs):
+    # Сервер метрик в главном процессе воркера; с prefork метрики дочерних
+    # процессов видны только в многопроцессном режиме (METRICS_MULTIPROC_DIR)
+    start_server(settings.METRICS_CELERY_PORT)
+
+
 # Расписание задач
 celery_app.conf.beat_schedule = {
     'update-anime-metadata': {
@@ -56,6 +98,18 @@ celery_app.conf.beat_schedule = {
         'task': 'app.parsers.scheduler.cleanup_inactive_sources',
         'schedule': crontab(minute=0, hour=2),  # Каждый день в 2:00
     },
+    'reconcile-rating-stats': {
+        'task': 'app.parsers.scheduler.reconcile_rating_stats',
+        'schedule': crontab(minute=30, hour=3),  # Каждый день в 3:30
+    },
+    'reconcile-comment-counters': {
+        'task': 'app.parsers.scheduler.reconcile_comment_counters',
+        'schedule': crontab(minute=45, hour=3),  # Каждый день в 3:45
+    },
+    'reconcile-episode-counts': {
+        'task': 'app.parsers.scheduler.reconcile_episode_counts',
+        'schedule': crontab(minute=50, hour=3),  # Каждый день в 3:50
+    },
 }
 
 
@@ -115,6 +169,48 @@ def cleanup_inactive_sources(self):
         raise self.retry(exc=e, countdown=60, max_retries=3)
 
 
+@celery_app.task(bind=True)
+def reconcile_rating_stats(self):
+    """Сверка агрегатов оценок с таблицей ratings"""
+    logger.info("Starting rating stats reconciliation")
+    
+    try:
+        fixed = asyncio.run(_reconcile_rating_stats())
+        logger.info(f"Rating stats reconciliation completed, fixed {fixed} rows")
+        return {"status": "success", "fixed": fixed}
+    except Exception as e:
+        logger.error(f"Error reconciling rating stats: {str(e)}")
+        raise self.retry(exc=e, countdown=60, max_retries=3)
+
+
+@celery_app.task(bind=True)
+def reconcile_comment_counters(self):
+    """Сверка счетчиков комментариев с таблицей comments"""
+    logger.info("Starting comment counters reconciliation")
+    
+    try:
+        fixed = asyncio.run(_reconcile_comment_counters())
+        logger.info(f"Comment counters reconciliation completed, fixed {fixed} rows")
+        return {"status": "success", "fixed": fixed}
+    except Exception as e:
+        logger.error(f"Error reconciling comment counters: {str(e)}")
+        raise self.retry(exc=e, countdown=60, max_retries=3)
+
+
+@celery_app.task(bind=True)
+def reconcile_episode_counts(self):
+    """Сверка счетчиков эпизодов аниме с таблицей episodes"""
+    logger.info("Starting episode counts reconciliation")
+    
+    try:
+        fixed = asyncio.run(_reconcile_episode_counts())
+        logger.info(f"Episode counts reconciliation completed, fixed {fixed} rows")
+        return {"status": "success", "fixed": fixed}
+    except Exception as e:
+        logger.error(f"Error reconciling episode counts: {str(e)}")
+        raise self.retry(exc=e, countdown=60, max_retries=3)
+
+
 @celery_app.task(bind=True)
 def parse_anime_from_source(self, source: str, anime_id: str):
     """Парсинг конкретного аниме из указанного источника"""
@@ -288,6 +384,30 @@ async def _cleanup_inactive_sources():
         logger.info(f"Marked {inactive_count} sources as inactive")
 
 
+async def _reconcile_rating_stats() -> int:
+    """Пересчитать агрегаты оценок и исправить расхождения"""
+    
+    async with AsyncSessionLocal() as db:
+        rating_service = RatingService(db)
+        return await rating_service.reconcile_stats()
+
+
+async def _reconcile_comment_counters() -> int:
+    """Пересчитать счетчики комментариев и исправить расхождения"""
+    
+    async with AsyncSessionLocal() as db:
+        comment_service = CommentService(db)
+        return await comment_service.reconcile_counters()
+
+
+async def _reconcile_episode_counts() -> int:
+    """Пересчитать счетчики эпизодов и исправить расхождения"""
+    
+    async with AsyncSessionLocal() as db:
+        episode_service = EpisodeService(db)
+        return await episode_service.reconcile_episode_counts()
+
+
 async def _parse_anime_from_source(source: str, anime_id: str) -> Dict:
     """Парсинг аниме из конкретного источника"""
     
@@ -2,3 +2,4 @@ from .anime import *
 from .episode import *
 from .user import *
 from .comment import *
+from .library import *
@@ -1,6 +1,13 @@
 from pydantic import BaseModel, Field
 from typing import Optional, List
 from datetime import date, datetime
+from enum import Enum
+
+
+class AnimeView(str, Enum):
+    """Представление аниме в списках"""
+    compact = "compact"  # карточка каталога
+    full = "full"
 
 
 class GenreBase(BaseModel):
@@ -33,6 +40,15 @@ class Studio(StudioBase):
         from_attributes = True
 
 
+class RatingStats(BaseModel):
+    ratings_count: int = 0
+    average: Optional[float] = None
+    histogram: List[int] = []  # количество оценок 1..10
+
+    class Config:
+        from_attributes = True
+
+
 class AnimeBase(BaseModel):
     title_romaji: str = Field(..., max_length=255)
     title_english: Optional[str] = Field(None, max_length=255)
@@ -90,6 +106,7 @@ class AnimeInDB(AnimeBase):
 class Anime(AnimeInDB):
     genres: List[Genre] = []
     studios: List[Studio] = []
+    rating_stats: Optional[RatingStats] = None
 
 
 class AnimeList(BaseModel):
@@ -100,6 +117,38 @@ class AnimeList(BaseModel):
     pages: int
 
 
+class AnimeDetail(Anime):
+    episode_count: int = 0  # эпизодов в базе; список - /episodes/anime/{id}
+
+
+class AnimeBatch(BaseModel):
+    data: List[AnimeDetail]
+    missing: List[int] = []  # запрошенные ID, которых нет в базе
+
+
+class AnimeCard(BaseModel):
+    """Карточка аниме для сетки каталога"""
+    id: int
+    title_romaji: str
+    title_english: Optional[str] = None
+    cover_image: Optional[str] = None
+    average_score: Optional[int] = None
+    status: Optional[str] = None
+    season_year: Optional[int] = None
+    genres: List[Genre] = []
+
+    class Config:
+        from_attributes = True
+
+
+class AnimeCardList(BaseModel):
+    data: List[AnimeCard]
+    total: int
+    page: int
+    limit: int
+    pages: int
+
+
 class AnimeSearch(BaseModel):
     query: str = Field(..., min_length=1, max_length=255)
     limit: int = Field(10, ge=1, le=50)
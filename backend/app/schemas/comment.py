@@ -31,14 +31,21 @@ class CommentInDB(CommentBase):
 
 class Comment(CommentInDB):
     user: dict  # Будет содержать информацию о пользователе
-    replies: List["Comment"] = []
+    reply_count: int = 0
+    replies: List["Comment"] = []  # первые ответы ветки
+    replies_cursor: Optional[str] = None  # продолжение ветки в /comments/{id}/replies
 
 
 class CommentList(BaseModel):
     data: List[Comment]
     total: int
-    page: int
     limit: int
+    next_cursor: Optional[str] = None
+
+
+class CommentReplies(BaseModel):
+    data: List[Comment]
+    next_cursor: Optional[str] = None
 
 
 # Обновляем модель для поддержки рекурсивных ссылок
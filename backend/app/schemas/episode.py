@@ -1,6 +1,13 @@
 from pydantic import BaseModel, Field
 from typing import Optional, List
 from datetime import date, datetime
+from enum import Enum
+
+
+class EpisodeView(str, Enum):
+    """Представление эпизода в списках"""
+    compact = "compact"  # без источников видео, для сайдбара плеера
+    full = "full"
 
 
 class VideoSourceBase(BaseModel):
@@ -67,9 +74,41 @@ class Episode(EpisodeInDB):
     video_sources: List[VideoSource] = []
 
 
+class EpisodeCard(BaseModel):
+    """Компактная карточка эпизода без источников видео"""
+    id: int
+    episode_number: int
+    title: Optional[str] = None
+    air_date: Optional[date] = None
+    duration: Optional[int] = None
+    thumbnail: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+
 class EpisodeList(BaseModel):
     data: List[Episode]
     total: int
+    next_cursor: Optional[str] = None
+
+
+class EpisodeCardList(BaseModel):
+    data: List[EpisodeCard]
+    total: int
+    next_cursor: Optional[str] = None
+
+
+class EpisodeChunk(BaseModel):
+    start: int  # первый номер эпизода чанка
+    end: int  # последний номер эпизода чанка
+    count: int  # эпизодов в базе внутри чанка
+
+
+class EpisodeChunkIndex(BaseModel):
+    data: List[EpisodeChunk]
+    total: int
+    chunk_size: int
 
 
 class EpisodeSourcesResponse(BaseModel):
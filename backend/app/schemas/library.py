@@ -0,0 +1,57 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from datetime import datetime
+from enum import Enum
+
+
+class LibraryStatus(str, Enum):
+    favorites = "favorites"
+    watchlist = "watchlist"
+    watching = "watching"
+    completed = "completed"
+    on_hold = "onHold"
+    dropped = "dropped"
+
+
+class LibraryUpdate(BaseModel):
+    anime_id: int = Field(..., alias="animeId")
+    status: LibraryStatus
+
+    class Config:
+        populate_by_name = True
+
+
+class UserLibrary(BaseModel):
+    favorites: List[int] = []
+    watchlist: List[int] = []
+    watching: List[int] = []
+    completed: List[int] = []
+    on_hold: List[int] = Field([], alias="onHold")
+    dropped: List[int] = []
+
+    class Config:
+        populate_by_name = True
+
+
+class LibraryProgressUpdate(BaseModel):
+    anime_id: int = Field(..., alias="animeId")
+    episode_number: int = Field(..., alias="episodeNumber", ge=1)
+    progress: int = Field(..., ge=0)  # в секундах
+    completed: bool = False
+
+    class Config:
+        populate_by_name = True
+
+
+class LibraryProgress(BaseModel):
+    anime_id: int = Field(..., alias="animeId")
+    episode_number: int = Field(..., alias="episodeNumber")
+    progress: int
+    last_watched: Optional[datetime] = Field(None, alias="lastWatched")
+
+    class Config:
+        populate_by_name = True
+
+
+class LibraryCheck(BaseModel):
+    exists: bool
@@ -41,16 +41,30 @@ class UserLogin(BaseModel):
 
 class Token(BaseModel):
     access_token: str
+    refresh_token: Optional[str] = None
     token_type: str = "bearer"
 
 
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
+
+
 class TokenData(BaseModel):
     username: Optional[str] = None
 
 
+class Principal(BaseModel):
+    """Пользователь, восстановленный из подписанных claims токена без запроса к БД"""
+    id: int
+    username: str
+    is_active: bool = True
+    token_version: int = 0
+
+
 class UserRegisterResponse(BaseModel):
     user: User
     access_token: str
+    refresh_token: Optional[str] = None
     token_type: str = "bearer"
 
 
@@ -83,6 +97,25 @@ class WatchHistory(BaseModel):
         from_attributes = True
 
 
+class WatchHistoryItem(BaseModel):
+    id: int
+    episode_id: int
+    episode_number: int
+    episode_title: Optional[str] = None
+    anime_id: int
+    anime_title: str
+    anime_title_english: Optional[str] = None
+    cover_image: Optional[str] = None
+    progress: int
+    completed: bool
+    watched_at: datetime
+
+
+class WatchHistoryPage(BaseModel):
+    data: List[WatchHistoryItem]
+    next_cursor: Optional[str] = None
+
+
 class RatingCreate(BaseModel):
     anime_id: int
     score: int = Field(..., ge=1, le=10)
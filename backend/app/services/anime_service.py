@@ -1,24 +1,149 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, or_, and_
+from sqlalchemy import select, func, or_, and_, cast, Numeric, literal_column, type_coerce
+from sqlalchemy.dialects.postgresql import JSON, aggregate_order_by
 from sqlalchemy.orm import selectinload
-from typing import List, Optional
+from datetime import datetime
+from typing import List, Optional, Tuple, Union
 import math
 
-from app.models.anime import Anime, Genre, Studio
-from app.schemas.anime import AnimeCreate, AnimeUpdate, AnimeFilters, AnimeSearch, AnimeList
+from app.config import settings
+from app.models.anime import Anime, Genre, Studio, AnimeRatingStats, anime_genres, anime_studios
+from app.schemas.anime import (
+    Anime as AnimeSchema, AnimeCreate, AnimeUpdate, AnimeFilters, AnimeSearch, AnimeList,
+    AnimeView, AnimeCard, AnimeCardList, AnimeDetail,
+    Genre as GenreSchema, Studio as StudioSchema, RatingStats as RatingStatsSchema
+)
+from app.services.payload_cache import payload_cache, make_payload, ANIME_DETAIL_KEY
+from app.services.projection import FieldSelection, json_object, schema_fields
+
+
+# Поля, доступные для выбора через ?fields=
+ANIME_FIELDS: FieldSelection = schema_fields(AnimeSchema, {
+    "genres": GenreSchema,
+    "studios": StudioSchema,
+    "rating_stats": RatingStatsSchema,
+})
+
+
+def _related_json(model, link_table, link_column: str, keys: Tuple[str, ...] = ("id", "name")):
+    """Связанные жанры/студии аниме JSON-массивом [{id, name}] (или только keys)"""
+    item = json_object(**{key: getattr(model, key) for key in keys})
+    subquery = (
+        select(
+            func.coalesce(
+                func.json_agg(aggregate_order_by(item, model.name)),
+                literal_column("'[]'::json")
+            )
+        )
+        .select_from(link_table.join(model, link_table.c[link_column] == model.id))
+        .where(link_table.c.anime_id == Anime.id)
+        .correlate(Anime)
+        .scalar_subquery()
+    )
+    return type_coerce(subquery, JSON)
+
+
+def _rating_stats_json(keys: Optional[Tuple[str, ...]] = None):
+    """Агрегат оценок аниме в форме схемы RatingStats (NULL, если оценок нет)"""
+    stats = AnimeRatingStats
+    values = {
+        "ratings_count": stats.ratings_count,
+        "average": func.round(
+            cast(stats.ratings_sum, Numeric) / func.nullif(stats.ratings_count, 0), 2
+        ),
+        "histogram": func.json_build_array(
+            *[getattr(stats, f"score_{score}") for score in range(1, 11)]
+        ),
+    }
+    if keys is not None:
+        values = {key: values[key] for key in keys}
+
+    subquery = (
+        select(json_object(**values))
+        .where(stats.anime_id == Anime.id)
+        .correlate(Anime)
+        .scalar_subquery()
+    )
+    return type_coerce(subquery, JSON)
+
+
+def anime_list_query(view: AnimeView = AnimeView.full, fields: Optional[FieldSelection] = None):
+    """Core-выборка аниме для списков без гидрации ORM-объектов.
+
+    Выбираются только колонки схемы представления; жанры, студии и
+    агрегат оценок собираются в JSON на стороне БД, поэтому строки
+    сразу подходят для ответа. fields (см. ANIME_FIELDS) заменяет
+    представление: в запрос попадают только выбранные колонки и связи.
+    """
+    if fields is not None:
+        columns = [getattr(Anime, name) for name in fields if name in Anime.__table__.c]
+        related = []
+        if "genres" in fields:
+            related.append(_related_json(Genre, anime_genres, "genre_id", fields["genres"]).label("genres"))
+        if "studios" in fields:
+            related.append(_related_json(Studio, anime_studios, "studio_id", fields["studios"]).label("studios"))
+        if "rating_stats" in fields:
+            related.append(_rating_stats_json(fields["rating_stats"]).label("rating_stats"))
+        return select(*columns, *related)
+
+    schema = AnimeCard if view == AnimeView.compact else AnimeSchema
+    columns = [
+        getattr(Anime, name) for name in schema.model_fields
+        if name in Anime.__table__.c
+    ]
+
+    related = [_related_json(Genre, anime_genres, "genre_id").label("genres")]
+    if view == AnimeView.full:
+        related += [
+            _related_json(Studio, anime_studios, "studio_id").label("studios"),
+            _rating_stats_json().label("rating_stats"),
+        ]
+
+    return select(*columns, *related)
+
+
+def anime_detail_query():
+    """Core-выборка шапки аниме для /anime/{id} и /anime/batch.
+
+    Эпизоды не загружаются - только их счетчик, поэтому стоимость
+    запроса не зависит от длины сериала. stats_updated_at нужен для
+    Last-Modified и в ответ не входит.
+    """
+    stats_updated_at = (
+        select(AnimeRatingStats.updated_at)
+        .where(AnimeRatingStats.anime_id == Anime.id)
+        .correlate(Anime)
+        .scalar_subquery()
+    )
+    return anime_list_query(AnimeView.full).add_columns(
+        Anime.episode_count, stats_updated_at.label("stats_updated_at")
+    )
+
+
+def _detail_payload(row) -> Tuple[bytes, Optional[datetime]]:
+    """Сериализовать строку anime_detail_query и посчитать время изменения"""
+    row = dict(row)
+    # Агрегат оценок входит в ответ, но не меняет anime.updated_at
+    modified = max(filter(None, [row["updated_at"], row.pop("stats_updated_at")]), default=None)
+    return AnimeDetail.model_validate(row).model_dump_json().encode(), modified
 
 
 class AnimeService:
     def __init__(self, db: AsyncSession):
         self.db = db
 
-    async def get_anime_list(self, filters: AnimeFilters) -> AnimeList:
-        """Получить список аниме с фильтрами и пагинацией"""
+    async def get_anime_list(
+        self,
+        filters: AnimeFilters,
+        view: AnimeView = AnimeView.full,
+        fields: Optional[FieldSelection] = None
+    ) -> Union[AnimeList, AnimeCardList, dict]:
+        """Получить список аниме с фильтрами и пагинацией.
+
+        С fields возвращается словарь только с выбранными полями.
+        """
         
-        query = select(Anime).options(
-            selectinload(Anime.genres),
-            selectinload(Anime.studios)
-        )
+        query = anime_list_query(view, fields)
         
         # Применяем фильтры
         conditions = []
@@ -58,10 +183,28 @@ class AnimeService:
         query = query.offset(offset).limit(filters.limit)
         
         result = await self.db.execute(query)
-        anime_list = result.scalars().all()
+        anime_list = [dict(row) for row in result.mappings()]
         
         pages = math.ceil(total / filters.limit)
         
+        if fields is not None:
+            return {
+                "data": anime_list,
+                "total": total,
+                "page": filters.page,
+                "limit": filters.limit,
+                "pages": pages
+            }
+        
+        if view == AnimeView.compact:
+            return AnimeCardList(
+                data=anime_list,
+                total=total,
+                page=filters.page,
+                limit=filters.limit,
+                pages=pages
+            )
+        
         return AnimeList(
             data=anime_list,
             total=total,
@@ -70,13 +213,15 @@ class AnimeService:
             pages=pages
         )
 
-    async def search_anime(self, search_params: AnimeSearch) -> List[Anime]:
+    async def search_anime(
+        self,
+        search_params: AnimeSearch,
+        view: AnimeView = AnimeView.full,
+        fields: Optional[FieldSelection] = None
+    ) -> List[dict]:
         """Поиск аниме по названию"""
         
-        query = select(Anime).options(
-            selectinload(Anime.genres),
-            selectinload(Anime.studios)
-        ).where(
+        query = anime_list_query(view, fields).where(
             or_(
                 Anime.title_romaji.ilike(f"%{search_params.query}%"),
                 Anime.title_english.ilike(f"%{search_params.query}%"),
@@ -85,20 +230,56 @@ class AnimeService:
         ).limit(search_params.limit)
         
         result = await self.db.execute(query)
-        return result.scalars().all()
+        return [dict(row) for row in result.mappings()]
 
     async def get_anime_by_id(self, anime_id: int) -> Optional[Anime]:
         """Получить аниме по ID"""
         
         query = select(Anime).options(
             selectinload(Anime.genres),
-            selectinload(Anime.studios),
-            selectinload(Anime.episodes_list)
+            selectinload(Anime.studios)
         ).where(Anime.id == anime_id)
         
         result = await self.db.execute(query)
         return result.scalar_one_or_none()
 
+    async def get_anime_detail_json(self, anime_id: int) -> Optional[Tuple[bytes, Optional[datetime]]]:
+        """Шапка аниме в виде готового JSON и время ее изменения"""
+        
+        result = await self.db.execute(anime_detail_query().where(Anime.id == anime_id))
+        row = result.mappings().one_or_none()
+        
+        if row is None:
+            return None
+        
+        return _detail_payload(row)
+
+    async def get_anime_batch_json(self, anime_ids: List[int]) -> Tuple[List[bytes], List[int]]:
+        """Детали нескольких аниме в виде готового JSON в порядке запроса.
+
+        Тела берутся из кеша деталей одним pipeline, промахи добираются
+        одним запросом с IN и дописываются в кеш. Возвращает тела и ID,
+        которых нет в базе.
+        """
+        keys = [ANIME_DETAIL_KEY.format(anime_id=anime_id) for anime_id in anime_ids]
+        bodies = dict(zip(anime_ids, await payload_cache.get_bodies(keys)))
+        misses = [anime_id for anime_id, body in bodies.items() if body is None]
+        
+        if misses:
+            result = await self.db.execute(anime_detail_query().where(Anime.id.in_(misses)))
+            
+            fresh = {}
+            for row in result.mappings():
+                body, modified = _detail_payload(row)
+                bodies[row["id"]] = body
+                fresh[ANIME_DETAIL_KEY.format(anime_id=row["id"])] = make_payload(body, modified)
+            
+            await payload_cache.store_many(fresh, settings.CACHE_TTL_ANIME)
+        
+        found = [bodies[anime_id] for anime_id in anime_ids if bodies[anime_id] is not None]
+        missing = [anime_id for anime_id in anime_ids if bodies[anime_id] is None]
+        return found, missing
+
     async def create_anime(self, anime_data: AnimeCreate) -> Anime:
         """Создать новое аниме"""
         
@@ -145,6 +326,7 @@ class AnimeService:
         
         await self.db.commit()
         await self.db.refresh(anime)
+        await payload_cache.invalidate(ANIME_DETAIL_KEY.format(anime_id=anime_id))
         
         return anime
 
@@ -161,5 +343,6 @@ class AnimeService:
         
         await self.db.delete(anime)
         await self.db.commit()
+        await payload_cache.invalidate(ANIME_DETAIL_KEY.format(anime_id=anime_id))
         
         return True
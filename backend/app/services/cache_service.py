@@ -1,27 +1,95 @@
+import asyncio
 import json
 import pickle
-from typing import Any, Optional, Union
-import aioredis
+from typing import Any, Dict, List, Optional, Sequence, Union
 from loguru import logger
+from redis.asyncio import BlockingConnectionPool, Redis
+from redis.asyncio.client import Pipeline
+from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
 
 from app.config import settings
+from app.services.client_cache import ClientSideCache
+from app.utils.circuit_breaker import CircuitBreaker, circuit_breaker
+from app.utils.metrics import count_cache, count_client_cache
+
+# Ошибки, означающие недоступность Redis (а не ошибку команды)
+REDIS_FAILURES = (RedisConnectionError, RedisTimeoutError, OSError, asyncio.TimeoutError)
+
+
+class _GuardedPipeline(Pipeline):
+    """Pipeline, выполнение которого проходит через автомат Redis"""
+
+    breaker: CircuitBreaker
+
+    async def execute(self, raise_on_error: bool = True):
+        async with self.breaker.guard(REDIS_FAILURES):
+            return await super().execute(raise_on_error)
+
+
+class _GuardedRedis(Redis):
+    """Клиент Redis, команды и pipeline которого проходят через автомат"""
+
+    breaker: CircuitBreaker
+
+    async def execute_command(self, *args, **options):
+        async with self.breaker.guard(REDIS_FAILURES):
+            return await super().execute_command(*args, **options)
+
+    def pipeline(self, transaction: bool = True, shard_hint: Optional[str] = None) -> Pipeline:
+        pipe = _GuardedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+        pipe.breaker = self.breaker
+        return pipe
 
 
 class CacheService:
-    """Сервис для работы с Redis кешем"""
+    """Сервис для работы с Redis кешем.
+
+    Все пользователи Redis в процессе API (кеш, pub/sub, токены, буферы)
+    работают через два пула фиксированного размера: с декодированием
+    ответов и без него. При исчерпании пула запрос ждет свободное
+    соединение REDIS_POOL_TIMEOUT секунд, а не открывает новое.
+
+    Команды обоих клиентов проходят через общий автомат "redis": пока
+    Redis недоступен или медленный, is_connected возвращает False и
+    сервисы сразу уходят в обход кеша, не дожидаясь таймаутов.
+    """
     
     def __init__(self):
-        self.redis: Optional[aioredis.Redis] = None
+        self.redis: Optional[Redis] = None
+        # Клиент без декодирования для готовых (сериализованных) ответов
+        self.binary: Optional[Redis] = None
+        self.client_cache: Optional[ClientSideCache] = None
+        self.breaker = circuit_breaker(
+            "redis",
+            slow_call_seconds=settings.REDIS_SLOW_CALL_SECONDS,
+            open_seconds=settings.REDIS_CIRCUIT_OPEN_SECONDS
+        )
         self._connected = False
     
+    def _client(self, decode_responses: bool) -> Redis:
+        client = _GuardedRedis(connection_pool=self._pool(decode_responses))
+        client.breaker = self.breaker
+        return client
+    
+    @staticmethod
+    def _pool(decode_responses: bool) -> BlockingConnectionPool:
+        return BlockingConnectionPool.from_url(
+            settings.REDIS_URL,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            timeout=settings.REDIS_POOL_TIMEOUT,
+            health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_keepalive=True,
+            retry_on_timeout=True,
+            decode_responses=decode_responses
+        )
+    
     async def connect(self):
         """Подключение к Redis"""
         try:
-            self.redis = aioredis.from_url(
-                settings.REDIS_URL,
-                encoding="utf-8",
-                decode_responses=True
-            )
+            self.redis = self._client(decode_responses=True)
+            self.binary = self._client(decode_responses=False)
             # Проверяем подключение
             await self.redis.ping()
             self._connected = True
@@ -29,21 +97,79 @@ class CacheService:
         except Exception as e:
             logger.error(f"Failed to connect to Redis: {str(e)}")
             self._connected = False
+            return
+        
+        if settings.REDIS_CLIENT_CACHE_ENABLED:
+            await self._start_client_cache()
+    
+    async def _start_client_cache(self):
+        client_cache = ClientSideCache(
+            self.redis,
+            prefixes=settings.REDIS_CLIENT_CACHE_PREFIXES,
+            max_keys=settings.REDIS_CLIENT_CACHE_MAX_KEYS,
+            ttl=settings.REDIS_CLIENT_CACHE_TTL,
+            check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL
+        )
+        try:
+            await client_cache.start()
+            self.client_cache = client_cache
+        except Exception as e:
+            # Redis < 6.2 или запрещенный CLIENT: работаем без локальной копии
+            logger.warning(f"Client-side caching disabled: {str(e)}")
     
     async def disconnect(self):
         """Отключение от Redis"""
+        if self.client_cache:
+            await self.client_cache.stop()
+            self.client_cache = None
         if self.redis:
-            await self.redis.close()
+            await self.redis.aclose(close_connection_pool=True)
             self._connected = False
+        if self.binary:
+            await self.binary.aclose(close_connection_pool=True)
             logger.info("Disconnected from Redis")
     
+    @property
+    def is_connected(self) -> bool:
+        """Доступен ли Redis (подключен и автомат не разомкнут)"""
+        return self._connected and self.breaker.available
+    
+    def pipeline(self, transaction: bool = False, binary: bool = False) -> Pipeline:
+        """Pipeline на одном соединении пула: команды уходят одним round-trip"""
+        client = self.binary if binary else self.redis
+        return client.pipeline(transaction=transaction)
+    
+    async def hmget_cached(self, key: str, *fields: str) -> List[Optional[bytes]]:
+        """HMGET по бинарному клиенту с локальной копией для горячих ключей.
+
+        Ключи из REDIS_CLIENT_CACHE_PREFIXES отдаются из памяти воркера,
+        пока Redis не сообщит об их изменении. Ошибки пробрасываются, как у
+        обычного hmget.
+        """
+        client_cache = self.client_cache
+        if client_cache is None or not client_cache.tracks(key):
+            return await self.binary.hmget(key, *fields)
+        
+        values = client_cache.get(key, fields)
+        count_client_cache(hit=values is not None)
+        if values is not None:
+            return values
+        
+        generation = client_cache.generation
+        values = await self.binary.hmget(key, *fields)
+        # Промахи не запоминаем: перебор несуществующих ID вытеснял бы горячие ключи
+        if any(value is not None for value in values):
+            client_cache.put(key, fields, values, generation)
+        return values
+    
     async def get(self, key: str, default: Any = None) -> Any:
         """Получить значение из кеша"""
-        if not self._connected:
+        if not self.is_connected:
             return default
         
         try:
             value = await self.redis.get(key)
+            count_cache(key, hit=value is not None)
             if value is None:
                 return default
             
@@ -65,7 +191,7 @@ class CacheService:
         ttl: Optional[int] = None
     ) -> bool:
         """Установить значение в кеш"""
-        if not self._connected:
+        if not self.is_connected:
             return False
         
         try:
@@ -89,9 +215,69 @@ class CacheService:
             logger.error(f"Error setting cache key {key}: {str(e)}")
             return False
     
+    async def get_many(self, keys: Sequence[str]) -> List[Any]:
+        """Получить несколько значений одним MGET"""
+        if not keys or not self.is_connected:
+            return [None] * len(keys)
+        
+        try:
+            values = await self.redis.mget(keys)
+        except Exception as e:
+            logger.error(f"Error getting cache keys: {str(e)}")
+            return [None] * len(keys)
+        
+        result = []
+        for key, value in zip(keys, values):
+            count_cache(key, hit=value is not None)
+            try:
+                result.append(json.loads(value) if value is not None else None)
+            except json.JSONDecodeError:
+                result.append(value)
+        return result
+    
+    async def set_many(self, values: Dict[str, Any], ttl: Optional[int] = None) -> bool:
+        """Установить несколько значений одним pipeline"""
+        if not values or not self.is_connected:
+            return False
+        
+        try:
+            async with self.pipeline() as pipe:
+                for key, value in values.items():
+                    pipe.set(key, json.dumps(value, ensure_ascii=False), ex=ttl)
+                await pipe.execute()
+            return True
+        except Exception as e:
+            logger.error(f"Error setting cache keys: {str(e)}")
+            return False
+    
+    async def get_raw(self, key: str) -> Optional[bytes]:
+        """Получить сериализованное значение без декодирования"""
+        if not self.is_connected:
+            return None
+        
+        try:
+            value = await self.binary.get(key)
+            count_cache(key, hit=value is not None)
+            return value
+        except Exception as e:
+            logger.error(f"Error getting cache key {key}: {str(e)}")
+            return None
+    
+    async def set_raw(self, key: str, value: bytes, ttl: Optional[int] = None) -> bool:
+        """Сохранить уже сериализованное значение"""
+        if not self.is_connected:
+            return False
+        
+        try:
+            await self.binary.set(key, value, ex=ttl)
+            return True
+        except Exception as e:
+            logger.error(f"Error setting cache key {key}: {str(e)}")
+            return False
+    
     async def delete(self, key: str) -> bool:
         """Удалить ключ из кеша"""
-        if not self._connected:
+        if not self.is_connected:
             return False
         
         try:
@@ -103,7 +289,7 @@ class CacheService:
     
     async def exists(self, key: str) -> bool:
         """Проверить существование ключа"""
-        if not self._connected:
+        if not self.is_connected:
             return False
         
         try:
@@ -115,7 +301,7 @@ class CacheService:
     
     async def expire(self, key: str, ttl: int) -> bool:
         """Установить TTL для ключа"""
-        if not self._connected:
+        if not self.is_connected:
             return False
         
         try:
@@ -127,23 +313,29 @@ class CacheService:
     
     async def clear_pattern(self, pattern: str) -> int:
         """Удалить все ключи по паттерну"""
-        if not self._connected:
+        if not self.is_connected:
             return 0
         
         try:
-            keys = await self.redis.keys(pattern)
-            if keys:
-                result = await self.redis.delete(*keys)
-                return result
-            return 0
+            # SCAN вместо KEYS: не блокирует Redis на всем keyspace
+            deleted = 0
+            batch = []
+            async for key in self.redis.scan_iter(match=pattern, count=500):
+                batch.append(key)
+                if len(batch) >= 500:
+                    deleted += await self.redis.unlink(*batch)
+                    batch = []
+            if batch:
+                deleted += await self.redis.unlink(*batch)
+            return deleted
         except Exception as e:
             logger.error(f"Error clearing cache pattern {pattern}: {str(e)}")
             return 0
     
     async def get_stats(self) -> dict:
         """Получить статистику Redis"""
-        if not self._connected:
-            return {"connected": False}
+        if not self.is_connected:
+            return {"connected": False, "circuit": self.breaker.snapshot()}
         
         try:
             info = await self.redis.info()
@@ -158,7 +350,18 @@ class CacheService:
                     info.get("keyspace_hits", 0) / 
                     max(info.get("keyspace_hits", 0) + info.get("keyspace_misses", 0), 1) * 100, 
                     2
-                )
+                ),
+                "pool": {
+                    "max_connections": settings.REDIS_MAX_CONNECTIONS,
+                    "in_use": len(self.redis.connection_pool._in_use_connections),
+                    "binary_in_use": len(self.binary.connection_pool._in_use_connections)
+                },
+                "circuit": self.breaker.snapshot(),
+                "client_cache": {
+                    "active": self.client_cache is not None and self.client_cache.active,
+                    "hits": self.client_cache.hits if self.client_cache else 0,
+                    "misses": self.client_cache.misses if self.client_cache else 0
+                }
             }
         except Exception as e:
             logger.error(f"Error getting Redis stats: {str(e)}")
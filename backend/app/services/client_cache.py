@@ -0,0 +1,190 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Sequence, Set, Tuple
+
+from loguru import logger
+from redis.asyncio import Redis
+
+# Канал, в который Redis шлет инвалидации при CLIENT TRACKING ... REDIRECT
+INVALIDATE_CHANNEL = "__redis__:invalidate"
+
+
+class ClientSideCache:
+    """Локальная копия горячих ключей Redis в памяти воркера.
+
+    Ключи с префиксами из prefixes отслеживаются через CLIENT TRACKING в
+    режиме BCAST: Redis сообщает об изменении любого такого ключа (в том
+    числе из других воркеров и Celery), и локальная копия сбрасывается.
+    Инвалидации приходят на отдельное pub/sub-соединение (REDIRECT), поэтому
+    работает и с RESP2. При потере любого из двух соединений кеш очищается
+    целиком и отслеживание включается заново.
+    """
+
+    def __init__(
+        self,
+        client: Redis,
+        prefixes: Sequence[str],
+        max_keys: int,
+        ttl: float,
+        check_interval: float
+    ):
+        self._client = client
+        self.prefixes = tuple(prefixes)
+        self.max_keys = max_keys
+        self.ttl = ttl
+        self.check_interval = check_interval
+        # (ключ, поля) -> (значение, срок годности)
+        self._entries: "OrderedDict[Tuple[str, Tuple[str, ...]], Tuple[Any, float]]" = OrderedDict()
+        self._fields: Dict[str, Set[Tuple[str, ...]]] = {}
+        # Растет с каждой инвалидацией; ответ, прочитанный до нее, не сохраняется
+        self._generation = 0
+        self._pubsub = None
+        self._tracker = None
+        self._task: Optional[asyncio.Task] = None
+        self._active = False
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def active(self) -> bool:
+        """Включено ли отслеживание (без него локальная копия не используется)"""
+        return self._active
+
+    def tracks(self, key: str) -> bool:
+        """Отслеживается ли ключ"""
+        return self._active and key.startswith(self.prefixes)
+
+    def get(self, key: str, fields: Tuple[str, ...]) -> Optional[Any]:
+        """Локальное значение или None"""
+        entry = self._entries.get((key, fields))
+        if entry is None or entry[1] < time.monotonic():
+            self.misses += 1
+            return None
+        self._entries.move_to_end((key, fields))
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key: str, fields: Tuple[str, ...], value: Any, generation: int):
+        """Сохранить значение, если с начала чтения не было инвалидаций"""
+        if generation != self._generation or not self._active:
+            return
+
+        self._entries[(key, fields)] = (value, time.monotonic() + self.ttl)
+        self._entries.move_to_end((key, fields))
+        self._fields.setdefault(key, set()).add(fields)
+        while len(self._entries) > self.max_keys:
+            (old_key, old_fields), _ = self._entries.popitem(last=False)
+            self._drop_field(old_key, old_fields)
+
+    @property
+    def generation(self) -> int:
+        """Номер инвалидации; берется до чтения из Redis и передается в put"""
+        return self._generation
+
+    def invalidate(self, keys: Optional[Sequence[str]] = None):
+        """Сбросить ключи; None - сбросить все (FLUSHDB или потеря соединения)"""
+        self._generation += 1
+        if keys is None:
+            self._entries.clear()
+            self._fields.clear()
+            return
+
+        for key in keys:
+            for fields in self._fields.pop(key, ()):
+                self._entries.pop((key, fields), None)
+
+    def _drop_field(self, key: str, fields: Tuple[str, ...]):
+        known = self._fields.get(key)
+        if known is not None:
+            known.discard(fields)
+            if not known:
+                del self._fields[key]
+
+    async def start(self):
+        """Включить отслеживание и запустить прослушивание инвалидаций"""
+        if self._task is not None:
+            return
+        await self._enable()
+        self._task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        """Остановить прослушивание и освободить соединения"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._disable()
+
+    async def _enable(self):
+        self._pubsub = self._client.pubsub()
+        await self._pubsub.subscribe(INVALIDATE_CHANNEL)
+        # Отслеживание привязано к соединению: держим его вне пула до остановки
+        self._tracker = await self._client.connection_pool.get_connection("CLIENT")
+        try:
+            redirect = await self._execute(self._pubsub.connection, "CLIENT", "ID")
+            prefixes = [part for prefix in self.prefixes for part in ("PREFIX", prefix)]
+            await self._execute(
+                self._tracker, "CLIENT", "TRACKING", "ON", "REDIRECT", redirect, "BCAST", *prefixes
+            )
+        except Exception:
+            await self._disable()
+            raise
+
+        self.invalidate()
+        self._active = True
+
+    async def _disable(self):
+        self._active = False
+        self.invalidate()
+        if self._tracker is not None:
+            # Разрываем соединение, чтобы в пул не вернулось соединение с отслеживанием
+            await self._tracker.disconnect()
+            await self._client.connection_pool.release(self._tracker)
+            self._tracker = None
+        if self._pubsub is not None:
+            await self._pubsub.close()
+            self._pubsub = None
+
+    @staticmethod
+    async def _execute(connection, *args):
+        await connection.send_command(*args)
+        return await connection.read_response()
+
+    async def _check_tracking(self) -> bool:
+        """Проверить, что отслеживание живо и перенаправляется на наш pub/sub"""
+        info = await self._execute(self._tracker, "CLIENT", "TRACKINGINFO")
+        # RESP2 отдает плоский список: [name, value, name, value, ...]
+        info = dict(zip(info[::2], info[1::2]))
+        flags = info.get("flags") or []
+        return "on" in flags and "broken_redirect" not in flags
+
+    async def _listen(self):
+        checked_at = time.monotonic()
+        while True:
+            try:
+                if time.monotonic() - checked_at >= self.check_interval:
+                    checked_at = time.monotonic()
+                    if not await self._check_tracking():
+                        raise ConnectionError("client tracking is off")
+
+                message = await self._pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=1.0
+                )
+                if message is None or message["type"] != "message":
+                    continue
+                # data - список ключей или None при FLUSHDB/FLUSHALL
+                self.invalidate(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Client cache tracking error: {str(e)}")
+                await self._disable()
+                await asyncio.sleep(1.0)
+                try:
+                    await self._enable()
+                except Exception as e:
+                    logger.error(f"Failed to re-enable client tracking: {str(e)}")
@@ -0,0 +1,87 @@
+from typing import Iterable, Optional, Tuple
+
+from loguru import logger
+
+from app.config import settings
+from app.services.cache_service import cache_service
+from app.utils.compression import precompress
+from app.utils.metrics import count_cache
+
+
+class CommentCache:
+    """Кеш первых страниц веток комментариев в виде готового JSON.
+
+    Hash comments:{scope}:{scope_id}: limit -> сериализованная страница,
+    limit:br / limit:gzip -> ее сжатые варианты. scope - anime, episode или
+    replies (ответы на комментарий). Запись комментария сбрасывает hash
+    целиком для всех затронутых веток.
+    """
+
+    KEY = "comments:{scope}:{scope_id}"
+
+    async def get_page(
+        self,
+        scope: str,
+        scope_id: int,
+        limit: int,
+        encoding: Optional[str] = None
+    ) -> Optional[Tuple[bytes, Optional[str]]]:
+        """Получить первую страницу ветки и ее Content-Encoding"""
+        if not cache_service.is_connected:
+            return None
+
+        fields = [str(limit)]
+        if encoding is not None:
+            fields.append(f"{limit}:{encoding}")
+
+        key = self.KEY.format(scope=scope, scope_id=scope_id)
+        try:
+            values = await cache_service.binary.hmget(key, *fields)
+        except Exception as e:
+            logger.error(f"Error reading comments cache: {str(e)}")
+            return None
+
+        count_cache(key, hit=any(value is not None for value in values))
+
+        if len(values) > 1 and values[1] is not None:
+            return values[1], encoding
+        if values[0] is not None:
+            return values[0], None
+        return None
+
+    async def store_page(self, scope: str, scope_id: int, limit: int, payload: bytes) -> None:
+        """Сохранить сериализованную первую страницу ветки"""
+        if not cache_service.is_connected:
+            return
+
+        key = self.KEY.format(scope=scope, scope_id=scope_id)
+        mapping = {str(limit): payload}
+        for encoding, variant in precompress(payload).items():
+            mapping[f"{limit}:{encoding}"] = variant
+
+        try:
+            async with cache_service.pipeline(transaction=True, binary=True) as pipe:
+                pipe.hset(key, mapping=mapping)
+                pipe.expire(key, settings.CACHE_TTL_COMMENTS)
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"Error storing comments cache: {str(e)}")
+
+    async def invalidate(self, threads: Iterable[Tuple[str, Optional[int]]]) -> None:
+        """Сбросить кеш веток; пары с пустым scope_id пропускаются"""
+        keys = {
+            self.KEY.format(scope=scope, scope_id=scope_id)
+            for scope, scope_id in threads
+            if scope_id is not None
+        }
+        if not keys or not cache_service.is_connected:
+            return
+
+        try:
+            await cache_service.redis.delete(*keys)
+        except Exception as e:
+            logger.error(f"Error invalidating comments cache: {str(e)}")
+
+
+# Глобальный экземпляр кеша комментариев
+comment_cache = CommentCache()
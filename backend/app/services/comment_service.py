@@ -1,171 +1,286 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_
-from sqlalchemy.orm import selectinload
-from typing import List, Optional
-import math
+from sqlalchemy import select, update, delete, func, and_, or_, true
+from sqlalchemy.orm import aliased
+from datetime import datetime
+from typing import List, Optional, Tuple
 
+from app.config import settings
+from app.models.anime import Anime
 from app.models.comment import Comment
+from app.models.episode import Episode
 from app.models.user import User
-from app.schemas.comment import CommentCreate, CommentUpdate, CommentList
+from app.schemas.comment import (
+    Comment as CommentSchema, CommentCreate, CommentUpdate, CommentList, CommentReplies
+)
+from app.services.comment_cache import comment_cache
+from app.services.comment_stream import comment_stream
+from app.utils.helpers import encode_cursor, decode_cursor
 
 
 class CommentService:
     def __init__(self, db: AsyncSession):
         self.db = db
 
-    async def get_anime_comments(self, anime_id: int, page: int = 1, limit: int = 20) -> CommentList:
-        """Получить комментарии к аниме с пагинацией"""
-        
-        # Получаем только родительские комментарии (без ответов)
-        query = select(Comment).where(
-            and_(
-                Comment.anime_id == anime_id,
-                Comment.parent_id.is_(None)
-            )
-        ).options(
-            selectinload(Comment.user),
-            selectinload(Comment.replies).selectinload(Comment.user)
-        ).order_by(Comment.created_at.desc())
-        
-        # Подсчет общего количества
-        count_query = select(func.count(Comment.id)).where(
-            and_(
-                Comment.anime_id == anime_id,
-                Comment.parent_id.is_(None)
-            )
+    @staticmethod
+    def _comment_query():
+        """Колонки комментария с автором"""
+        return select(
+            Comment.id,
+            Comment.user_id,
+            Comment.anime_id,
+            Comment.episode_id,
+            Comment.content,
+            Comment.parent_id,
+            Comment.created_at,
+            Comment.updated_at,
+            User.username,
+            User.avatar_url,
+            Comment.reply_count
+        ).join(User, Comment.user_id == User.id)
+
+    @staticmethod
+    def _to_dict(row) -> dict:
+        return {
+            "id": row.id,
+            "user_id": row.user_id,
+            "anime_id": row.anime_id,
+            "episode_id": row.episode_id,
+            "content": row.content,
+            "parent_id": row.parent_id,
+            "created_at": row.created_at,
+            "updated_at": row.updated_at,
+            "user": {
+                "id": row.user_id,
+                "username": row.username,
+                "avatar_url": row.avatar_url
+            },
+            "reply_count": row.reply_count,
+            "replies": [],
+            "replies_cursor": None
+        }
+
+    @staticmethod
+    def _parse_cursor(cursor: str):
+        values = decode_cursor(cursor) or []
+        try:
+            return datetime.fromisoformat(values[0]), int(values[1])
+        except (IndexError, TypeError, ValueError):
+            raise ValueError("Invalid cursor")
+
+    async def _get_comment(self, comment_id: int) -> Optional[dict]:
+        result = await self.db.execute(
+            self._comment_query().where(Comment.id == comment_id)
         )
-        
-        total_result = await self.db.execute(count_query)
-        total = total_result.scalar()
-        
-        # Пагинация
-        offset = (page - 1) * limit
-        query = query.offset(offset).limit(limit)
-        
-        result = await self.db.execute(query)
-        comments = result.scalars().all()
-        
-        # Преобразуем в схему с информацией о пользователе
-        comment_list = []
+        row = result.first()
+        return self._to_dict(row) if row else None
+
+    async def _attach_replies(self, comments: List[dict]) -> None:
+        """Подгрузить первые ответы для каждого комментария одним запросом"""
+        limit = settings.COMMENT_REPLIES_PREVIEW
+        parent_ids = [comment["id"] for comment in comments if comment["reply_count"]]
+        if limit <= 0 or not parent_ids:
+            return
+
+        # LATERAL берет не больше limit ответов на ветку, не читая всю ветку
+        parent = aliased(Comment)
+        first_replies = (
+            select(Comment.id)
+            .where(Comment.parent_id == parent.id)
+            .order_by(Comment.created_at, Comment.id)
+            .limit(limit)
+            .lateral()
+        )
+        reply_ids = (
+            select(first_replies.c.id)
+            .select_from(parent)
+            .join(first_replies, true())
+            .where(parent.id.in_(parent_ids))
+        )
+
+        result = await self.db.execute(
+            self._comment_query()
+            .where(Comment.id.in_(reply_ids))
+            .order_by(Comment.parent_id, Comment.created_at, Comment.id)
+        )
+
+        by_id = {comment["id"]: comment for comment in comments}
+        for row in result.all():
+            by_id[row.parent_id]["replies"].append(self._to_dict(row))
+
         for comment in comments:
-            comment_dict = {
-                "id": comment.id,
-                "user_id": comment.user_id,
-                "anime_id": comment.anime_id,
-                "episode_id": comment.episode_id,
-                "content": comment.content,
-                "parent_id": comment.parent_id,
-                "created_at": comment.created_at,
-                "updated_at": comment.updated_at,
-                "user": {
-                    "id": comment.user.id,
-                    "username": comment.user.username,
-                    "avatar_url": comment.user.avatar_url
-                },
-                "replies": [
-                    {
-                        "id": reply.id,
-                        "user_id": reply.user_id,
-                        "anime_id": reply.anime_id,
-                        "episode_id": reply.episode_id,
-                        "content": reply.content,
-                        "parent_id": reply.parent_id,
-                        "created_at": reply.created_at,
-                        "updated_at": reply.updated_at,
-                        "user": {
-                            "id": reply.user.id,
-                            "username": reply.user.username,
-                            "avatar_url": reply.user.avatar_url
-                        },
-                        "replies": []
-                    }
-                    for reply in comment.replies
-                ]
-            }
-            comment_list.append(comment_dict)
-        
-        return CommentList(
-            data=comment_list,
-            total=total,
-            page=page,
-            limit=limit
-        )
-
-    async def get_episode_comments(self, episode_id: int, page: int = 1, limit: int = 20) -> CommentList:
-        """Получить комментарии к эпизоду с пагинацией"""
-        
-        query = select(Comment).where(
-            and_(
-                Comment.episode_id == episode_id,
-                Comment.parent_id.is_(None)
+            replies = comment["replies"]
+            if replies and comment["reply_count"] > len(replies):
+                comment["replies_cursor"] = encode_cursor(replies[-1]["created_at"], replies[-1]["id"])
+
+    async def _get_thread_page(
+        self,
+        condition,
+        count_query,
+        cursor: Optional[str],
+        limit: int
+    ) -> dict:
+        """Страница комментариев верхнего уровня, новые первыми"""
+
+        # Счетчик поддерживается при создании/удалении комментариев
+        total_result = await self.db.execute(count_query)
+        total = total_result.scalar() or 0
+
+        query = self._comment_query().where(condition, Comment.parent_id.is_(None))
+
+        if cursor:
+            created_at, last_id = self._parse_cursor(cursor)
+            query = query.where(
+                Comment.created_at <= created_at,
+                or_(
+                    Comment.created_at < created_at,
+                    Comment.id < last_id
+                )
             )
-        ).options(
-            selectinload(Comment.user),
-            selectinload(Comment.replies).selectinload(Comment.user)
-        ).order_by(Comment.created_at.desc())
-        
-        count_query = select(func.count(Comment.id)).where(
-            and_(
-                Comment.episode_id == episode_id,
-                Comment.parent_id.is_(None)
+
+        result = await self.db.execute(
+            query.order_by(Comment.created_at.desc(), Comment.id.desc()).limit(limit + 1)
+        )
+        rows = result.all()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+
+        comments = [self._to_dict(row) for row in rows]
+        await self._attach_replies(comments)
+
+        return {
+            "data": comments,
+            "total": total,
+            "limit": limit,
+            "next_cursor": next_cursor
+        }
+
+    async def get_anime_comments(
+        self,
+        anime_id: int,
+        cursor: Optional[str] = None,
+        limit: int = 20
+    ) -> dict:
+        """Получить комментарии к аниме (keyset-пагинация по created_at, id)"""
+        return await self._get_thread_page(
+            Comment.anime_id == anime_id,
+            select(Anime.comments_count).where(Anime.id == anime_id),
+            cursor,
+            limit
+        )
+
+    async def get_episode_comments(
+        self,
+        episode_id: int,
+        cursor: Optional[str] = None,
+        limit: int = 20
+    ) -> dict:
+        """Получить комментарии к эпизоду (keyset-пагинация по created_at, id)"""
+        return await self._get_thread_page(
+            Comment.episode_id == episode_id,
+            select(Episode.comments_count).where(Episode.id == episode_id),
+            cursor,
+            limit
+        )
+
+    async def get_replies(
+        self,
+        comment_id: int,
+        cursor: Optional[str] = None,
+        limit: int = 20
+    ) -> dict:
+        """Получить ответы на комментарий, старые первыми"""
+
+        query = self._comment_query().where(Comment.parent_id == comment_id)
+
+        if cursor:
+            created_at, last_id = self._parse_cursor(cursor)
+            query = query.where(
+                Comment.created_at >= created_at,
+                or_(
+                    Comment.created_at > created_at,
+                    Comment.id > last_id
+                )
             )
+
+        result = await self.db.execute(
+            query.order_by(Comment.created_at, Comment.id).limit(limit + 1)
         )
-        
-        total_result = await self.db.execute(count_query)
-        total = total_result.scalar()
-        
-        offset = (page - 1) * limit
-        query = query.offset(offset).limit(limit)
-        
-        result = await self.db.execute(query)
-        comments = result.scalars().all()
-        
-        comment_list = []
-        for comment in comments:
-            comment_dict = {
-                "id": comment.id,
-                "user_id": comment.user_id,
-                "anime_id": comment.anime_id,
-                "episode_id": comment.episode_id,
-                "content": comment.content,
-                "parent_id": comment.parent_id,
-                "created_at": comment.created_at,
-                "updated_at": comment.updated_at,
-                "user": {
-                    "id": comment.user.id,
-                    "username": comment.user.username,
-                    "avatar_url": comment.user.avatar_url
-                },
-                "replies": [
-                    {
-                        "id": reply.id,
-                        "user_id": reply.user_id,
-                        "anime_id": reply.anime_id,
-                        "episode_id": reply.episode_id,
-                        "content": reply.content,
-                        "parent_id": reply.parent_id,
-                        "created_at": reply.created_at,
-                        "updated_at": reply.updated_at,
-                        "user": {
-                            "id": reply.user.id,
-                            "username": reply.user.username,
-                            "avatar_url": reply.user.avatar_url
-                        },
-                        "replies": []
-                    }
-                    for reply in comment.replies
-                ]
-            }
-            comment_list.append(comment_dict)
-        
-        return CommentList(
-            data=comment_list,
-            total=total,
-            page=page,
-            limit=limit
-        )
-
-    async def create_comment(self, user_id: int, comment_data: CommentCreate) -> Comment:
+        rows = result.all()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+
+        return {
+            "data": [self._to_dict(row) for row in rows],
+            "next_cursor": next_cursor
+        }
+
+    async def _serialized_page(
+        self,
+        scope: str,
+        scope_id: int,
+        cursor: Optional[str],
+        limit: int,
+        schema,
+        load,
+        encoding: Optional[str] = None
+    ) -> Tuple[bytes, Optional[str]]:
+        """Страница в виде JSON и ее Content-Encoding; первые страницы - из кеша"""
+        if cursor is None:
+            cached = await comment_cache.get_page(scope, scope_id, limit, encoding)
+            if cached is not None:
+                return cached
+
+        page = schema.model_validate(await load(scope_id, cursor, limit))
+        payload = page.model_dump_json().encode()
+
+        if cursor is None:
+            await comment_cache.store_page(scope, scope_id, limit, payload)
+
+        return payload, None
+
+    async def get_anime_comments_json(
+        self,
+        anime_id: int,
+        cursor: Optional[str] = None,
+        limit: int = 20,
+        encoding: Optional[str] = None
+    ) -> Tuple[bytes, Optional[str]]:
+        """Комментарии к аниме в виде готового JSON"""
+        return await self._serialized_page(
+            "anime", anime_id, cursor, limit, CommentList, self.get_anime_comments, encoding
+        )
+
+    async def get_episode_comments_json(
+        self,
+        episode_id: int,
+        cursor: Optional[str] = None,
+        limit: int = 20,
+        encoding: Optional[str] = None
+    ) -> Tuple[bytes, Optional[str]]:
+        """Комментарии к эпизоду в виде готового JSON"""
+        return await self._serialized_page(
+            "episode", episode_id, cursor, limit, CommentList, self.get_episode_comments, encoding
+        )
+
+    async def get_replies_json(
+        self,
+        comment_id: int,
+        cursor: Optional[str] = None,
+        limit: int = 20,
+        encoding: Optional[str] = None
+    ) -> Tuple[bytes, Optional[str]]:
+        """Ответы на комментарий в виде готового JSON"""
+        return await self._serialized_page(
+            "replies", comment_id, cursor, limit, CommentReplies, self.get_replies, encoding
+        )
+
+    async def create_comment(self, user_id: int, comment_data: CommentCreate) -> dict:
         """Создать комментарий"""
         comment = Comment(
             user_id=user_id,
@@ -174,24 +289,38 @@ class CommentService:
             content=comment_data.content,
             parent_id=comment_data.parent_id
         )
-        
+
         self.db.add(comment)
+        await self.db.flush()
+
+        grandparent_id = await self._change_counters(
+            comment.anime_id, comment.episode_id, comment.parent_id, 1
+        )
         await self.db.commit()
-        await self.db.refresh(comment)
-        
-        # Загружаем пользователя для ответа
-        await self.db.refresh(comment, ["user"])
-        
-        return comment
+
+        # Меняется reply_count родителя, который виден в ветке уровнем выше
+        await comment_cache.invalidate([
+            ("anime", comment.anime_id),
+            ("episode", comment.episode_id),
+            ("replies", comment.parent_id),
+            ("replies", grandparent_id)
+        ])
+
+        created = await self._get_comment(comment.id)
+        await comment_stream.publish(
+            "created", CommentSchema.model_validate(created).model_dump(mode="json")
+        )
+
+        return created
 
     async def update_comment(
-        self, 
-        comment_id: int, 
-        user_id: int, 
+        self,
+        comment_id: int,
+        user_id: int,
         comment_data: CommentUpdate
-    ) -> Optional[Comment]:
+    ) -> Optional[dict]:
         """Обновить комментарий (только автор)"""
-        
+
         result = await self.db.execute(
             select(Comment).where(
                 and_(
@@ -201,35 +330,144 @@ class CommentService:
             )
         )
         comment = result.scalar_one_or_none()
-        
+
         if not comment:
             return None
-        
+
         if comment_data.content:
             comment.content = comment_data.content
-        
+
         await self.db.commit()
-        await self.db.refresh(comment)
-        
-        return comment
+
+        await comment_cache.invalidate([
+            ("anime", comment.anime_id),
+            ("episode", comment.episode_id),
+            ("replies", comment.parent_id)
+        ])
+
+        updated = await self._get_comment(comment_id)
+        await comment_stream.publish(
+            "updated", CommentSchema.model_validate(updated).model_dump(mode="json")
+        )
+
+        return updated
 
     async def delete_comment(self, comment_id: int, user_id: int) -> bool:
         """Удалить комментарий (только автор)"""
-        
+
+        # Ответы удаляются каскадом в БД; их ветки уходят вместе с родителем
         result = await self.db.execute(
-            select(Comment).where(
+            delete(Comment)
+            .where(
                 and_(
                     Comment.id == comment_id,
                     Comment.user_id == user_id
                 )
             )
+            .returning(Comment.anime_id, Comment.episode_id, Comment.parent_id)
         )
-        comment = result.scalar_one_or_none()
-        
-        if not comment:
+        deleted = result.first()
+
+        if not deleted:
             return False
-        
-        await self.db.delete(comment)
+
+        grandparent_id = await self._change_counters(
+            deleted.anime_id, deleted.episode_id, deleted.parent_id, -1
+        )
         await self.db.commit()
-        
+
+        await comment_cache.invalidate([
+            ("anime", deleted.anime_id),
+            ("episode", deleted.episode_id),
+            ("replies", comment_id),
+            ("replies", deleted.parent_id),
+            ("replies", grandparent_id)
+        ])
+
+        await comment_stream.publish("deleted", {
+            "id": comment_id,
+            "anime_id": deleted.anime_id,
+            "episode_id": deleted.episode_id,
+            "parent_id": deleted.parent_id
+        })
+
         return True
+
+    async def _change_counters(
+        self,
+        anime_id: int,
+        episode_id: Optional[int],
+        parent_id: Optional[int],
+        delta: int
+    ) -> Optional[int]:
+        """Изменить денормализованные счетчики комментариев.
+
+        updated_at не трогаем: счетчик не меняет содержимое записи.
+        Для ответа возвращает parent_id его родителя.
+        """
+        if parent_id is not None:
+            result = await self.db.execute(
+                update(Comment)
+                .where(Comment.id == parent_id)
+                .values(reply_count=Comment.reply_count + delta, updated_at=Comment.updated_at)
+                .returning(Comment.parent_id)
+            )
+            return result.scalar_one_or_none()
+
+        await self.db.execute(
+            update(Anime)
+            .where(Anime.id == anime_id)
+            .values(comments_count=Anime.comments_count + delta, updated_at=Anime.updated_at)
+        )
+        if episode_id is not None:
+            await self.db.execute(
+                update(Episode)
+                .where(Episode.id == episode_id)
+                .values(comments_count=Episode.comments_count + delta, updated_at=Episode.updated_at)
+            )
+
+        return None
+
+    async def reconcile_counters(self) -> int:
+        """Пересчитать счетчики комментариев и исправить расхождения.
+
+        Счетчики расходятся при каскадных удалениях (например, удалении
+        пользователя). Возвращает количество исправленных строк.
+        """
+        fixed = 0
+
+        reply = aliased(Comment)
+        counters = [
+            (
+                Comment,
+                Comment.reply_count,
+                select(func.count(reply.id)).where(reply.parent_id == Comment.id)
+            ),
+            (
+                Anime,
+                Anime.comments_count,
+                select(func.count(Comment.id)).where(
+                    Comment.anime_id == Anime.id, Comment.parent_id.is_(None)
+                )
+            ),
+            (
+                Episode,
+                Episode.comments_count,
+                select(func.count(Comment.id)).where(
+                    Comment.episode_id == Episode.id, Comment.parent_id.is_(None)
+                )
+            ),
+        ]
+
+        for model, column, actual in counters:
+            actual = actual.scalar_subquery()
+            result = await self.db.execute(
+                update(model)
+                .where(column != actual)
+                .values({column: actual, model.updated_at: model.updated_at})
+            )
+            fixed += result.rowcount
+
+        await self.db.commit()
+
+        return fixed
@@ -0,0 +1,104 @@
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from typing import Dict, Optional, Set
+
+from loguru import logger
+
+from app.config import settings
+from app.services.pubsub import pubsub_hub
+
+
+class CommentStream:
+    """Рассылка событий комментариев подписчикам SSE.
+
+    create/update/delete публикуют событие в канал аниме и эпизода.
+    Воркер держит одну подписку на паттерн через общий pub/sub hub и
+    раскладывает готовый SSE-кадр по очередям своих соединений.
+    """
+
+    CHANNEL = "comments:events:{scope}:{scope_id}"
+    PATTERN = "comments:events:*"
+
+    def __init__(self):
+        self._listeners: Dict[str, Set[asyncio.Queue]] = {}
+
+    async def start(self):
+        """Подписаться на события комментариев"""
+        await pubsub_hub.psubscribe(self.PATTERN, self._on_message)
+
+    async def publish(self, event: str, comment: dict):
+        """Опубликовать событие комментария в ветки аниме и эпизода"""
+        data = json.dumps({"event": event, "data": comment})
+
+        threads = [("anime", comment["anime_id"]), ("episode", comment.get("episode_id"))]
+        for scope, scope_id in threads:
+            if scope_id is None:
+                continue
+            channel = self.CHANNEL.format(scope=scope, scope_id=scope_id)
+            # Без Redis событие доходит только до соединений этого воркера
+            if not await pubsub_hub.publish(channel, data):
+                await self._on_message(channel, data)
+
+    @asynccontextmanager
+    async def subscribe(self, scope: str, scope_id: int):
+        """Очередь SSE-кадров ветки на время соединения"""
+        channel = self.CHANNEL.format(scope=scope, scope_id=scope_id)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=settings.COMMENT_STREAM_QUEUE_SIZE)
+        self._listeners.setdefault(channel, set()).add(queue)
+        try:
+            yield queue
+        finally:
+            listeners = self._listeners.get(channel)
+            if listeners is not None:
+                listeners.discard(queue)
+                if not listeners:
+                    self._listeners.pop(channel, None)
+
+    async def frames(self, scope: str, scope_id: int, request=None):
+        """Генератор SSE-кадров ветки с keepalive-комментариями"""
+        async with self.subscribe(scope, scope_id) as queue:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    frame: Optional[str] = await asyncio.wait_for(
+                        queue.get(), timeout=settings.COMMENT_STREAM_KEEPALIVE
+                    )
+                except asyncio.TimeoutError:
+                    if request is not None and await request.is_disconnected():
+                        break
+                    yield ": keepalive\n\n"
+                    continue
+
+                if frame is None:
+                    break
+                yield frame
+
+    async def _on_message(self, channel: str, data: str):
+        listeners = self._listeners.get(channel)
+        if not listeners:
+            return
+
+        # Кадр собирается один раз на воркер, а не на соединение
+        event = json.loads(data)["event"]
+        frame = f"event: {event}\ndata: {data}\n\n"
+
+        for queue in list(listeners):
+            try:
+                queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                # Медленный клиент: закрываем поток, клиент переподключится
+                # и перечитает страницу
+                logger.debug(f"Comment stream listener on {channel} overflowed")
+                listeners.discard(queue)
+                self._close(queue)
+
+    @staticmethod
+    def _close(queue: asyncio.Queue):
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
+
+
+# Глобальный экземпляр потока комментариев (по одному на воркер)
+comment_stream = CommentStream()
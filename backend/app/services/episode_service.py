@@ -1,26 +1,255 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update
+from sqlalchemy import select, update, func, literal_column, type_coerce
+from sqlalchemy.dialects.postgresql import JSON, aggregate_order_by
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.engine import Row
 from sqlalchemy.orm import selectinload
-from typing import List, Optional
+from datetime import datetime
+from typing import List, Optional, Tuple, Union
 
+from app.config import settings
+from app.models.anime import Anime
 from app.models.episode import Episode, VideoSource
-from app.models.user import WatchHistory
-from app.schemas.episode import EpisodeCreate, EpisodeUpdate
+from app.models.user import User, WatchHistory
+from app.schemas.episode import (
+    Episode as EpisodeSchema, EpisodeCreate, EpisodeUpdate, EpisodeView, EpisodeCard,
+    EpisodeList, EpisodeCardList, VideoSource as VideoSourceSchema
+)
+from app.services.payload_cache import (
+    payload_cache, ANIME_DETAIL_KEY, ANIME_EPISODES_KEY, ANIME_EPISODE_CHUNK_KEY, ANIME_EPISODE_CHUNKS_KEY
+)
+from app.services.projection import FieldSelection, json_object, schema_fields
+from app.utils.helpers import encode_cursor, decode_cursor
+
+# Поля, доступные для выбора через ?fields=
+EPISODE_FIELDS: FieldSelection = schema_fields(EpisodeSchema, {"video_sources": VideoSourceSchema})
+
+
+def episode_chunk(episode_number: int) -> int:
+    """Номер чанка (с нуля), в который попадает эпизод"""
+    return (episode_number - 1) // settings.EPISODE_CHUNK_SIZE
+
+
+def chunk_bounds(chunk: int) -> Tuple[int, int]:
+    """Первый и последний номер эпизода чанка"""
+    return chunk * settings.EPISODE_CHUNK_SIZE + 1, (chunk + 1) * settings.EPISODE_CHUNK_SIZE
+
+
+def _video_sources_json(keys: Tuple[str, ...]):
+    """Источники видео эпизода JSON-массивом только с полями keys"""
+    item = json_object(**{key: getattr(VideoSource, key) for key in keys})
+    subquery = (
+        select(
+            func.coalesce(
+                func.json_agg(aggregate_order_by(item, VideoSource.id)),
+                literal_column("'[]'::json")
+            )
+        )
+        .where(VideoSource.episode_id == Episode.id)
+        .correlate(Episode)
+        .scalar_subquery()
+    )
+    return type_coerce(subquery, JSON)
+
+
+def episodes_payload(
+    episodes: list,
+    view: EpisodeView,
+    total: int,
+    next_cursor: Optional[str] = None
+) -> Tuple[bytes, Optional[datetime]]:
+    """Сериализовать список эпизодов и посчитать время его изменения"""
+    if view == EpisodeView.compact:
+        schema = EpisodeCardList
+        modified = [row["updated_at"] for row in episodes]
+    else:
+        schema = EpisodeList
+        modified = [episode.updated_at for episode in episodes]
+        modified += [source.updated_at for episode in episodes for source in episode.video_sources]
+
+    page = schema.model_validate({"data": episodes, "total": total, "next_cursor": next_cursor})
+    return page.model_dump_json().encode(), max(filter(None, modified), default=None)
 
 
 class EpisodeService:
     def __init__(self, db: AsyncSession):
         self.db = db
 
+    async def _invalidate_anime_episodes(
+        self,
+        anime_id: Optional[int],
+        *episode_numbers: int,
+        index: bool = False
+    ):
+        """Сбросить закешированные списки эпизодов аниме.
+
+        Полный список сбрасывается всегда, чанки - только содержащие
+        episode_numbers. index - меняется количество эпизодов: сбрасываются
+        все чанки (в каждом есть total), оглавление чанков и шапка аниме.
+        """
+        if anime_id is None:
+            return
+
+        chunks = {episode_chunk(number) for number in episode_numbers}
+        if index:
+            last_number = await self.db.scalar(
+                select(func.max(Episode.episode_number)).where(Episode.anime_id == anime_id)
+            )
+            # Удаленный эпизод мог быть последним, поэтому учитываем и его номер
+            last_chunk = max(chunks | {episode_chunk(last_number or 1)})
+            chunks = set(range(last_chunk + 1))
+
+        keys = [ANIME_EPISODES_KEY.format(anime_id=anime_id, view=view.value) for view in EpisodeView]
+        for chunk in chunks:
+            keys += [
+                ANIME_EPISODE_CHUNK_KEY.format(anime_id=anime_id, view=view.value, chunk=chunk)
+                for view in EpisodeView
+            ]
+        if index:
+            keys += [
+                ANIME_EPISODE_CHUNKS_KEY.format(anime_id=anime_id),
+                ANIME_DETAIL_KEY.format(anime_id=anime_id)
+            ]
+
+        await payload_cache.invalidate(*keys)
+
+    async def _change_episode_count(self, anime_id: int, delta: int):
+        """Изменить счетчик эпизодов аниме.
+
+        updated_at аниме обновляется: счетчик входит в ответ /anime/{id}
+        и должен сдвигать его Last-Modified.
+        """
+        await self.db.execute(
+            update(Anime)
+            .where(Anime.id == anime_id)
+            .values(episode_count=Anime.episode_count + delta)
+        )
+
+    async def _invalidate_episode(self, episode_id: int):
+        """Сбросить списки эпизодов аниме, которому принадлежит эпизод"""
+        result = await self.db.execute(
+            select(Episode.anime_id, Episode.episode_number).where(Episode.id == episode_id)
+        )
+        row = result.first()
+        if row is not None:
+            await self._invalidate_anime_episodes(row.anime_id, row.episode_number)
+
+    async def list_episodes(
+        self,
+        anime_id: int,
+        view: EpisodeView = EpisodeView.full,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        after: Optional[int] = None,
+        limit: Optional[int] = None,
+        fields: Optional[FieldSelection] = None
+    ) -> list:
+        """Эпизоды аниме по возрастанию номера.
+
+        start/end ограничивают диапазон номеров включительно, after/limit
+        задают keyset-страницу. compact - строки без источников видео,
+        fields - словари только с выбранными полями (заменяет view).
+        """
+        conditions = [Episode.anime_id == anime_id]
+        if start is not None:
+            conditions.append(Episode.episode_number >= start)
+        if end is not None:
+            conditions.append(Episode.episode_number <= end)
+        if after is not None:
+            conditions.append(Episode.episode_number > after)
+
+        if fields is not None:
+            # episode_number - ключ сортировки и курсора, выбирается всегда
+            names = dict.fromkeys(["episode_number", *fields])
+            columns = [getattr(Episode, name) for name in names if name in Episode.__table__.c]
+            if "video_sources" in fields:
+                columns.append(_video_sources_json(fields["video_sources"]).label("video_sources"))
+            query = select(*columns)
+        elif view == EpisodeView.compact:
+            columns = [getattr(Episode, name) for name in EpisodeCard.model_fields]
+            query = select(*columns, Episode.updated_at)
+        else:
+            query = select(Episode).options(selectinload(Episode.video_sources))
+
+        query = query.where(*conditions).order_by(Episode.episode_number)
+        if limit is not None:
+            query = query.limit(limit)
+
+        result = await self.db.execute(query)
+        if fields is not None or view == EpisodeView.compact:
+            return [dict(row) for row in result.mappings()]
+        return result.scalars().all()
+
     async def get_episodes_by_anime(self, anime_id: int) -> List[Episode]:
         """Получить все эпизоды аниме"""
+        return await self.list_episodes(anime_id)
+
+    async def get_episode_page(
+        self,
+        anime_id: int,
+        view: EpisodeView,
+        cursor: Optional[str],
+        limit: int,
+        fields: Optional[FieldSelection] = None
+    ) -> Union[EpisodeList, EpisodeCardList, dict]:
+        """Keyset-страница эпизодов по номеру; некорректный курсор - ValueError"""
+        after = None
+        if cursor is not None:
+            values = decode_cursor(cursor) or []
+            try:
+                after = int(values[0])
+            except (IndexError, TypeError, ValueError):
+                raise ValueError("Invalid cursor")
+
+        episodes = await self.list_episodes(anime_id, view, after=after, limit=limit + 1, fields=fields)
+
+        next_cursor = None
+        if len(episodes) > limit:
+            episodes = episodes[:limit]
+            last = episodes[-1]
+            next_cursor = encode_cursor(
+                last.episode_number if isinstance(last, Episode) else last["episode_number"]
+            )
+
+        if fields is not None:
+            return {
+                "data": episodes,
+                "total": await self.get_episode_count(anime_id),
+                "next_cursor": next_cursor
+            }
+
+        schema = EpisodeCardList if view == EpisodeView.compact else EpisodeList
+        return schema(
+            data=episodes,
+            total=await self.get_episode_count(anime_id),
+            next_cursor=next_cursor
+        )
+
+    async def get_episode_chunks(self, anime_id: int) -> List[dict]:
+        """Оглавление эпизодов аниме по чанкам фиксированного размера"""
+        # Группировка по псевдониму: выражение с параметрами в GROUP BY
+        # не совпало бы с выражением в SELECT
+        chunk = ((Episode.episode_number - 1) // settings.EPISODE_CHUNK_SIZE).label("chunk")
         result = await self.db.execute(
-            select(Episode).where(Episode.anime_id == anime_id)
-            .options(selectinload(Episode.video_sources))
-            .order_by(Episode.episode_number)
+            select(chunk, func.count(Episode.id).label("count"))
+            .where(Episode.anime_id == anime_id)
+            .group_by("chunk")
+            .order_by("chunk")
+        )
+
+        chunks = []
+        for row in result:
+            start, end = chunk_bounds(row.chunk)
+            chunks.append({"start": start, "end": end, "count": row.count})
+        return chunks
+
+    async def get_episode_count(self, anime_id: int) -> int:
+        """Количество эпизодов аниме в базе"""
+        result = await self.db.execute(
+            select(Anime.episode_count).where(Anime.id == anime_id)
         )
         
-        return result.scalars().all()
+        return result.scalar_one_or_none() or 0
 
     async def get_episode_by_id(self, episode_id: int) -> Optional[Episode]:
         """Получить эпизод по ID"""
@@ -31,6 +260,15 @@ class EpisodeService:
         
         return result.scalar_one_or_none()
 
+    async def get_episode_brief(self, episode_id: int) -> Optional[Row]:
+        """Получить краткие данные эпизода (id, anime_id, номер) без источников видео"""
+        result = await self.db.execute(
+            select(Episode.id, Episode.anime_id, Episode.episode_number)
+            .where(Episode.id == episode_id)
+        )
+        
+        return result.first()
+
     async def get_active_video_sources(self, episode_id: int) -> List[VideoSource]:
         """Получить активные источники видео для эпизода"""
         result = await self.db.execute(
@@ -42,6 +280,19 @@ class EpisodeService:
         
         return result.scalars().all()
 
+    @staticmethod
+    def _watch_progress_upsert(values):
+        """INSERT ... ON CONFLICT (user_id, episode_id) DO UPDATE для прогресса"""
+        stmt = insert(WatchHistory).values(values)
+        return stmt.on_conflict_do_update(
+            index_elements=[WatchHistory.user_id, WatchHistory.episode_id],
+            set_={
+                "progress": stmt.excluded.progress,
+                "completed": stmt.excluded.completed,
+                "watched_at": stmt.excluded.watched_at
+            }
+        )
+
     async def save_watch_progress(
         self, 
         user_id: int, 
@@ -49,44 +300,63 @@ class EpisodeService:
         progress: int, 
         completed: bool = False
     ) -> WatchHistory:
-        """Сохранить прогресс просмотра"""
+        """Сохранить прогресс просмотра (один upsert вместо select + insert/update)"""
         
-        # Проверяем существующую запись
-        existing = await self.db.execute(
-            select(WatchHistory).where(
-                WatchHistory.user_id == user_id,
-                WatchHistory.episode_id == episode_id
-            )
+        stmt = self._watch_progress_upsert({
+            "user_id": user_id,
+            "episode_id": episode_id,
+            "progress": progress,
+            "completed": completed,
+            "watched_at": func.now()
+        }).returning(WatchHistory)
+        
+        result = await self.db.execute(
+            stmt, execution_options={"populate_existing": True}
         )
+        watch_history = result.scalar_one()
+        await self.db.commit()
         
-        watch_history = existing.scalar_one_or_none()
+        return watch_history
+
+    async def save_watch_progress_batch(self, entries: List[dict], chunk_size: int = 1000) -> int:
+        """Сохранить пакет прогресса одним INSERT ... ON CONFLICT DO UPDATE на чанк"""
         
-        if watch_history:
-            # Обновляем существующую запись
-            watch_history.progress = progress
-            watch_history.completed = completed
-        else:
-            # Создаем новую запись
-            watch_history = WatchHistory(
-                user_id=user_id,
-                episode_id=episode_id,
-                progress=progress,
-                completed=completed
-            )
-            self.db.add(watch_history)
+        if not entries:
+            return 0
+        
+        # Эпизоды и пользователи могли быть удалены, пока запись лежала в буфере
+        episode_ids = {entry["episode_id"] for entry in entries}
+        user_ids = {entry["user_id"] for entry in entries}
+        
+        existing_episodes = set((await self.db.execute(
+            select(Episode.id).where(Episode.id.in_(episode_ids))
+        )).scalars().all())
+        existing_users = set((await self.db.execute(
+            select(User.id).where(User.id.in_(user_ids))
+        )).scalars().all())
+        
+        entries = [
+            entry for entry in entries
+            if entry["episode_id"] in existing_episodes and entry["user_id"] in existing_users
+        ]
+        
+        for i in range(0, len(entries), chunk_size):
+            await self.db.execute(self._watch_progress_upsert(entries[i:i + chunk_size]))
         
         await self.db.commit()
-        await self.db.refresh(watch_history)
         
-        return watch_history
+        return len(entries)
 
     async def create_episode(self, episode_data: EpisodeCreate) -> Episode:
         """Создать новый эпизод"""
         episode = Episode(**episode_data.model_dump())
         
         self.db.add(episode)
+        await self.db.flush()
+        await self._change_episode_count(episode.anime_id, 1)
         await self.db.commit()
         await self.db.refresh(episode)
+        await self._invalidate_anime_episodes(episode.anime_id, episode.episode_number, index=True)
         
         return episode
 
@@ -100,12 +370,15 @@ class EpisodeService:
         if not episode:
             return None
         
+        # Смена номера переносит эпизод в другой чанк: сбрасываем оба
+        old_number = episode.episode_number
         update_data = episode_data.model_dump(exclude_unset=True)
         for field, value in update_data.items():
             setattr(episode, field, value)
         
         await self.db.commit()
         await self.db.refresh(episode)
+        await self._invalidate_anime_episodes(episode.anime_id, old_number, episode.episode_number)
         
         return episode
 
@@ -120,7 +393,9 @@ class EpisodeService:
             return False
         
         await self.db.delete(episode)
+        await self._change_episode_count(episode.anime_id, -1)
         await self.db.commit()
+        await self._invalidate_anime_episodes(episode.anime_id, episode.episode_number, index=True)
         
         return True
 
@@ -145,6 +420,7 @@ class EpisodeService:
         self.db.add(video_source)
         await self.db.commit()
         await self.db.refresh(video_source)
+        await self._invalidate_episode(episode_id)
         
         return video_source
 
@@ -154,7 +430,34 @@ class EpisodeService:
             update(VideoSource)
             .where(VideoSource.id == source_id)
             .values(is_active=False)
+            .returning(VideoSource.episode_id)
         )
+        episode_id = result.scalar_one_or_none()
+        
+        await self.db.commit()
         
+        if episode_id is None:
+            return False
+        
+        await self._invalidate_episode(episode_id)
+        return True
+
+    async def reconcile_episode_counts(self) -> int:
+        """Пересчитать счетчики эпизодов аниме и исправить расхождения.
+
+        Эпизоды, созданные в обход сервиса (сиды, ручные правки), не
+        меняют счетчик. Возвращает количество исправленных строк.
+        """
+        actual = (
+            select(func.count(Episode.id))
+            .where(Episode.anime_id == Anime.id)
+            .scalar_subquery()
+        )
+        result = await self.db.execute(
+            update(Anime)
+            .where(Anime.episode_count != actual)
+            .values(episode_count=actual)
+        )
         await self.db.commit()
-        return result.rowcount > 0
+        
+        return result.rowcount
@@ -0,0 +1,169 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete, func
+from sqlalchemy.dialects.postgresql import insert
+from datetime import datetime
+from typing import Dict, Optional
+
+from app.models.episode import Episode
+from app.models.user import UserFavorite, LibraryEntry, WatchHistory
+from app.schemas.library import LibraryStatus
+from app.services.library_state import library_state
+from app.services.progress_buffer import progress_buffer
+from app.services.user_service import UserService
+
+
+class LibraryService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def _build_state(self, user_id: int) -> Dict[int, dict]:
+        """Собрать состояние библиотеки пользователя из БД"""
+        await progress_buffer.flush_user(user_id)
+
+        state: Dict[int, dict] = {}
+
+        entries = await self.db.execute(
+            select(LibraryEntry.anime_id, LibraryEntry.status)
+            .where(LibraryEntry.user_id == user_id)
+        )
+        for anime_id, status in entries.all():
+            state.setdefault(anime_id, {})["s"] = status
+
+        favorites = await self.db.execute(
+            select(UserFavorite.anime_id).where(UserFavorite.user_id == user_id)
+        )
+        for anime_id in favorites.scalars().all():
+            state.setdefault(anime_id, {})["f"] = 1
+
+        # Последний просмотренный эпизод по каждому аниме
+        progress = await self.db.execute(
+            select(
+                Episode.anime_id,
+                Episode.episode_number,
+                WatchHistory.progress,
+                WatchHistory.watched_at
+            )
+            .join(Episode, WatchHistory.episode_id == Episode.id)
+            .where(WatchHistory.user_id == user_id)
+            .distinct(Episode.anime_id)
+            .order_by(Episode.anime_id, WatchHistory.watched_at.desc())
+        )
+        for anime_id, episode_number, seconds, watched_at in progress.all():
+            state.setdefault(anime_id, {}).update(
+                e=episode_number,
+                p=seconds,
+                t=watched_at.isoformat() if watched_at else None
+            )
+
+        await library_state.store(user_id, state)
+
+        return state
+
+    async def _get_anime_state(self, user_id: int, anime_id: int) -> Optional[dict]:
+        """Состояние одного аниме: из кеша за O(1), иначе из БД"""
+        loaded, item = await library_state.get(user_id, anime_id)
+        if loaded:
+            return item
+
+        state = await self._build_state(user_id)
+        return state.get(anime_id)
+
+    async def get_library(self, user_id: int) -> dict:
+        """Получить библиотеку пользователя, сгруппированную по статусам"""
+        state = await library_state.get_all(user_id)
+        if state is None:
+            state = await self._build_state(user_id)
+
+        library = {status.value: [] for status in LibraryStatus}
+        for anime_id, item in state.items():
+            if item.get("f"):
+                library[LibraryStatus.favorites.value].append(anime_id)
+            if item.get("s"):
+                library[item["s"]].append(anime_id)
+
+        return library
+
+    async def add(self, user_id: int, anime_id: int, status: LibraryStatus) -> None:
+        """Добавить аниме в список (аниме находится не более чем в одном статусе)"""
+        if status == LibraryStatus.favorites:
+            await UserService(self.db).add_to_favorites(user_id, anime_id)
+            return
+
+        stmt = insert(LibraryEntry).values(
+            user_id=user_id, anime_id=anime_id, status=status.value
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[LibraryEntry.user_id, LibraryEntry.anime_id],
+            set_={"status": stmt.excluded.status, "updated_at": func.now()}
+        )
+        await self.db.execute(stmt)
+        await self.db.commit()
+
+        await library_state.patch(user_id, anime_id, {"s": status.value})
+
+    async def remove(self, user_id: int, anime_id: int, status: LibraryStatus) -> bool:
+        """Удалить аниме из списка"""
+        if status == LibraryStatus.favorites:
+            return await UserService(self.db).remove_from_favorites(user_id, anime_id)
+
+        result = await self.db.execute(
+            delete(LibraryEntry).where(
+                LibraryEntry.user_id == user_id,
+                LibraryEntry.anime_id == anime_id,
+                LibraryEntry.status == status.value
+            )
+        )
+        await self.db.commit()
+
+        if result.rowcount > 0:
+            await library_state.patch(user_id, anime_id, {"s": None})
+        return result.rowcount > 0
+
+    async def contains(self, user_id: int, anime_id: int, status: LibraryStatus) -> bool:
+        """Проверить, находится ли аниме в списке"""
+        item = await self._get_anime_state(user_id, anime_id) or {}
+
+        if status == LibraryStatus.favorites:
+            return bool(item.get("f"))
+        return item.get("s") == status.value
+
+    async def get_progress(self, user_id: int, anime_id: int) -> Optional[dict]:
+        """Получить прогресс просмотра аниме (последний эпизод)"""
+        item = await self._get_anime_state(user_id, anime_id)
+        if not item or item.get("e") is None:
+            return None
+
+        return {
+            "anime_id": anime_id,
+            "episode_number": item["e"],
+            "progress": item.get("p") or 0,
+            "last_watched": datetime.fromisoformat(item["t"]) if item.get("t") else None
+        }
+
+    async def update_progress(
+        self,
+        user_id: int,
+        anime_id: int,
+        episode_number: int,
+        progress: int,
+        completed: bool = False
+    ) -> bool:
+        """Сохранить прогресс по номеру эпизода. Возвращает False, если эпизода нет"""
+        result = await self.db.execute(
+            select(Episode.id).where(
+                Episode.anime_id == anime_id,
+                Episode.episode_number == episode_number
+            )
+        )
+        episode_id = result.scalar_one_or_none()
+        if episode_id is None:
+            return False
+
+        entry = await progress_buffer.record(user_id, episode_id, progress, completed)
+        await library_state.patch(user_id, anime_id, {
+            "e": episode_number,
+            "p": progress,
+            "t": entry["watched_at"]
+        })
+
+        return True
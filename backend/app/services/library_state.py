@@ -0,0 +1,114 @@
+import json
+from typing import Dict, Optional, Tuple
+
+from loguru import logger
+
+from app.config import settings
+from app.services.cache_service import cache_service
+from app.utils.metrics import count_cache
+
+
+# Частичное обновление состояния одного аниме, только если состояние
+# пользователя уже загружено в кеш (иначе его соберет следующее чтение)
+_PATCH_SCRIPT = """
+if redis.call('HEXISTS', KEYS[1], '_') == 0 then
+    return 0
+end
+local raw = redis.call('HGET', KEYS[1], ARGV[1])
+local state = {}
+if raw then
+    state = cjson.decode(raw)
+end
+for key, value in pairs(cjson.decode(ARGV[2])) do
+    state[key] = value
+end
+redis.call('HSET', KEYS[1], ARGV[1], cjson.encode(state))
+return 1
+"""
+
+
+class LibraryStateCache:
+    """Компактное состояние библиотеки пользователя в Redis.
+
+    Hash library:{user_id}: anime_id -> {"s": статус, "f": избранное,
+    "e": эпизод, "p": прогресс, "t": время просмотра}. Служебное поле "_"
+    отмечает, что состояние загружено целиком (в т.ч. пустое).
+    """
+
+    KEY = "library:{user_id}"
+    LOADED_FIELD = "_"
+
+    async def get(self, user_id: int, anime_id: int) -> Tuple[bool, Optional[dict]]:
+        """Получить состояние аниме за один запрос. Возвращает (загружено, состояние)"""
+        if not cache_service.is_connected:
+            return False, None
+
+        key = self.KEY.format(user_id=user_id)
+        try:
+            loaded, raw = await cache_service.redis.hmget(key, self.LOADED_FIELD, str(anime_id))
+        except Exception as e:
+            logger.error(f"Error reading library state: {str(e)}")
+            return False, None
+
+        count_cache(key, hit=loaded is not None)
+        if loaded is None:
+            return False, None
+        return True, json.loads(raw) if raw else None
+
+    async def get_all(self, user_id: int) -> Optional[Dict[int, dict]]:
+        """Получить состояние всей библиотеки или None, если не загружено"""
+        if not cache_service.is_connected:
+            return None
+
+        key = self.KEY.format(user_id=user_id)
+        try:
+            raw = await cache_service.redis.hgetall(key)
+        except Exception as e:
+            logger.error(f"Error reading library state: {str(e)}")
+            return None
+
+        count_cache(key, hit=self.LOADED_FIELD in raw)
+        if self.LOADED_FIELD not in raw:
+            return None
+        raw.pop(self.LOADED_FIELD)
+        return {int(anime_id): json.loads(value) for anime_id, value in raw.items()}
+
+    async def store(self, user_id: int, state: Dict[int, dict]) -> None:
+        """Сохранить собранное из БД состояние"""
+        if not cache_service.is_connected:
+            return
+
+        key = self.KEY.format(user_id=user_id)
+        mapping = {str(anime_id): json.dumps(item) for anime_id, item in state.items()}
+        mapping[self.LOADED_FIELD] = "1"
+
+        try:
+            async with cache_service.pipeline(transaction=True) as pipe:
+                pipe.delete(key)
+                pipe.hset(key, mapping=mapping)
+                pipe.expire(key, settings.CACHE_TTL_LIBRARY)
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"Error storing library state: {str(e)}")
+
+    async def patch(self, user_id: int, anime_id: int, changes: dict) -> None:
+        """Обновить поля состояния аниме (если состояние загружено)"""
+        if not cache_service.is_connected:
+            return
+
+        try:
+            await cache_service.redis.eval(
+                _PATCH_SCRIPT, 1, self.KEY.format(user_id=user_id),
+                str(anime_id), json.dumps(changes)
+            )
+        except Exception as e:
+            logger.error(f"Error patching library state: {str(e)}")
+            await self.invalidate(user_id)
+
+    async def invalidate(self, user_id: int) -> None:
+        """Сбросить состояние пользователя"""
+        await cache_service.delete(self.KEY.format(user_id=user_id))
+
+
+# Глобальный экземпляр кеша состояния библиотек
+library_state = LibraryStateCache()
@@ -0,0 +1,149 @@
+import hashlib
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from app.services.cache_service import cache_service
+from app.utils.compression import precompress
+from app.utils.metrics import count_cache
+
+# Ключи закешированных ответов
+ANIME_DETAIL_KEY = "anime_detail_json:{anime_id}"
+ANIME_EPISODES_KEY = "anime_episodes_json:{anime_id}:{view}"
+ANIME_EPISODE_CHUNK_KEY = "anime_episodes_json:{anime_id}:{view}:{chunk}"
+ANIME_EPISODE_CHUNKS_KEY = "anime_episode_chunks_json:{anime_id}"
+GENRES_KEY = "genres_json"
+STUDIOS_KEY = "studios_json"
+
+
+@dataclass
+class CachedPayload:
+    """Сериализованный ответ с валидаторами HTTP"""
+    body: bytes
+    etag: str
+    last_modified: Optional[str] = None  # HTTP-date
+    encoding: Optional[str] = None  # Content-Encoding тела, если это сжатый вариант
+
+
+def make_payload(body: bytes, last_modified: Optional[datetime] = None) -> CachedPayload:
+    """Посчитать ETag (хеш содержимого) и Last-Modified для тела ответа"""
+    etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+    http_date = None
+    if last_modified is not None:
+        if last_modified.tzinfo is None:
+            last_modified = last_modified.replace(tzinfo=timezone.utc)
+        http_date = format_datetime(last_modified.astimezone(timezone.utc), usegmt=True)
+    return CachedPayload(body=body, etag=etag, last_modified=http_date)
+
+
+class PayloadCache:
+    """Готовые JSON-ответы в Redis вместе с валидаторами.
+
+    Hash {key}: body - тело ответа, etag, last_modified и сжатые варианты
+    тела в полях br/gzip. Валидаторы читаются отдельно от тела, чтобы
+    условный запрос получал 304 без передачи тела и без запроса к БД.
+    """
+
+    async def get_validators(self, key: str) -> Optional[Tuple[str, Optional[str]]]:
+        """Получить (etag, last_modified) закешированного ответа"""
+        if not cache_service.is_connected:
+            return None
+
+        try:
+            etag, last_modified = await cache_service.hmget_cached(key, "etag", "last_modified")
+        except Exception as e:
+            logger.error(f"Error reading payload validators {key}: {str(e)}")
+            return None
+
+        if etag is None:
+            return None
+        return etag.decode(), last_modified.decode() if last_modified else None
+
+    async def get(self, key: str, encoding: Optional[str] = None) -> Optional[CachedPayload]:
+        """Получить закешированный ответ, по возможности сжатый encoding"""
+        if not cache_service.is_connected:
+            return None
+
+        try:
+            etag, last_modified, body = await cache_service.hmget_cached(
+                key, "etag", "last_modified", encoding or "body"
+            )
+            if etag is not None and body is None and encoding is not None:
+                # Малые тела хранятся без сжатых вариантов
+                (body,), encoding = await cache_service.hmget_cached(key, "body"), None
+        except Exception as e:
+            logger.error(f"Error reading payload {key}: {str(e)}")
+            return None
+
+        if etag is None or body is None:
+            return None
+
+        return CachedPayload(
+            body=body,
+            etag=etag.decode(),
+            last_modified=last_modified.decode() if last_modified else None,
+            encoding=encoding
+        )
+
+    async def get_bodies(self, keys: List[str]) -> List[Optional[bytes]]:
+        """Получить несжатые тела нескольких ответов одним pipeline"""
+        if not keys or not cache_service.is_connected:
+            return [None] * len(keys)
+
+        try:
+            async with cache_service.pipeline(binary=True) as pipe:
+                for key in keys:
+                    pipe.hget(key, "body")
+                bodies = await pipe.execute()
+        except Exception as e:
+            logger.error(f"Error reading payloads: {str(e)}")
+            return [None] * len(keys)
+
+        for key, body in zip(keys, bodies):
+            count_cache(key, hit=body is not None)
+        return bodies
+
+    async def store(self, key: str, payload: CachedPayload, ttl: int) -> None:
+        """Сохранить ответ с валидаторами"""
+        await self.store_many({key: payload}, ttl)
+
+    async def store_many(self, payloads: Dict[str, CachedPayload], ttl: int) -> None:
+        """Сохранить несколько ответов одной транзакцией"""
+        if not payloads or not cache_service.is_connected:
+            return
+
+        try:
+            async with cache_service.pipeline(transaction=True, binary=True) as pipe:
+                for key, payload in payloads.items():
+                    pipe.delete(key)
+                    pipe.hset(key, mapping=self._mapping(payload))
+                    pipe.expire(key, ttl)
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"Error storing payloads: {str(e)}")
+
+    @staticmethod
+    def _mapping(payload: CachedPayload) -> dict:
+        mapping = {"body": payload.body, "etag": payload.etag}
+        if payload.last_modified:
+            mapping["last_modified"] = payload.last_modified
+        # Сжимаем один раз при заполнении, а не на каждый запрос
+        mapping.update(precompress(payload.body))
+        return mapping
+
+    async def invalidate(self, *keys: str) -> None:
+        """Сбросить закешированные ответы"""
+        if not keys or not cache_service.is_connected:
+            return
+
+        try:
+            await cache_service.redis.delete(*keys)
+        except Exception as e:
+            logger.error(f"Error invalidating payloads: {str(e)}")
+
+
+# Глобальный экземпляр кеша ответов
+payload_cache = PayloadCache()
@@ -0,0 +1,215 @@
+import asyncio
+import json
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.services.cache_service import cache_service
+from app.services.episode_service import EpisodeService
+
+
+# Атомарно забрать и удалить буфер пользователя (чтобы не потерять запись,
+# пришедшую между чтением и удалением)
+_TAKE_SCRIPT = """
+local entries = redis.call('HGETALL', KEYS[1])
+redis.call('DEL', KEYS[1])
+return entries
+"""
+
+
+class ProgressBuffer:
+    """Write-behind буфер прогресса просмотра.
+
+    Обновления прогресса складываются в Redis (или в память процесса, если
+    Redis недоступен) по ключу (пользователь, эпизод) и периодически
+    сбрасываются в watch_history одним пакетным upsert.
+    """
+
+    USER_KEY = "watch_progress:{user_id}"
+    DIRTY_KEY = "watch_progress:dirty"
+
+    def __init__(self):
+        self._memory: Dict[Tuple[int, int], dict] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+
+    async def record(
+        self,
+        user_id: int,
+        episode_id: int,
+        progress: int,
+        completed: bool = False
+    ) -> dict:
+        """Записать прогресс в буфер"""
+        entry = {
+            "progress": progress,
+            "completed": completed,
+            "watched_at": datetime.now(timezone.utc).isoformat()
+        }
+
+        if cache_service.is_connected:
+            try:
+                async with cache_service.pipeline() as pipe:
+                    pipe.hset(self.USER_KEY.format(user_id=user_id), str(episode_id), json.dumps(entry))
+                    pipe.sadd(self.DIRTY_KEY, str(user_id))
+                    await pipe.execute()
+                return entry
+            except Exception as e:
+                logger.error(f"Error buffering progress in Redis: {str(e)}")
+
+        self._memory[(user_id, episode_id)] = entry
+        return entry
+
+    async def flush(self) -> int:
+        """Сбросить буфер в базу данных. Возвращает количество записей"""
+        async with self._flush_lock:
+            rows: Dict[Tuple[int, int], dict] = {}
+
+            # Записи из памяти процесса
+            memory, self._memory = self._memory, {}
+            for (user_id, episode_id), entry in memory.items():
+                rows[(user_id, episode_id)] = self._to_row(user_id, episode_id, entry)
+
+            # Записи из Redis
+            taken_users = await self._take_from_redis(rows)
+
+            return await self._persist(rows, taken_users)
+
+    async def flush_user(self, user_id: int) -> int:
+        """Сбросить буфер одного пользователя (для чтения собственных записей)"""
+        async with self._flush_lock:
+            rows: Dict[Tuple[int, int], dict] = {}
+
+            for key in [key for key in self._memory if key[0] == user_id]:
+                rows[key] = self._to_row(user_id, key[1], self._memory.pop(key))
+
+            taken_users = await self._take_from_redis(rows, [user_id])
+
+            return await self._persist(rows, taken_users)
+
+    async def _persist(self, rows: Dict[Tuple[int, int], dict], taken_users: List[int]) -> int:
+        """Записать забранные из буфера записи в БД"""
+        if not rows:
+            return 0
+
+        try:
+            async with AsyncSessionLocal() as db:
+                episode_service = EpisodeService(db)
+                await episode_service.save_watch_progress_batch(list(rows.values()))
+        except Exception as e:
+            logger.error(f"Error flushing watch progress: {str(e)}")
+            await self._restore(rows, taken_users)
+            return 0
+
+        logger.debug(f"Flushed {len(rows)} watch progress entries")
+        return len(rows)
+
+    async def _take_from_redis(
+        self,
+        rows: Dict[Tuple[int, int], dict],
+        user_ids: Optional[List[int]] = None
+    ) -> List[int]:
+        """Забрать из Redis буферы указанных (по умолчанию - грязных) пользователей"""
+        if not cache_service.is_connected:
+            return []
+
+        try:
+            if user_ids is None:
+                user_ids = await cache_service.redis.spop(
+                    self.DIRTY_KEY, settings.PROGRESS_FLUSH_BATCH_SIZE
+                )
+            if not user_ids:
+                return []
+
+            async with cache_service.pipeline() as pipe:
+                for user_id in user_ids:
+                    pipe.eval(_TAKE_SCRIPT, 1, self.USER_KEY.format(user_id=user_id))
+                results = await pipe.execute()
+        except Exception as e:
+            logger.error(f"Error taking buffered progress from Redis: {str(e)}")
+            return []
+
+        taken_users = []
+        for user_id, flat in zip(user_ids, results):
+            user_id = int(user_id)
+            taken_users.append(user_id)
+            # HGETALL из Lua приходит плоским списком [field, value, ...]
+            for episode_id, value in zip(flat[::2], flat[1::2]):
+                key = (user_id, int(episode_id))
+                row = self._to_row(user_id, int(episode_id), json.loads(value))
+                current = rows.get(key)
+                if current is None or current["watched_at"] < row["watched_at"]:
+                    rows[key] = row
+
+        return taken_users
+
+    async def _restore(self, rows: Dict[Tuple[int, int], dict], taken_users: List[int]):
+        """Вернуть несохраненные записи в буфер (более свежие записи не затираются)"""
+        if cache_service.is_connected and taken_users:
+            try:
+                async with cache_service.pipeline() as pipe:
+                    for (user_id, episode_id), row in rows.items():
+                        pipe.hsetnx(
+                            self.USER_KEY.format(user_id=user_id),
+                            str(episode_id),
+                            json.dumps(self._to_entry(row))
+                        )
+                    pipe.sadd(self.DIRTY_KEY, *[str(user_id) for user_id in taken_users])
+                    await pipe.execute()
+                return
+            except Exception as e:
+                logger.error(f"Error restoring buffered progress to Redis: {str(e)}")
+
+        for key, row in rows.items():
+            self._memory.setdefault(key, self._to_entry(row))
+
+    async def _run(self):
+        """Периодический сброс буфера"""
+        while True:
+            await asyncio.sleep(settings.PROGRESS_FLUSH_INTERVAL)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Watch progress flush loop error: {str(e)}")
+
+    def start(self):
+        """Запустить фоновый сброс буфера"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Остановить фоновый сброс и сохранить остатки буфера"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        await self.flush()
+
+    @staticmethod
+    def _to_row(user_id: int, episode_id: int, entry: dict) -> dict:
+        return {
+            "user_id": user_id,
+            "episode_id": episode_id,
+            "progress": entry["progress"],
+            "completed": entry["completed"],
+            "watched_at": datetime.fromisoformat(entry["watched_at"])
+        }
+
+    @staticmethod
+    def _to_entry(row: dict) -> dict:
+        return {
+            "progress": row["progress"],
+            "completed": row["completed"],
+            "watched_at": row["watched_at"].isoformat()
+        }
+
+
+# Глобальный экземпляр буфера прогресса
+progress_buffer = ProgressBuffer()
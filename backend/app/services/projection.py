@@ -0,0 +1,56 @@
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import func, literal_column
+
+# Выбранные поля ответа: поле -> None для скалярного поля или кортеж
+# вложенных полей для связанных объектов (genres -> ("id", "name"))
+FieldSelection = Dict[str, Optional[Tuple[str, ...]]]
+
+
+def json_object(**fields):
+    """json_build_object с ключами-литералами (asyncpg не выводит тип параметра-ключа)"""
+    args = []
+    for key, value in fields.items():
+        args += [literal_column(f"'{key}'"), value]
+    return func.json_build_object(*args)
+
+
+def parse_fields(raw: str, allowed: FieldSelection) -> FieldSelection:
+    """Разобрать ?fields=id,title_romaji,genres.name по разрешенным полям.
+
+    Связанный объект без уточнения (genres) выбирается целиком. id
+    добавляется всегда. Неизвестное поле вызывает ValueError
+    """
+    selection: FieldSelection = {"id": None}
+    for item in raw.split(","):
+        item = item.strip()
+        if not item:
+            continue
+
+        name, _, nested = item.partition(".")
+        if name not in allowed:
+            raise ValueError(f"Unknown field: {item}")
+
+        subfields = allowed[name]
+        if not nested:
+            selection[name] = subfields
+            continue
+
+        if subfields is None or nested not in subfields:
+            raise ValueError(f"Unknown field: {item}")
+        # Уже выбранный целиком объект не сужается
+        if name in selection and selection[name] == subfields:
+            continue
+        selected = selection.get(name) or ()
+        if nested not in selected:
+            selection[name] = selected + (nested,)
+
+    return selection
+
+
+def schema_fields(schema, related: Dict[str, type]) -> FieldSelection:
+    """Разрешенные поля схемы ответа; related - схемы вложенных объектов"""
+    return {
+        name: tuple(related[name].model_fields) if name in related else None
+        for name in schema.model_fields
+    }
@@ -0,0 +1,106 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from loguru import logger
+
+from app.services.cache_service import cache_service
+
+MessageHandler = Callable[[str, str], Awaitable[None]]
+
+
+class PubSubHub:
+    """Одна подписка Redis pub/sub на воркер, разделяемая всеми потребителями.
+
+    Обработчики регистрируются на канал или паттерн и вызываются с
+    (channel, data) для каждого сообщения.
+    """
+
+    def __init__(self):
+        self._handlers: Dict[str, List[MessageHandler]] = {}
+        self._pattern_handlers: Dict[str, List[MessageHandler]] = {}
+        self._pubsub = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def subscribe(self, channel: str, handler: MessageHandler):
+        """Подписать обработчик на канал"""
+        first = channel not in self._handlers
+        self._handlers.setdefault(channel, []).append(handler)
+        if first and self._pubsub is not None:
+            await self._pubsub.subscribe(channel)
+
+    async def psubscribe(self, pattern: str, handler: MessageHandler):
+        """Подписать обработчик на паттерн каналов"""
+        first = pattern not in self._pattern_handlers
+        self._pattern_handlers.setdefault(pattern, []).append(handler)
+        if first and self._pubsub is not None:
+            await self._pubsub.psubscribe(pattern)
+
+    async def publish(self, channel: str, data: str) -> bool:
+        """Опубликовать сообщение"""
+        if not cache_service.is_connected:
+            return False
+
+        try:
+            await cache_service.redis.publish(channel, data)
+            return True
+        except Exception as e:
+            logger.error(f"Error publishing to {channel}: {str(e)}")
+            return False
+
+    async def start(self):
+        """Запустить прослушивание"""
+        if self._task is not None or not cache_service.is_connected:
+            return
+
+        self._pubsub = cache_service.redis.pubsub()
+        # Пустой pubsub не слушает; служебный канал держит подписку живой
+        await self._pubsub.subscribe("anistand:pubsub", *self._handlers)
+        if self._pattern_handlers:
+            await self._pubsub.psubscribe(*self._pattern_handlers)
+
+        self._task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        """Остановить прослушивание"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        if self._pubsub is not None:
+            await self._pubsub.close()
+            self._pubsub = None
+
+    async def _listen(self):
+        while True:
+            try:
+                message = await self._pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=1.0
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Pub/sub connection error: {str(e)}")
+                await asyncio.sleep(1.0)
+                continue
+
+            if message is None:
+                continue
+
+            if message["type"] == "pmessage":
+                handlers = self._pattern_handlers.get(message["pattern"], [])
+            else:
+                handlers = self._handlers.get(message["channel"], [])
+
+            for handler in handlers:
+                try:
+                    await handler(message["channel"], message["data"])
+                except Exception as e:
+                    logger.error(f"Pub/sub handler error on {message['channel']}: {str(e)}")
+
+
+# Глобальный экземпляр pub/sub (по одному на воркер)
+pubsub_hub = PubSubHub()
@@ -0,0 +1,97 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete, func, or_
+from sqlalchemy.dialects.postgresql import insert
+from typing import Optional
+
+from app.models.anime import AnimeRatingStats
+from app.models.user import Rating
+
+SCORE_COLUMNS = [f"score_{score}" for score in range(1, 11)]
+
+
+class RatingService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def apply_rating_change(
+        self,
+        anime_id: int,
+        old_score: Optional[int],
+        new_score: int
+    ) -> None:
+        """Инкрементально обновить агрегат оценок (без commit)"""
+
+        if old_score == new_score:
+            return
+
+        stats = AnimeRatingStats.__table__.c
+        count_delta = 0 if old_score is not None else 1
+        sum_delta = new_score - (old_score or 0)
+
+        set_ = {
+            "ratings_count": stats.ratings_count + count_delta,
+            "ratings_sum": stats.ratings_sum + sum_delta,
+            f"score_{new_score}": stats[f"score_{new_score}"] + 1,
+            "updated_at": func.now()
+        }
+        if old_score is not None:
+            set_[f"score_{old_score}"] = stats[f"score_{old_score}"] - 1
+
+        stmt = insert(AnimeRatingStats).values(
+            anime_id=anime_id,
+            ratings_count=1,
+            ratings_sum=new_score,
+            **{column: int(column == f"score_{new_score}") for column in SCORE_COLUMNS}
+        ).on_conflict_do_update(
+            index_elements=[AnimeRatingStats.anime_id],
+            set_=set_
+        )
+
+        await self.db.execute(stmt)
+
+    async def reconcile_stats(self) -> int:
+        """Пересчитать агрегаты из ratings и исправить расхождения.
+
+        Возвращает количество исправленных строк.
+        """
+
+        aggregated = select(
+            Rating.anime_id,
+            func.count().label("ratings_count"),
+            func.sum(Rating.score).label("ratings_sum"),
+            *[
+                func.count().filter(Rating.score == score).label(f"score_{score}")
+                for score in range(1, 11)
+            ]
+        ).group_by(Rating.anime_id)
+
+        columns = ["anime_id", "ratings_count", "ratings_sum", *SCORE_COLUMNS]
+        stmt = insert(AnimeRatingStats).from_select(columns, aggregated)
+
+        stats = AnimeRatingStats.__table__.c
+        # Обновляем только строки, которые действительно разошлись
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[AnimeRatingStats.anime_id],
+            set_={
+                **{column: stmt.excluded[column] for column in columns[1:]},
+                "updated_at": func.now()
+            },
+            where=or_(*[
+                stats[column] != stmt.excluded[column] for column in columns[1:]
+            ])
+        )
+
+        result = await self.db.execute(stmt)
+        fixed = result.rowcount
+
+        # Агрегаты аниме, у которых не осталось оценок
+        orphaned = await self.db.execute(
+            delete(AnimeRatingStats).where(
+                AnimeRatingStats.anime_id.not_in(select(Rating.anime_id).distinct())
+            )
+        )
+        fixed += orphaned.rowcount
+
+        await self.db.commit()
+
+        return fixed
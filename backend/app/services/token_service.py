@@ -0,0 +1,236 @@
+import hashlib
+import json
+import secrets
+import time
+from typing import Dict, Optional, Tuple
+
+from loguru import logger
+
+from app.config import settings
+from app.services.cache_service import cache_service
+from app.services.pubsub import pubsub_hub
+
+
+class RevocationRegistry:
+    """Локальный кеш отозванных токенов пользователей.
+
+    Токен пользователя отозван, если его версия (claim "ver") меньше
+    минимальной допустимой. Записи хранятся в Redis hash и рассылаются
+    воркерам через pub/sub, поэтому проверка не делает сетевых запросов.
+    Запись живет не дольше самого долгоживущего токена.
+    """
+
+    KEY = "auth:revocations"
+    CHANNEL = "auth:revocations"
+
+    def __init__(self):
+        # user_id -> (минимальная версия токена, момент истечения записи)
+        self._revoked: Dict[int, Tuple[int, float]] = {}
+
+    @property
+    def ttl(self) -> int:
+        return settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+
+    def is_revoked(self, user_id: int, token_version: int) -> bool:
+        """Проверить, отозван ли токен с указанной версией"""
+        entry = self._revoked.get(user_id)
+        if entry is None:
+            return False
+
+        min_version, expires_at = entry
+        if expires_at < time.time():
+            self._revoked.pop(user_id, None)
+            return False
+
+        return token_version < min_version
+
+    async def revoke(self, user_id: int, min_version: int):
+        """Отозвать токены пользователя с версией меньше min_version"""
+        expires_at = time.time() + self.ttl
+        self._remember(user_id, min_version, expires_at)
+
+        payload = json.dumps({"user_id": user_id, "v": min_version, "exp": expires_at})
+        if cache_service.is_connected:
+            try:
+                await cache_service.redis.hset(self.KEY, str(user_id), payload)
+            except Exception as e:
+                logger.error(f"Error storing token revocation: {str(e)}")
+        await pubsub_hub.publish(self.CHANNEL, payload)
+
+    async def load(self):
+        """Загрузить действующие отзывы из Redis и подписаться на обновления"""
+        await pubsub_hub.subscribe(self.CHANNEL, self._on_message)
+
+        if not cache_service.is_connected:
+            return
+
+        try:
+            entries = await cache_service.redis.hgetall(self.KEY)
+        except Exception as e:
+            logger.error(f"Error loading token revocations: {str(e)}")
+            return
+
+        now = time.time()
+        expired = []
+        for user_id, payload in entries.items():
+            data = json.loads(payload)
+            if data["exp"] < now:
+                expired.append(user_id)
+            else:
+                self._remember(int(user_id), data["v"], data["exp"])
+
+        if expired:
+            await cache_service.redis.hdel(self.KEY, *expired)
+
+    async def _on_message(self, channel: str, data: str):
+        entry = json.loads(data)
+        self._remember(entry["user_id"], entry["v"], entry["exp"])
+
+    def _remember(self, user_id: int, min_version: int, expires_at: float):
+        current = self._revoked.get(user_id)
+        if current is None or current[0] <= min_version:
+            self._revoked[user_id] = (min_version, expires_at)
+
+
+# Глобальный экземпляр реестра отзывов
+revocation_registry = RevocationRegistry()
+
+
+# Атомарно погасить refresh токен. Повторное предъявление уже погашенного
+# токена означает его утечку: семейство токенов отзывается целиком
+_ROTATE_SCRIPT = """
+local raw = redis.call('GET', KEYS[1])
+if not raw then
+    local family = redis.call('GET', KEYS[2])
+    if family then
+        redis.call('DEL', ARGV[1] .. family)
+        return {'reused', family}
+    end
+    return {'missing'}
+end
+redis.call('DEL', KEYS[1])
+local data = cjson.decode(raw)
+if redis.call('EXISTS', ARGV[1] .. data['fam']) == 0 then
+    return {'missing'}
+end
+redis.call('SET', KEYS[2], data['fam'], 'EX', ARGV[2])
+return {'ok', raw}
+"""
+
+
+class RefreshTokenStore:
+    """Ротируемые refresh токены в Redis.
+
+    Токен непрозрачный; в Redis хранится только его sha256 с claims
+    пользователя и идентификатором семейства. Каждое обновление гасит
+    токен и выдает новый в том же семействе; погашенный токен помнится
+    до конца срока жизни, и его повторное использование отзывает семейство.
+    """
+
+    TOKEN_KEY = "auth:refresh:{digest}"
+    USED_KEY = "auth:refresh_used:{digest}"
+    FAMILY_PREFIX = "auth:refresh_family:"
+    USER_KEY = "auth:refresh_user:{user_id}"
+
+    @property
+    def ttl(self) -> int:
+        return settings.REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60 * 60
+
+    @staticmethod
+    def _digest(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    async def issue(self, claims: dict, family: Optional[str] = None) -> Optional[str]:
+        """Выдать refresh токен (в новом или существующем семействе)"""
+        if not cache_service.is_connected:
+            return None
+
+        token = secrets.token_urlsafe(32)
+        family = family or secrets.token_hex(16)
+        user_key = self.USER_KEY.format(user_id=claims["uid"])
+        payload = json.dumps({**claims, "fam": family})
+
+        try:
+            async with cache_service.pipeline(transaction=True) as pipe:
+                pipe.set(self.TOKEN_KEY.format(digest=self._digest(token)), payload, ex=self.ttl)
+                pipe.set(self.FAMILY_PREFIX + family, claims["uid"], ex=self.ttl)
+                pipe.sadd(user_key, family)
+                pipe.expire(user_key, self.ttl)
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"Error issuing refresh token: {str(e)}")
+            return None
+
+        return token
+
+    async def rotate(self, token: str) -> Optional[Tuple[str, dict]]:
+        """Погасить токен и выдать новый. Возвращает (новый токен, claims) или None"""
+        if not cache_service.is_connected:
+            return None
+
+        digest = self._digest(token)
+        try:
+            result = await cache_service.redis.eval(
+                _ROTATE_SCRIPT, 2,
+                self.TOKEN_KEY.format(digest=digest), self.USED_KEY.format(digest=digest),
+                self.FAMILY_PREFIX, self.ttl
+            )
+        except Exception as e:
+            logger.error(f"Error rotating refresh token: {str(e)}")
+            return None
+
+        if result[0] == "reused":
+            logger.warning(f"Refresh token reuse detected, family {result[1]} revoked")
+            return None
+        if result[0] != "ok":
+            return None
+
+        claims = json.loads(result[1])
+        family = claims.pop("fam")
+        if not claims.get("act", True) or revocation_registry.is_revoked(claims["uid"], claims["ver"]):
+            await self.revoke_family(family)
+            return None
+
+        new_token = await self.issue(claims, family)
+        if new_token is None:
+            return None
+
+        return new_token, claims
+
+    async def revoke(self, token: str) -> bool:
+        """Отозвать семейство, которому принадлежит токен (выход с устройства)"""
+        if not cache_service.is_connected:
+            return False
+
+        try:
+            raw = await cache_service.redis.get(self.TOKEN_KEY.format(digest=self._digest(token)))
+        except Exception as e:
+            logger.error(f"Error reading refresh token: {str(e)}")
+            return False
+
+        if raw is None:
+            return False
+
+        await self.revoke_family(json.loads(raw)["fam"])
+        return True
+
+    async def revoke_family(self, family: str):
+        """Отозвать семейство токенов"""
+        await cache_service.delete(self.FAMILY_PREFIX + family)
+
+    async def revoke_user(self, user_id: int):
+        """Отозвать все семейства токенов пользователя"""
+        if not cache_service.is_connected:
+            return
+
+        user_key = self.USER_KEY.format(user_id=user_id)
+        try:
+            families = await cache_service.redis.smembers(user_key)
+            keys = [self.FAMILY_PREFIX + family for family in families]
+            await cache_service.redis.delete(user_key, *keys)
+        except Exception as e:
+            logger.error(f"Error revoking refresh tokens: {str(e)}")
+
+
+# Глобальный экземпляр хранилища refresh токенов
+refresh_tokens = RefreshTokenStore()
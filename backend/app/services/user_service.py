@@ -1,12 +1,23 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete
-from sqlalchemy.orm import selectinload
+from sqlalchemy import select, delete, update, func, or_
+from sqlalchemy.dialects.postgresql import insert
 from typing import List, Optional
+from datetime import datetime
 
 from app.models.user import User, UserFavorite, WatchHistory, Rating
 from app.models.anime import Anime
+from app.models.episode import Episode
+from app.schemas.anime import AnimeView
 from app.schemas.user import UserCreate, UserUpdate
-from app.utils.security import get_password_hash, verify_password
+from app.services.anime_service import anime_list_query
+from app.services.projection import FieldSelection
+from app.services.payload_cache import payload_cache, ANIME_DETAIL_KEY
+from app.services.library_state import library_state
+from app.services.progress_buffer import progress_buffer
+from app.services.rating_service import RatingService
+from app.services.token_service import revocation_registry, refresh_tokens
+from app.utils.security import get_password_hash_async, verify_password_async
+from app.utils.helpers import encode_cursor, decode_cursor
 
 
 class UserService:
@@ -29,7 +40,7 @@ class UserService:
 
     async def create_user(self, user_data: UserCreate) -> User:
         """Создать нового пользователя"""
-        hashed_password = get_password_hash(user_data.password)
+        hashed_password = await get_password_hash_async(user_data.password)
         
         user = User(
             username=user_data.username,
@@ -50,7 +61,7 @@ class UserService:
         if not user:
             return None
         
-        if not verify_password(password, user.password_hash):
+        if not await verify_password_async(password, user.password_hash):
             return None
         
         return user
@@ -74,24 +85,58 @@ class UserService:
         
         return user
 
-    async def add_to_favorites(self, user_id: int, anime_id: int) -> bool:
-        """Добавить аниме в избранное"""
-        # Проверяем, не добавлено ли уже
-        existing = await self.db.execute(
-            select(UserFavorite).where(
-                UserFavorite.user_id == user_id,
-                UserFavorite.anime_id == anime_id
-            )
+    async def revoke_tokens(self, user_id: int) -> int:
+        """Отозвать все токены пользователя (увеличить версию токенов)"""
+        result = await self.db.execute(
+            update(User)
+            .where(User.id == user_id)
+            .values(token_version=User.token_version + 1)
+            .returning(User.token_version)
         )
+        token_version = result.scalar_one()
+        await self.db.commit()
+        
+        await revocation_registry.revoke(user_id, token_version)
+        await refresh_tokens.revoke_user(user_id)
+        
+        return token_version
+
+    async def set_active(self, user_id: int, is_active: bool) -> Optional[User]:
+        """Активировать/деактивировать пользователя; деактивация отзывает токены"""
+        user = await self.db.get(User, user_id)
+        
+        if not user:
+            return None
         
-        if existing.scalar_one_or_none():
-            return False
+        user.is_active = is_active
+        if not is_active:
+            user.token_version = (user.token_version or 0) + 1
         
-        favorite = UserFavorite(user_id=user_id, anime_id=anime_id)
-        self.db.add(favorite)
         await self.db.commit()
+        await self.db.refresh(user)
+        
+        if not is_active:
+            await revocation_registry.revoke(user_id, user.token_version)
+            await refresh_tokens.revoke_user(user_id)
+        
+        return user
+
+    async def add_to_favorites(self, user_id: int, anime_id: int) -> bool:
+        """Добавить аниме в избранное. Возвращает False, если уже добавлено"""
+        result = await self.db.execute(
+            insert(UserFavorite)
+            .values(user_id=user_id, anime_id=anime_id)
+            .on_conflict_do_nothing(
+                index_elements=[UserFavorite.user_id, UserFavorite.anime_id]
+            )
+            .returning(UserFavorite.anime_id)
+        )
+        inserted = result.scalar_one_or_none() is not None
+        await self.db.commit()
+        
+        await library_state.patch(user_id, anime_id, {"f": 1})
         
-        return True
+        return inserted
 
     async def remove_from_favorites(self, user_id: int, anime_id: int) -> bool:
         """Удалить аниме из избранного"""
@@ -101,54 +146,150 @@ class UserService:
                 UserFavorite.anime_id == anime_id
             )
         )
+        await self.db.commit()
+        
+        await library_state.patch(user_id, anime_id, {"f": 0})
         
         return result.rowcount > 0
 
-    async def get_user_favorites(self, user_id: int) -> List[Anime]:
+    async def get_user_favorites(
+        self,
+        user_id: int,
+        view: AnimeView = AnimeView.full,
+        fields: Optional[FieldSelection] = None
+    ) -> List[dict]:
         """Получить избранное аниме пользователя"""
         result = await self.db.execute(
-            select(Anime).join(UserFavorite).where(
-                UserFavorite.user_id == user_id
-            ).options(
-                selectinload(Anime.genres),
-                selectinload(Anime.studios)
-            )
+            anime_list_query(view, fields)
+            .join(UserFavorite, UserFavorite.anime_id == Anime.id)
+            .where(UserFavorite.user_id == user_id)
         )
         
-        return result.scalars().all()
+        return [dict(row) for row in result.mappings()]
+
+    def _watch_history_query(self, user_id: int):
+        """История просмотров с данными эпизода и аниме одним запросом"""
+        return (
+            select(
+                WatchHistory.id,
+                WatchHistory.episode_id,
+                WatchHistory.progress,
+                WatchHistory.completed,
+                WatchHistory.watched_at,
+                Episode.episode_number,
+                Episode.title.label("episode_title"),
+                Episode.anime_id,
+                Anime.title_romaji.label("anime_title"),
+                Anime.title_english.label("anime_title_english"),
+                Anime.cover_image
+            )
+            .join(Episode, WatchHistory.episode_id == Episode.id)
+            .join(Anime, Episode.anime_id == Anime.id)
+            .where(WatchHistory.user_id == user_id)
+        )
 
-    async def get_watch_history(self, user_id: int) -> List[WatchHistory]:
-        """Получить историю просмотров пользователя"""
+    async def get_watch_history(
+        self,
+        user_id: int,
+        cursor: Optional[str] = None,
+        limit: int = 20
+    ) -> dict:
+        """Получить историю просмотров пользователя (keyset-пагинация по watched_at, id)"""
+        query = self._watch_history_query(user_id)
+        
+        if cursor:
+            values = decode_cursor(cursor) or []
+            try:
+                watched_at, last_id = datetime.fromisoformat(values[0]), int(values[1])
+            except (IndexError, TypeError, ValueError):
+                raise ValueError("Invalid cursor")
+            # watched_at <= X попадает в индекс, остальное - фильтр по границе
+            query = query.where(
+                WatchHistory.watched_at <= watched_at,
+                or_(
+                    WatchHistory.watched_at < watched_at,
+                    WatchHistory.id < last_id
+                )
+            )
+        else:
+            # Первая страница должна видеть прогресс, еще лежащий в буфере
+            await progress_buffer.flush_user(user_id)
+        
         result = await self.db.execute(
-            select(WatchHistory).where(
-                WatchHistory.user_id == user_id
-            ).order_by(WatchHistory.watched_at.desc())
+            query.order_by(WatchHistory.watched_at.desc(), WatchHistory.id.desc())
+            .limit(limit + 1)
         )
+        rows = result.mappings().all()
         
-        return result.scalars().all()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]["watched_at"], rows[-1]["id"])
+        
+        return {"data": rows, "next_cursor": next_cursor}
 
-    async def rate_anime(self, user_id: int, anime_id: int, score: int) -> Rating:
-        """Оценить аниме"""
-        # Проверяем существующую оценку
-        existing = await self.db.execute(
-            select(Rating).where(
-                Rating.user_id == user_id,
-                Rating.anime_id == anime_id
+    async def get_continue_watching(self, user_id: int, limit: int = 20) -> List[dict]:
+        """Последний просмотренный эпизод по каждому аниме"""
+        await progress_buffer.flush_user(user_id)
+        
+        latest = (
+            self._watch_history_query(user_id)
+            .distinct(Episode.anime_id)
+            .order_by(
+                Episode.anime_id,
+                WatchHistory.watched_at.desc(),
+                WatchHistory.id.desc()
             )
+            .subquery()
         )
         
-        rating = existing.scalar_one_or_none()
+        result = await self.db.execute(
+            select(latest).order_by(latest.c.watched_at.desc()).limit(limit)
+        )
         
-        if rating:
-            # Обновляем существующую оценку
-            rating.score = score
-        else:
-            # Создаем новую оценку
-            rating = Rating(user_id=user_id, anime_id=anime_id, score=score)
-            self.db.add(rating)
+        return result.mappings().all()
+
+    async def rate_anime(self, user_id: int, anime_id: int, score: int) -> Rating:
+        """Оценить аниме (upsert) и обновить агрегат оценок"""
+        while True:
+            # Блокировка строки: параллельная оценка того же пользователя
+            # ждет коммита и видит уже обновленную прежнюю оценку
+            previous_score = await self.db.scalar(
+                select(Rating.score)
+                .where(Rating.user_id == user_id, Rating.anime_id == anime_id)
+                .with_for_update()
+            )
+            if previous_score is not None:
+                stmt = (
+                    update(Rating)
+                    .where(Rating.user_id == user_id, Rating.anime_id == anime_id)
+                    .values(score=score, updated_at=func.now())
+                    .returning(Rating)
+                )
+                rating = (
+                    await self.db.execute(stmt, execution_options={"populate_existing": True})
+                ).scalar_one()
+                break
+            
+            # Первая оценка. При гонке двух первых оценок вторая вставка ждет
+            # коммита первой и ничего не вставляет - тогда повторяем с блокировкой
+            stmt = (
+                insert(Rating)
+                .values(user_id=user_id, anime_id=anime_id, score=score)
+                .on_conflict_do_nothing(index_elements=[Rating.user_id, Rating.anime_id])
+                .returning(Rating)
+            )
+            rating = (
+                await self.db.execute(stmt, execution_options={"populate_existing": True})
+            ).scalar_one_or_none()
+            if rating is not None:
+                break
         
+        await RatingService(self.db).apply_rating_change(anime_id, previous_score, score)
         await self.db.commit()
-        await self.db.refresh(rating)
+        
+        # Агрегат оценок входит в детали аниме
+        await payload_cache.invalidate(ANIME_DETAIL_KEY.format(anime_id=anime_id))
         
         return rating
 
@@ -0,0 +1,230 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, List, Optional, Tuple, Type
+
+from loguru import logger
+
+from app.config import settings
+from app.utils.metrics import count_circuit_rejection, set_circuit_state
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Число корзин скользящего окна
+WINDOW_BUCKETS = 10
+
+
+class CircuitOpenError(Exception):
+    """Зависимость отключена автоматом, вызов отклонен без обращения к ней"""
+
+    def __init__(self, name: str, retry_after: float):
+        self.name = name
+        self.retry_after = retry_after
+        super().__init__(f"Circuit '{name}' is open, retry in {retry_after:.1f}s")
+
+
+class CircuitBreaker:
+    """Автомат отключения деградировавшей зависимости.
+
+    Считает вызовы, ошибки и медленные вызовы в скользящем окне window
+    секунд. Размыкается, когда доля ошибок или медленных вызовов превышает
+    порог (при не менее minimum_calls вызовов в окне) или подряд случилось
+    consecutive_failures ошибок. В разомкнутом состоянии вызовы отклоняются
+    сразу; через open_seconds пропускается half_open_calls пробных вызовов,
+    и по их результату автомат замыкается или снова размыкается.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        slow_call_seconds: float,
+        open_seconds: float,
+        window: float = None,
+        minimum_calls: int = None,
+        failure_rate: float = None,
+        slow_call_rate: float = None,
+        consecutive_failures: int = None,
+        half_open_calls: int = 1
+    ):
+        self.name = name
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.window = window or settings.CIRCUIT_BREAKER_WINDOW
+        self.minimum_calls = minimum_calls or settings.CIRCUIT_BREAKER_MIN_CALLS
+        self.failure_rate = failure_rate or settings.CIRCUIT_BREAKER_FAILURE_RATE
+        self.slow_call_rate = slow_call_rate or settings.CIRCUIT_BREAKER_SLOW_CALL_RATE
+        self.consecutive_failures = consecutive_failures or settings.CIRCUIT_BREAKER_CONSECUTIVE_FAILURES
+        self.half_open_calls = half_open_calls
+
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        self._failure_streak = 0
+        # [начало корзины, вызовы, ошибки, медленные]
+        self._buckets: Deque[List[float]] = deque()
+
+        # Счетчики с момента запуска
+        self.calls = 0
+        self.failures = 0
+        self.slow_calls = 0
+        self.rejected = 0
+        self.opened = 0
+        set_circuit_state(name, CLOSED)
+
+    @property
+    def state(self) -> str:
+        """Текущее состояние с учетом истекшего времени размыкания"""
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._transition(HALF_OPEN)
+        return self._state
+
+    @property
+    def available(self) -> bool:
+        """Будет ли вызов пропущен сейчас (без резервирования пробного вызова)"""
+        state = self.state
+        if state == CLOSED:
+            return True
+        return state == HALF_OPEN and self._probes < self.half_open_calls
+
+    def acquire(self):
+        """Разрешить вызов или выбросить CircuitOpenError"""
+        state = self.state
+        if state == CLOSED:
+            return
+        if state == HALF_OPEN and self._probes < self.half_open_calls:
+            self._probes += 1
+            return
+
+        self.rejected += 1
+        count_circuit_rejection(self.name)
+        retry_after = max(self.open_seconds - (time.monotonic() - self._opened_at), 0.0)
+        raise CircuitOpenError(self.name, retry_after)
+
+    def on_success(self, duration: float):
+        """Учесть успешный вызов"""
+        slow = duration >= self.slow_call_seconds
+        self._record(failed=False, slow=slow)
+        self._failure_streak = 0
+
+        if self._state == HALF_OPEN:
+            self._probes = max(self._probes - 1, 0)
+            # Медленная проба не считается восстановлением
+            self._transition(OPEN if slow else CLOSED)
+        elif self._state == CLOSED:
+            self._check_window()
+
+    def on_failure(self, duration: float):
+        """Учесть вызов, завершившийся ошибкой зависимости"""
+        self._record(failed=True, slow=duration >= self.slow_call_seconds)
+        self._failure_streak += 1
+
+        if self._state == HALF_OPEN:
+            self._probes = max(self._probes - 1, 0)
+            self._transition(OPEN)
+        elif self._state == CLOSED:
+            if self._failure_streak >= self.consecutive_failures:
+                self._transition(OPEN)
+            else:
+                self._check_window()
+
+    def release(self):
+        """Вернуть пробный вызов без результата (запрос отменен)"""
+        if self._state == HALF_OPEN:
+            self._probes = max(self._probes - 1, 0)
+
+    @asynccontextmanager
+    async def guard(self, failures: Tuple[Type[BaseException], ...] = (Exception,)):
+        """Выполнить блок под автоматом; ошибкой зависимости считаются failures"""
+        self.acquire()
+        started = time.monotonic()
+        try:
+            yield
+        except asyncio.CancelledError:
+            self.release()
+            raise
+        except failures:
+            self.on_failure(time.monotonic() - started)
+            raise
+        except BaseException:
+            # Ошибка вызывающего кода, а не зависимости
+            self.on_success(time.monotonic() - started)
+            raise
+        else:
+            self.on_success(time.monotonic() - started)
+
+    def snapshot(self) -> dict:
+        """Состояние и счетчики для мониторинга"""
+        calls, failures, slow = self._window_totals()
+        return {
+            "state": self.state,
+            "window": {"calls": calls, "failures": failures, "slow_calls": slow},
+            "calls": self.calls,
+            "failures": self.failures,
+            "slow_calls": self.slow_calls,
+            "rejected": self.rejected,
+            "opened": self.opened
+        }
+
+    def _record(self, failed: bool, slow: bool):
+        self.calls += 1
+        self.failures += failed
+        self.slow_calls += slow
+
+        now = time.monotonic()
+        width = self.window / WINDOW_BUCKETS
+        if not self._buckets or now - self._buckets[-1][0] >= width:
+            self._buckets.append([now, 0, 0, 0])
+        bucket = self._buckets[-1]
+        bucket[1] += 1
+        bucket[2] += failed
+        bucket[3] += slow
+
+    def _window_totals(self) -> Tuple[int, int, int]:
+        horizon = time.monotonic() - self.window
+        while self._buckets and self._buckets[0][0] < horizon:
+            self._buckets.popleft()
+        calls = sum(bucket[1] for bucket in self._buckets)
+        failures = sum(bucket[2] for bucket in self._buckets)
+        slow = sum(bucket[3] for bucket in self._buckets)
+        return calls, failures, slow
+
+    def _check_window(self):
+        calls, failures, slow = self._window_totals()
+        if calls < self.minimum_calls:
+            return
+        if failures / calls >= self.failure_rate or slow / calls >= self.slow_call_rate:
+            self._transition(OPEN)
+
+    def _transition(self, state: str):
+        if state == self._state:
+            if state == OPEN:
+                self._opened_at = time.monotonic()
+            return
+
+        previous, self._state = self._state, state
+        set_circuit_state(self.name, state)
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+            self.opened += 1
+            logger.warning(f"Circuit '{self.name}' opened (was {previous})")
+        elif state == CLOSED:
+            self._buckets.clear()
+            self._failure_streak = 0
+            logger.info(f"Circuit '{self.name}' closed")
+        self._probes = 0
+
+
+# Автоматы процесса по имени зависимости
+circuit_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def circuit_breaker(name: str, **options) -> CircuitBreaker:
+    """Получить или создать автомат для зависимости"""
+    breaker: Optional[CircuitBreaker] = circuit_breakers.get(name)
+    if breaker is None:
+        breaker = circuit_breakers[name] = CircuitBreaker(name, **options)
+    return breaker
@@ -0,0 +1,69 @@
+import gzip
+from typing import Dict, Optional
+
+from app.config import settings
+
+try:
+    import brotli
+except ImportError:  # brotli необязателен, без него отдаем только gzip
+    brotli = None
+
+# Кодировки в порядке предпочтения сервера
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+# Типы содержимого, которые имеет смысл сжимать
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "image/svg+xml")
+
+
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    """Выбрать кодировку по заголовку Accept-Encoding"""
+    if not accept_encoding:
+        return None
+
+    accepted = {}
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip()] = quality
+
+    wildcard = accepted.get("*", 0.0)
+    best, best_quality = None, 0.0
+    for encoding in ENCODINGS:
+        quality = accepted.get(encoding, wildcard)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def is_compressible(content_type: Optional[str]) -> bool:
+    """Проверить, стоит ли сжимать ответ с таким Content-Type"""
+    return bool(content_type) and content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def compress(body: bytes, encoding: str, brotli_quality: Optional[int] = None) -> bytes:
+    """Сжать тело ответа целиком"""
+    if encoding == "br":
+        quality = settings.COMPRESSION_BROTLI_QUALITY if brotli_quality is None else brotli_quality
+        return brotli.compress(body, quality=quality, mode=brotli.MODE_TEXT)
+    return gzip.compress(body, compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+def precompress(body: bytes) -> Dict[str, bytes]:
+    """Сжатые варианты тела для кеша; малые тела не сжимаются.
+
+    Вариант сжимается один раз при заполнении кеша, поэтому brotli
+    использует более высокое качество, чем сжатие на лету.
+    """
+    if len(body) < settings.COMPRESSION_MIN_SIZE:
+        return {}
+
+    return {
+        encoding: compress(body, encoding, settings.COMPRESSION_CACHED_BROTLI_QUALITY)
+        for encoding in ENCODINGS
+    }
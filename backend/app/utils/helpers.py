@@ -1,5 +1,7 @@
 from typing import Dict, List, Any, Optional
+import base64
 import hashlib
+import json
 import re
 from datetime import datetime, date
 import asyncio
@@ -12,6 +14,45 @@ def generate_cache_key(*args, **kwargs) -> str:
     return hashlib.md5(key_data.encode()).hexdigest()
 
 
+def encode_cursor(*values: Any) -> str:
+    """Закодировать значения ключа keyset-пагинации в непрозрачный курсор"""
+    payload = json.dumps(
+        [value.isoformat() if isinstance(value, (datetime, date)) else value for value in values],
+        separators=(",", ":")
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Optional[List[Any]]:
+    """Декодировать курсор пагинации. Возвращает None для некорректного курсора"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return values if isinstance(values, list) else None
+    except (ValueError, TypeError):
+        return None
+
+
+def parse_id_list(raw: str) -> List[int]:
+    """Разобрать список ID через запятую без повторов, сохраняя порядок.
+
+    Некорректный ID вызывает ValueError
+    """
+    ids: List[int] = []
+    seen = set()
+    for item in raw.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        value = int(item)
+        if value <= 0:
+            raise ValueError(f"Invalid id: {item}")
+        if value not in seen:
+            seen.add(value)
+            ids.append(value)
+    return ids
+
+
 def clean_html(text: str) -> str:
     """Очистить текст от HTML тегов"""
     if not text:
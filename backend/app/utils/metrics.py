@@ -0,0 +1,178 @@
+import os
+import time
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+
+from app.config import settings
+
+# Каталог должен быть задан до импорта prometheus_client: по нему
+# выбирается хранилище значений (память процесса или mmap-файлы)
+if settings.METRICS_MULTIPROC_DIR:
+    os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", settings.METRICS_MULTIPROC_DIR)
+    os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+try:
+    import prometheus_client
+    from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram
+    from prometheus_client import multiprocess
+except ImportError:  # prometheus_client необязателен, без него метрики не собираются
+    prometheus_client = None
+
+METRICS_ENABLED = settings.METRICS_ENABLED and prometheus_client is not None
+MULTIPROCESS = METRICS_ENABLED and "PROMETHEUS_MULTIPROC_DIR" in os.environ
+
+# Запросы к БД текущего HTTP-запроса: [количество, суммарное время]
+request_db: ContextVar[Optional[List[float]]] = ContextVar("request_db", default=None)
+
+CIRCUIT_STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+if METRICS_ENABLED:
+    HTTP_REQUEST_DURATION = Histogram(
+        "http_request_duration_seconds", "HTTP request latency by route template",
+        ["method", "route", "status"],
+        buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+    )
+    HTTP_REQUEST_DB_QUERIES = Histogram(
+        "http_request_db_queries", "Database queries per HTTP request",
+        ["route"], buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100)
+    )
+    HTTP_REQUEST_DB_SECONDS = Histogram(
+        "http_request_db_seconds", "Database time per HTTP request",
+        ["route"], buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+    )
+    DB_QUERY_DURATION = Histogram(
+        "db_query_duration_seconds", "Database query latency by statement type",
+        ["operation"], buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+    )
+    CACHE_REQUESTS = Counter(
+        "cache_requests_total", "Redis cache lookups by key namespace", ["namespace", "result"]
+    )
+    CLIENT_CACHE_REQUESTS = Counter(
+        "redis_client_cache_requests_total", "Lookups in the in-process copy of hot keys", ["result"]
+    )
+    PARSER_REQUEST_DURATION = Histogram(
+        "parser_request_duration_seconds", "Upstream request latency of parsers",
+        ["upstream", "outcome"], buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+    )
+    CIRCUIT_STATE = Gauge(
+        "circuit_breaker_state", "Circuit state: 0 closed, 1 half-open, 2 open",
+        ["name"], multiprocess_mode="livemax"
+    )
+    CIRCUIT_REJECTED = Counter(
+        "circuit_breaker_rejected_total", "Calls rejected by an open circuit", ["name"]
+    )
+    CELERY_TASK_DURATION = Histogram(
+        "celery_task_duration_seconds", "Celery task duration",
+        ["task", "state"], buckets=(0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0, 900.0, 1800.0)
+    )
+
+
+def key_namespace(key: str) -> str:
+    """Пространство ключа кеша: часть до первого двоеточия"""
+    return key.split(":", 1)[0]
+
+
+def observe_request(method: str, route: str, status: int, duration: float):
+    """Учесть HTTP-запрос и запросы к БД, сделанные при его обработке"""
+    if not METRICS_ENABLED:
+        return
+    HTTP_REQUEST_DURATION.labels(method, route, str(status)).observe(duration)
+    db = request_db.get()
+    if db is not None:
+        HTTP_REQUEST_DB_QUERIES.labels(route).observe(db[0])
+        HTTP_REQUEST_DB_SECONDS.labels(route).observe(db[1])
+
+
+def observe_query(operation: str, duration: float):
+    """Учесть запрос к БД"""
+    if not METRICS_ENABLED:
+        return
+    DB_QUERY_DURATION.labels(operation).observe(duration)
+    db = request_db.get()
+    if db is not None:
+        db[0] += 1
+        db[1] += duration
+
+
+def count_cache(key: str, hit: bool):
+    """Учесть обращение к кешу по ключу"""
+    if METRICS_ENABLED:
+        CACHE_REQUESTS.labels(key_namespace(key), "hit" if hit else "miss").inc()
+
+
+def count_client_cache(hit: bool):
+    """Учесть обращение к локальной копии горячих ключей"""
+    if METRICS_ENABLED:
+        CLIENT_CACHE_REQUESTS.labels("hit" if hit else "miss").inc()
+
+
+def observe_parser(upstream: str, failed: bool, duration: float):
+    """Учесть запрос парсера к источнику"""
+    if METRICS_ENABLED:
+        PARSER_REQUEST_DURATION.labels(upstream, "failure" if failed else "success").observe(duration)
+
+
+def set_circuit_state(name: str, state: str):
+    """Отразить состояние автомата"""
+    if METRICS_ENABLED:
+        CIRCUIT_STATE.labels(name).set(CIRCUIT_STATES[state])
+
+
+def count_circuit_rejection(name: str):
+    """Учесть вызов, отклоненный разомкнутым автоматом"""
+    if METRICS_ENABLED:
+        CIRCUIT_REJECTED.labels(name).inc()
+
+
+def observe_task(task: str, state: str, duration: float):
+    """Учесть выполнение задачи Celery"""
+    if METRICS_ENABLED:
+        CELERY_TASK_DURATION.labels(task, state).observe(duration)
+
+
+def instrument_engine(engine):
+    """Подписаться на события движка SQLAlchemy для учета запросов"""
+    if not METRICS_ENABLED:
+        return
+
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        observe_query(_operation(statement), time.perf_counter() - started)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        started = context.connection.info.get("query_started") if context.connection else None
+        if started:
+            started.pop()
+
+
+def _operation(statement: str) -> str:
+    operation = statement.lstrip()[:6].upper()
+    return operation if operation in ("SELECT", "INSERT", "UPDATE", "DELETE") else "OTHER"
+
+
+def registry():
+    """Реестр для выдачи: в многопроцессном режиме - сумма по файлам воркеров"""
+    if not MULTIPROCESS:
+        return prometheus_client.REGISTRY
+    collector_registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(collector_registry)
+    return collector_registry
+
+
+def render() -> Tuple[bytes, str]:
+    """Метрики в текстовом формате Prometheus"""
+    return prometheus_client.generate_latest(registry()), CONTENT_TYPE_LATEST
+
+
+def start_server(port: int):
+    """Отдельный HTTP-сервер метрик (для процессов без API, например Celery)"""
+    if METRICS_ENABLED and port:
+        prometheus_client.start_http_server(port, registry=registry())
@@ -1,5 +1,7 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
+import asyncio
 from jose import jwt
 from passlib.context import CryptContext
 from app.config import settings
@@ -7,6 +9,18 @@ from app.config import settings
 # Контекст для хеширования паролей
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# bcrypt отпускает GIL, поэтому хеширование выносится в пул потоков,
+# чтобы не блокировать event loop
+_hash_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    thread_name_prefix="password-hash"
+)
+_hash_slots: Optional[asyncio.Semaphore] = None
+
+
+class PasswordHasherBusy(Exception):
+    """Очередь хеширования паролей переполнена"""
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Проверить пароль"""
@@ -18,6 +32,46 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+def _get_hash_slots() -> asyncio.Semaphore:
+    global _hash_slots
+    if _hash_slots is None:
+        # Выполняющиеся + ожидающие в очереди пула задачи
+        _hash_slots = asyncio.Semaphore(
+            settings.PASSWORD_HASH_WORKERS + settings.PASSWORD_HASH_MAX_PENDING
+        )
+    return _hash_slots
+
+
+async def _run_in_hash_pool(func, *args):
+    """Выполнить функцию хеширования в пуле с ограничением очереди"""
+    slots = _get_hash_slots()
+    try:
+        await asyncio.wait_for(slots.acquire(), timeout=settings.PASSWORD_HASH_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise PasswordHasherBusy()
+    
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_hash_executor, func, *args)
+    finally:
+        slots.release()
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Проверить пароль в пуле потоков"""
+    return await _run_in_hash_pool(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """Получить хеш пароля в пуле потоков"""
+    return await _run_in_hash_pool(get_password_hash, password)
+
+
+def shutdown_password_hasher():
+    """Остановить пул хеширования паролей"""
+    _hash_executor.shutdown(wait=False, cancel_futures=True)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Создать JWT токен"""
     to_encode = data.copy()
@@ -37,6 +91,16 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
+def build_token_claims(user) -> dict:
+    """Claims access токена: достаточно для авторизации без запроса к БД"""
+    return {
+        "sub": user.username,
+        "uid": user.id,
+        "act": user.is_active,
+        "ver": user.token_version or 0
+    }
+
+
 def verify_token(token: str) -> Optional[dict]:
     """Проверить JWT токен"""
     try:
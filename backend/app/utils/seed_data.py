@@ -243,6 +243,7 @@ async def create_sample_episodes(db: AsyncSession, anime_list: list):
             )
             
             db.add(episode)
+            anime.episode_count = (anime.episode_count or 0) + 1
             await db.flush()
             
             # Добавляем примеры источников видео
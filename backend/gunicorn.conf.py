@@ -0,0 +1,21 @@
+# Настройки gunicorn (подхватываются автоматически из текущего каталога):
+#     gunicorn app.main:app -w 4 -k uvicorn.workers.UvicornWorker
+# В многопроцессном режиме метрик каталог METRICS_MULTIPROC_DIR очищается
+# при старте мастера, а файлы завершившихся воркеров помечаются мертвыми.
+import os
+import shutil
+
+from app.config import settings
+
+
+def on_starting(server):
+    if settings.METRICS_MULTIPROC_DIR:
+        shutil.rmtree(settings.METRICS_MULTIPROC_DIR, ignore_errors=True)
+        os.makedirs(settings.METRICS_MULTIPROC_DIR, exist_ok=True)
+
+
+def child_exit(server, worker):
+    if settings.METRICS_MULTIPROC_DIR:
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid, settings.METRICS_MULTIPROC_DIR)
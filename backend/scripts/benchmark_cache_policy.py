@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Проверка политик Cache-Control через кеширующий reverse proxy.
+
+Гоняет смешанную нагрузку (популярность аниме по закону Ципфа) через
+nginx из nginx/anistand-cache.conf и считает долю попаданий по заголовку
+X-Cache-Status для каждой группы роутов. Приватные роуты не должны
+попадать в общий кеш ни разу - иначе скрипт завершается с ошибкой.
+
+Пример:
+    docker-compose --profile cache up -d
+    python scripts/benchmark_cache_policy.py --proxy-url http://localhost:8080 \\
+        --username demo --password demo123 --requests 5000 --min-hit-ratio 0.8
+"""
+import argparse
+import asyncio
+import random
+import sys
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+# Статусы nginx, при которых backend не выполнял запрос целиком
+HIT_STATUSES = {"HIT", "STALE", "UPDATING", "REVALIDATED"}
+
+SEARCH_QUERIES = ["one", "naruto", "attack", "love", "sword", "girl", "hero", "night"]
+
+
+class Stats:
+    """Счетчики статусов кеша по группам роутов"""
+
+    def __init__(self):
+        self.statuses: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.cache_control: Dict[str, set] = defaultdict(set)
+
+    def add(self, group: str, response: httpx.Response):
+        status = response.headers.get("x-cache-status", "NONE")
+        self.statuses[group][status] += 1
+        self.cache_control[group].add(response.headers.get("cache-control", "-"))
+
+    def hit_ratio(self, group: str) -> float:
+        counts = self.statuses[group]
+        total = sum(counts.values())
+        hits = sum(count for status, count in counts.items() if status in HIT_STATUSES)
+        return hits / total if total else 0.0
+
+
+def zipf_weights(size: int, exponent: float) -> List[float]:
+    return [1 / (rank ** exponent) for rank in range(1, size + 1)]
+
+
+async def login(client: httpx.AsyncClient, username: str, password: str) -> Optional[str]:
+    response = await client.post(
+        "/api/v1/auth/login", data={"username": username, "password": password}
+    )
+    if response.status_code != 200:
+        print(f"login failed: {response.status_code}, private routes skipped")
+        return None
+    return response.json()["access_token"]
+
+
+async def anime_ids(client: httpx.AsyncClient, count: int) -> List[int]:
+    """ID самых популярных аниме - порядок задает ранг в распределении Ципфа"""
+    response = await client.get("/api/v1/anime/", params={"limit": min(count, 100)})
+    response.raise_for_status()
+    return [item["id"] for item in response.json()["data"]]
+
+
+def build_workload(ids: List[int], total: int, exponent: float, private: bool) -> List[Tuple[str, str, dict]]:
+    """Список запросов (группа, путь, параметры)"""
+    weights = zipf_weights(len(ids), exponent)
+    groups = [
+        ("detail", 40), ("episodes", 20), ("catalog", 12), ("search", 8),
+        ("dictionary", 5), ("comments", 5),
+    ]
+    if private:
+        groups.append(("private", 10))
+
+    names, group_weights = zip(*groups)
+    workload = []
+    for group in random.choices(names, weights=group_weights, k=total):
+        anime_id = random.choices(ids, weights=weights)[0]
+        if group == "detail":
+            workload.append((group, f"/api/v1/anime/{anime_id}", {}))
+        elif group == "episodes":
+            workload.append((group, f"/api/v1/episodes/anime/{anime_id}", {"view": "compact"}))
+        elif group == "catalog":
+            page = random.choices([1, 2, 3, 4], weights=[8, 4, 2, 1])[0]
+            workload.append((group, "/api/v1/anime/", {"page": page, "limit": 20}))
+        elif group == "search":
+            workload.append((group, "/api/v1/anime/search", {"q": random.choice(SEARCH_QUERIES)}))
+        elif group == "dictionary":
+            workload.append((group, random.choice(["/api/v1/anime/genres/", "/api/v1/anime/studios/"]), {}))
+        elif group == "comments":
+            workload.append((group, f"/api/v1/comments/anime/{anime_id}", {}))
+        else:
+            path = random.choice(["/api/v1/users/me", "/api/v1/library/", "/api/v1/users/favorites"])
+            workload.append((group, path, {}))
+    return workload
+
+
+async def run(args) -> int:
+    random.seed(args.seed)
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.proxy_url, limits=limits, timeout=30) as client:
+        token = None
+        if args.username and args.password:
+            token = await login(client, args.username, args.password)
+
+        ids = await anime_ids(client, args.anime)
+        workload = build_workload(ids, args.requests, args.zipf, token is not None)
+
+        stats = Stats()
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def one(group: str, path: str, params: dict):
+            headers = {"Authorization": f"Bearer {token}"} if group == "private" else {}
+            async with semaphore:
+                response = await client.get(path, params=params, headers=headers)
+            stats.add(group, response)
+
+        await asyncio.gather(*(one(*item) for item in workload))
+
+    failed = False
+    print(f"{'group':<12} {'requests':>8} {'hit ratio':>10}  statuses / cache-control")
+    for group in sorted(stats.statuses):
+        counts = stats.statuses[group]
+        ratio = stats.hit_ratio(group)
+        print(
+            f"{group:<12} {sum(counts.values()):>8} {ratio:>10.1%}  "
+            f"{dict(counts)} {sorted(stats.cache_control[group])}"
+        )
+
+        if group == "private":
+            if ratio > 0:
+                print("FAIL: private responses were served from the shared cache")
+                failed = True
+            if any("no-store" not in value for value in stats.cache_control[group]):
+                print("FAIL: private responses without no-store")
+                failed = True
+
+    public = [group for group in stats.statuses if group != "private"]
+    total = sum(sum(stats.statuses[group].values()) for group in public)
+    hits = sum(stats.hit_ratio(group) * sum(stats.statuses[group].values()) for group in public)
+    overall = hits / total if total else 0.0
+    print(f"public hit ratio: {overall:.1%} (origin requests: {total - round(hits)} of {total})")
+
+    if overall < args.min_hit_ratio:
+        print(f"FAIL: public hit ratio below {args.min_hit_ratio:.0%}")
+        failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure shared cache hit ratios behind nginx")
+    parser.add_argument("--proxy-url", default="http://localhost:8080")
+    parser.add_argument("--username")
+    parser.add_argument("--password")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--anime", type=int, default=100, help="size of the popular anime set")
+    parser.add_argument("--zipf", type=float, default=1.1, help="Zipf exponent of anime popularity")
+    parser.add_argument("--min-hit-ratio", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=42)
+
+    sys.exit(asyncio.run(run(parser.parse_args())))
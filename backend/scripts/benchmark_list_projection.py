@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк выдачи списка аниме: ORM-гидрация против Core-проекции.
+
+ORM-путь повторяет прежнюю реализацию get_anime_list: select(Anime) с
+selectinload жанров и студий и валидацией схем from_attributes. Core-путь -
+текущий AnimeService.get_anime_list. Оба варианта сериализуются в JSON,
+как это делает ответ API. Нужна заполненная база (scripts/init_db.py).
+
+Пример:
+    python scripts/benchmark_list_projection.py --sizes 20 50 100 --iterations 50
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from typing import Callable, List
+
+# Добавляем путь к приложению
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+
+from app.database import AsyncSessionLocal
+from app.models.anime import Anime
+from app.schemas.anime import AnimeList, AnimeFilters, AnimeView
+from app.services.anime_service import AnimeService
+
+
+async def orm_page(limit: int) -> bytes:
+    """Прежний путь: ORM-объекты и валидация from_attributes"""
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(Anime)
+            .options(selectinload(Anime.genres), selectinload(Anime.studios))
+            .order_by(Anime.popularity.desc())
+            .limit(limit)
+        )
+        anime_list = result.scalars().all()
+        page = AnimeList(data=anime_list, total=len(anime_list), page=1, limit=limit, pages=1)
+        return page.model_dump_json().encode()
+
+
+def core_page(view: AnimeView) -> Callable:
+    async def run(limit: int) -> bytes:
+        async with AsyncSessionLocal() as db:
+            page = await AnimeService(db).get_anime_list(AnimeFilters(limit=limit), view)
+            return page.model_dump_json().encode()
+    return run
+
+
+async def measure(name: str, func: Callable, limit: int, iterations: int):
+    """Прогреть и замерить функцию, вывести перцентили"""
+    await func(limit)
+
+    timings: List[float] = []
+    cpu_timings: List[float] = []
+    size = 0
+    for _ in range(iterations):
+        start, cpu_start = time.perf_counter(), time.process_time()
+        size = len(await func(limit))
+        timings.append((time.perf_counter() - start) * 1000)
+        cpu_timings.append((time.process_time() - cpu_start) * 1000)
+
+    timings.sort()
+    print(
+        f"  {name:<14} p50={timings[len(timings) // 2]:7.2f}ms "
+        f"p95={timings[int(len(timings) * 0.95) - 1]:7.2f}ms "
+        f"cpu={statistics.mean(cpu_timings):7.2f}ms bytes={size}"
+    )
+
+
+async def run(args):
+    for limit in args.sizes:
+        print(f"page size {limit}:")
+        await measure("orm", orm_page, limit, args.iterations)
+        await measure("core full", core_page(AnimeView.full), limit, args.iterations)
+        await measure("core compact", core_page(AnimeView.compact), limit, args.iterations)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark anime list projections")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20, 50, 100])
+    parser.add_argument("--iterations", type=int, default=50)
+
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк пропускной способности логина.
+
+Запускает всплеск параллельных логинов и одновременно измеряет задержку
+запросов каталога. Показывает, влияет ли хеширование паролей на p99
+остальных запросов.
+
+Пример:
+    python scripts/benchmark_login.py --base-url http://localhost:8000 \\
+        --username demo --password demo123 --logins 200 --concurrency 50
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import List
+
+import httpx
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Перцентиль по отсортированной выборке"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def report(name: str, latencies: List[float], elapsed: float):
+    """Вывести сводку по задержкам (в миллисекундах)"""
+    if not latencies:
+        print(f"{name}: no requests")
+        return
+    ms = [value * 1000 for value in latencies]
+    print(
+        f"{name}: n={len(ms)} rps={len(ms) / elapsed:.1f} "
+        f"p50={percentile(ms, 50):.1f}ms p95={percentile(ms, 95):.1f}ms "
+        f"p99={percentile(ms, 99):.1f}ms max={max(ms):.1f}ms mean={statistics.mean(ms):.1f}ms"
+    )
+
+
+async def catalog_probe(client: httpx.AsyncClient, stop: asyncio.Event, latencies: List[float]):
+    """Непрерывно запрашивать каталог до остановки"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await client.get("/api/v1/anime/", params={"limit": 20})
+        latencies.append(time.perf_counter() - start)
+
+
+async def login_burst(
+    client: httpx.AsyncClient,
+    username: str,
+    password: str,
+    total: int,
+    concurrency: int
+) -> tuple:
+    """Выполнить total логинов с заданным параллелизмом"""
+    latencies: List[float] = []
+    statuses = {}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one_login():
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post(
+                "/api/v1/auth/login",
+                data={"username": username, "password": password}
+            )
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    await asyncio.gather(*(one_login() for _ in range(total)))
+    return latencies, statuses
+
+
+async def run(args):
+    limits = httpx.Limits(max_connections=args.concurrency + args.probes)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=60) as client:
+        # Базовая задержка каталога без нагрузки
+        baseline: List[float] = []
+        stop = asyncio.Event()
+        probes = [asyncio.create_task(catalog_probe(client, stop, baseline)) for _ in range(args.probes)]
+        await asyncio.sleep(args.baseline_seconds)
+        stop.set()
+        await asyncio.gather(*probes)
+        report("catalog (idle)", baseline, args.baseline_seconds)
+
+        # Каталог во время всплеска логинов
+        under_load: List[float] = []
+        stop = asyncio.Event()
+        probes = [asyncio.create_task(catalog_probe(client, stop, under_load)) for _ in range(args.probes)]
+        start = time.perf_counter()
+        login_latencies, statuses = await login_burst(
+            client, args.username, args.password, args.logins, args.concurrency
+        )
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await asyncio.gather(*probes)
+
+        report("login", login_latencies, elapsed)
+        print(f"login statuses: {statuses}")
+        report("catalog (login burst)", under_load, elapsed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark AniStand login throughput")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--username", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--logins", type=int, default=200, help="Total login requests")
+    parser.add_argument("--concurrency", type=int, default=50, help="Parallel login requests")
+    parser.add_argument("--probes", type=int, default=4, help="Parallel catalog probes")
+    parser.add_argument("--baseline-seconds", type=float, default=5.0)
+
+    asyncio.run(run(parser.parse_args()))
@@ -24,8 +24,9 @@ export default function LoginPage() {
     try {
       const response = await authApi.login(formData);
       
-      // Сохраняем токен
+      // Сохраняем токены
       localStorage.setItem('token', response.access_token);
+      localStorage.setItem('refresh_token', response.refresh_token);
       
       // Перенаправляем на главную страницу
       router.push('/');
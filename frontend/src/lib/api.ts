@@ -26,6 +26,7 @@ apiClient.interceptors.response.use(
   (error) => {
     if (error.response?.status === 401) {
       localStorage.removeItem('token');
+      localStorage.removeItem('refresh_token');
       window.location.href = '/auth/login';
     }
     return Promise.reject(error);
@@ -195,11 +196,25 @@ export const authApi = {
     return response.data;
   },
 
-  // Обновление токена
+  // Обновление токена (refresh токен одноразовый - сохраняем выданный взамен)
   refresh: async () => {
-    const response = await apiClient.post('/api/v1/auth/refresh');
+    const response = await apiClient.post('/api/v1/auth/refresh', {
+      refresh_token: localStorage.getItem('refresh_token'),
+    });
+    localStorage.setItem('token', response.data.access_token);
+    localStorage.setItem('refresh_token', response.data.refresh_token);
     return response.data;
   },
+
+  // Выход (отзыв refresh токена)
+  logout: async () => {
+    const refreshToken = localStorage.getItem('refresh_token');
+    if (refreshToken) {
+      await apiClient.post('/api/v1/auth/logout', { refresh_token: refreshToken });
+    }
+    localStorage.removeItem('token');
+    localStorage.removeItem('refresh_token');
+  },
 };
 
 export const userApi = {
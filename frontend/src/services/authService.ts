@@ -12,8 +12,8 @@ export const authService = {
     return response.data;
   },
 
-  async logout(): Promise<void> {
-    await apiClient.post('/auth/logout');
+  async logout(refreshToken: string): Promise<void> {
+    await apiClient.post('/auth/logout', { refresh_token: refreshToken });
   },
 
   async getCurrentUser(): Promise<AuthResponse> {
@@ -17,6 +17,9 @@ export const login = createAsyncThunk<AuthResponse, LoginCredentials>(
     try {
       const response = await authService.login(credentials);
       storage.setToken(response.token);
+      if (response.refresh_token) {
+        storage.setRefreshToken(response.refresh_token);
+      }
       storage.setUser(response.user);
       return response;
     } catch (error: any) {
@@ -31,6 +34,9 @@ export const register = createAsyncThunk<AuthResponse, RegisterCredentials>(
     try {
       const response = await authService.register(credentials);
       storage.setToken(response.token);
+      if (response.refresh_token) {
+        storage.setRefreshToken(response.refresh_token);
+      }
       storage.setUser(response.user);
       return response;
     } catch (error: any) {
@@ -40,7 +46,14 @@ export const register = createAsyncThunk<AuthResponse, RegisterCredentials>(
 );
 
 export const logout = createAsyncThunk('auth/logout', async () => {
-  storage.clearAll();
+  const refreshToken = storage.getRefreshToken();
+  try {
+    if (refreshToken) {
+      await authService.logout(refreshToken);
+    }
+  } finally {
+    storage.clearAll();
+  }
 });
 
 const authSlice = createSlice({
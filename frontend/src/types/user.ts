@@ -29,6 +29,7 @@ export interface RegisterCredentials {
 export interface AuthResponse {
   user: User;
   token: string;
+  refresh_token?: string;
 }
 
 export interface UserLibrary {
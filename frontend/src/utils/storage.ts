@@ -1,5 +1,6 @@
 const STORAGE_KEYS = {
   TOKEN: 'anistand_token',
+  REFRESH_TOKEN: 'anistand_refresh_token',
   USER: 'anistand_user',
   LIBRARY: 'anistand_library',
   WATCH_PROGRESS: 'anistand_watch_progress',
@@ -17,6 +18,12 @@ export const storage = {
   removeToken: (): void => {
     localStorage.removeItem(STORAGE_KEYS.TOKEN);
   },
+  getRefreshToken: (): string | null => {
+    return localStorage.getItem(STORAGE_KEYS.REFRESH_TOKEN);
+  },
+  setRefreshToken: (token: string): void => {
+    localStorage.setItem(STORAGE_KEYS.REFRESH_TOKEN, token);
+  },
 
   // User
   getUser: (): any | null => {